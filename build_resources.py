@@ -28,6 +28,8 @@ def build_resources(settings=None):
     ''' generate CloudFormation templates '''
 
     Configuration.initialize(stream=settings)
+    if builtins.toggles.features_with_compiled_settings:  # before the synthesis of the code asset
+        Configuration.write_compiled_settings()
 
     app = App()
     ServerlessStack(app, builtins.toggles.environment_identifier, description="Automation of Sustainable Personal Accounts")
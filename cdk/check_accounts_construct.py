@@ -16,6 +16,8 @@ SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
 from constructs import Construct
+from aws_cdk import RemovalPolicy
+from aws_cdk.aws_dynamodb import AttributeType, BillingMode, Table, TableEncryption
 from aws_cdk.aws_lambda import Function
 
 from cdk import LoggingFunction
@@ -25,8 +27,26 @@ class CheckAccounts(Construct):
 
     def __init__(self, scope: Construct, id: str, parameters={}) -> None:
         super().__init__(scope, id)
+
+        self.table_name = toggles.environment_identifier + toggles.metering_checks_datastore
+        self.table = Table(
+            self, "ChecksTable",
+            table_name=self.table_name,
+            partition_key={'name': 'Identifier', 'type': AttributeType.STRING},
+            sort_key={'name': 'Order', 'type': AttributeType.STRING},
+            billing_mode=BillingMode.PAY_PER_REQUEST,
+            encryption=TableEncryption.AWS_MANAGED,
+            removal_policy=RemovalPolicy.DESTROY,
+            time_to_live_attribute="Expiration")
+
+        parameters['environment']['METERING_CHECKS_DATASTORE'] = self.table_name
+        parameters['environment']['METERING_CHECKS_TTL'] = str(toggles.metering_checks_ttl_in_seconds)
+        parameters['environment']['REPORTING_COMPLIANCE_PREFIX'] = toggles.reporting_compliance_prefix
         self.functions = [self.on_run(parameters=parameters)]
 
+        for function in self.functions:
+            self.table.grant_read_write_data(grantee=function)
+
     def on_run(self, parameters) -> Function:
 
         return LoggingFunction(self,
@@ -30,11 +30,15 @@ from aws_cdk import Environment
 class Configuration:
     ''' toggles are accessible from every python modules '''
 
+    COMPILED_SETTINGS_FILE = 'compiled_settings.json'  # /!\ passed to lambda functions in COMPILED_SETTINGS_FILE
+
     ALLOWED_ATTRIBUTES = dict(
         accounts='list',
         automation_account_id='str',
         automation_cockpit_markdown_text='str',
+        automation_maintenance_window_duration_in_minutes='int',
         automation_maintenance_window_expression='str',
+        automation_organizations_write_rate='int',
         automation_region='str',
         automation_role_arn_to_manage_accounts='str',
         automation_role_name_to_manage_codebuild='str',
@@ -43,24 +47,34 @@ class Configuration:
         defaults='dict',
         environment_identifier='str',
         features_with_arm_architecture='bool',
+        features_with_compiled_settings='bool',
         features_with_cost_email_recipients='list',
         features_with_cost_extra_currencies='list',
         features_with_cost_management_tag='str',
         features_with_csv_files='list',
         features_with_email_subscriptions_on_alerts='list',
+        features_with_fan_out_sweeps='bool',
         features_with_end_user_documents='dict',
         features_with_microsoft_webhook_on_alerts='str',
         features_with_origin_email_recipient='str',
+        features_with_packed_settings='bool',
         features_with_response_plan_arn='str',
         features_with_tag_prefix='str',
         metering_activities_datastore='str',
         metering_activities_ttl_in_seconds='int',
+        metering_checks_datastore='str',
+        metering_checks_ttl_in_seconds='int',
+        metering_directory_datastore='str',
         metering_shadows_datastore='str',
         metering_shadows_ttl_in_seconds='int',
+        metering_sweeps_datastore='str',
         metering_transactions_datastore='str',
         metering_transactions_ttl_in_seconds='int',
         organizational_units='list',
         reporting_activities_prefix='str',
+        reporting_compliance_prefix='str',
+        reporting_costs_cache_prefix='str',
+        reporting_costs_daily_prefix='str',
         reporting_costs_prefix='str',
         reporting_costs_markdown_template='str',
         reporting_exceptions_prefix='str',
@@ -133,29 +147,41 @@ class Configuration:
         toggles.defaults = {}
 
         # other default values
+        toggles.automation_maintenance_window_duration_in_minutes = 0
+        toggles.automation_organizations_write_rate = 2  # changes of tags per second, divided by concurrent invocations of each function
         toggles.automation_cockpit_markdown_text = "# Sustainable Personal Accounts Dashboard\nCurrently under active development (beta)"
         toggles.automation_role_name_to_manage_codebuild = 'AWSControlTowerExecution'
         toggles.automation_subscribed_email_addresses = []
         toggles.automation_tags = {}
         toggles.automation_verbosity = 'INFO'
         toggles.features_with_arm_architecture = False
+        toggles.features_with_compiled_settings = False
         toggles.features_with_cost_email_recipients = None
         toggles.features_with_cost_extra_currencies = None
         toggles.features_with_cost_management_tag = None
         toggles.features_with_csv_files = None
         toggles.features_with_email_subscriptions_on_alerts = None
+        toggles.features_with_fan_out_sweeps = False
         toggles.features_with_end_user_documents = None
         toggles.features_with_microsoft_webhook_on_alerts = None
         toggles.features_with_origin_email_recipient = None
+        toggles.features_with_packed_settings = False
         toggles.features_with_response_plan_arn = ''
         toggles.features_with_tag_prefix = 'account-'
         toggles.metering_activities_datastore = "ActivitiesTable"        # will be prefixed with environment identifier
         toggles.metering_activities_ttl_in_seconds = 366 * 24 * 60 * 60  # 1 year TTL
+        toggles.metering_checks_datastore = "ChecksTable"                # will be prefixed with environment identifier
+        toggles.metering_checks_ttl_in_seconds = 7 * 24 * 60 * 60        # 1 week TTL
+        toggles.metering_directory_datastore = "DirectoryTable"          # will be prefixed with environment identifier
         toggles.metering_shadows_datastore = "ShadowsTable"              # will be prefixed with environment identifier
         toggles.metering_shadows_ttl_in_seconds = 183 * 24 * 60 * 60     # 6 months TTL
+        toggles.metering_sweeps_datastore = "SweepsTable"                # will be prefixed with environment identifier
         toggles.metering_transactions_datastore = "TransactionsTable"    # will be prefixed with environment identifier
         toggles.metering_transactions_ttl_in_seconds = 3 * 60 * 60       # 3 hours TTL
         toggles.reporting_activities_prefix = 'SpaReports/Activities'
+        toggles.reporting_compliance_prefix = 'SpaReports/Compliance'
+        toggles.reporting_costs_cache_prefix = 'SpaCache/Costs'
+        toggles.reporting_costs_daily_prefix = 'SpaCache/DailyCosts'
         toggles.reporting_costs_prefix = 'SpaReports/Costs'
         toggles.reporting_costs_markdown_template = "You will find attached cloud cost reports for {month}"
         toggles.reporting_exceptions_prefix = 'SpaReports/Exceptions'
@@ -357,6 +383,17 @@ class Configuration:
                 identifier = item['identifier']
                 raise AttributeError(f"Unexpected purge parameter '{label}' for {identifier}")
 
+    @classmethod
+    def write_compiled_settings(cls, directory='lambdas.out', toggles=None):
+        ''' save settings of accounts and organizational units along the code of lambda functions '''
+        toggles = toggles or builtins.toggles
+        name = os.path.join(directory, cls.COMPILED_SETTINGS_FILE)
+        logging.info(f"Compiling settings of {len(toggles.accounts)} accounts and {len(toggles.organizational_units)} organizational units in '{name}'")
+        os.makedirs(directory, exist_ok=True)
+        with open(name, 'w') as stream:
+            json.dump(dict(accounts=toggles.accounts, organizational_units=toggles.organizational_units), stream, sort_keys=True, separators=(',', ':'))
+        return name
+
     @staticmethod
     def set_aws_environment(toggles=None):
         toggles = toggles or builtins.toggles
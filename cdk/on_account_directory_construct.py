@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Copyright Reply.com or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+from constructs import Construct
+from aws_cdk import RemovalPolicy
+from aws_cdk.aws_dynamodb import AttributeType, BillingMode, Table, TableEncryption
+from aws_cdk.aws_events import EventPattern, Rule, Schedule
+from aws_cdk.aws_events_targets import LambdaFunction
+from aws_cdk.aws_lambda import Function
+
+from cdk import LoggingFunction
+from lambdas import AccountDirectory
+
+
+class OnAccountDirectory(Construct):
+
+    def __init__(self, scope: Construct, id: str, parameters={}) -> None:
+        super().__init__(scope, id)
+
+        self.table_name = toggles.environment_identifier + toggles.metering_directory_datastore
+        self.table = Table(
+            self, "DirectoryTable",
+            table_name=self.table_name,
+            partition_key={'name': 'Identifier', 'type': AttributeType.STRING},
+            sort_key={'name': 'Order', 'type': AttributeType.STRING},
+            billing_mode=BillingMode.PAY_PER_REQUEST,
+            encryption=TableEncryption.AWS_MANAGED,
+            removal_policy=RemovalPolicy.DESTROY)  # no TTL, records are repaired by nightly reconciliation
+
+        self.functions = [self.on_event(parameters=parameters),
+                          self.on_schedule(parameters=parameters)]
+
+        for function in self.functions:
+            self.table.grant_read_write_data(grantee=function)
+
+    def on_event(self, parameters) -> Function:
+
+        function = LoggingFunction(self,
+                                   name="OnAccountDirectory",
+                                   description="Update the directory of accounts on changes in the organization",
+                                   trigger="FromEvent",
+                                   handler="on_account_directory_handler.handle_organization_event",
+                                   parameters=parameters)
+
+        Rule(self, "EventRule",
+             description="Route changes of accounts in the organization to lambda function",
+             event_pattern=EventPattern(
+                 source=['aws.organizations'],
+                 detail=dict(
+                     errorCode=[{"exists": False}],
+                     eventName=AccountDirectory.EVENT_NAMES,
+                     eventSource=["organizations.amazonaws.com"])),
+             targets=[LambdaFunction(function)])
+
+        return function
+
+    def on_schedule(self, parameters) -> Function:
+
+        function = LoggingFunction(self,
+                                   name="OnAccountDirectoryReconciliation",
+                                   description="Repair drift between the directory of accounts and the organization",
+                                   trigger="FromSchedule",
+                                   handler="on_account_directory_handler.handle_reconciliation",
+                                   parameters=parameters)
+
+        Rule(self, "TriggerRule",
+             rule_name="{}OnAccountDirectoryTriggerRule".format(toggles.environment_identifier),
+             description="Trigger nightly reconciliation of the directory of accounts",
+             schedule=Schedule.cron(hour="1", minute="17"),
+             targets=[LambdaFunction(function)])
+
+        return function
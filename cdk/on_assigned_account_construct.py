@@ -29,10 +29,12 @@ from .parameters_construct import Parameters
 
 class OnAssignedAccount(Construct):
 
+    PREPARATION_IN_SECONDS = 120  # worst case for one account, including up to 75 seconds of retries in Worker.prepare
+
     def __init__(self, scope: Construct, id: str, parameters={}) -> None:
         super().__init__(scope, id)
 
-        self.queue = Queue(self, "Queue", visibility_timeout=Duration.minutes(15))
+        self.queue = Queue(self, "Queue", visibility_timeout=Duration.seconds(6 * 900))  # as recommended for lambda functions triggered by a queue
 
         parameters['environment']['PREPARATION_BUILDSPEC_PARAMETER'] = Parameters.get_parameter(toggles.environment_identifier, Parameters.PREPARATION_BUILDSPEC_PARAMETER)
         self.functions = [self.on_tag(parameters=parameters, queue=self.queue)]
@@ -58,6 +60,11 @@ class OnAssignedAccount(Construct):
                                    parameters=parameters)
 
         queue.grant_consume_messages(function)
-        function.add_event_source(SqsEventSource(queue, batch_size=1, max_concurrency=10))
+        batch_size = max(1, int(parameters['timeout'].to_seconds() // self.PREPARATION_IN_SECONDS))  # accounts of a batch are prepared one by one
+        function.add_event_source(SqsEventSource(queue,
+                                                 batch_size=min(10, batch_size),
+                                                 max_batching_window=Duration.seconds(30),
+                                                 max_concurrency=10,
+                                                 report_batch_item_failures=True))  # roles are assumed concurrently for a batch
 
         return function
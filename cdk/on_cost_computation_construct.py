@@ -33,6 +33,8 @@ class OnCostComputation(Construct):
             return
 
         parameters['environment']['COST_MANAGEMENT_TAG'] = toggles.features_with_cost_management_tag
+        parameters['environment']['COSTS_CACHE_PREFIX'] = toggles.reporting_costs_cache_prefix  # responses of Cost Explorer
+        parameters['environment']['COSTS_DAILY_PREFIX'] = toggles.reporting_costs_daily_prefix  # daily costs per account and service
         parameters['environment']['REPORTING_COSTS_PREFIX'] = toggles.reporting_costs_prefix
         parameters['environment']['REPORTING_COSTS_MARKDOWN'] = toggles.reporting_costs_markdown_template
         if toggles.features_with_origin_email_recipient:
@@ -16,18 +16,39 @@ SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
 from constructs import Construct
+from aws_cdk import Duration
 from aws_cdk.aws_events import Rule, Schedule
 from aws_cdk.aws_events_targets import LambdaFunction
 from aws_cdk.aws_lambda import Function
+from aws_cdk.aws_lambda_event_sources import SqsEventSource
+from aws_cdk.aws_sqs import DeadLetterQueue, Queue
 
 from cdk import LoggingFunction
 
 
 class OnMaintenanceWindow(Construct):
 
+    MAX_CONCURRENCY = 2  # expirations are paced anyway by the token bucket, that shares the write rate across invocations
+
     def __init__(self, scope: Construct, id: str, parameters={}) -> None:
         super().__init__(scope, id)
+
+        self.environment = {}  # given to lambda functions that schedule expirations
+        self.queue = None
+
+        if toggles.automation_maintenance_window_duration_in_minutes:  # spread expirations over the window
+            self.dead_letter_queue = Queue(self, "DeadLetterQueue", retention_period=Duration.days(14))
+            self.queue = Queue(self, "ExpirationsQueue",
+                               visibility_timeout=Duration.seconds(900),
+                               dead_letter_queue=DeadLetterQueue(max_receive_count=3, queue=self.dead_letter_queue))
+
+            self.environment['EXPIRATIONS_QUEUE_URL'] = self.queue.queue_url
+            self.environment['MAINTENANCE_WINDOW_DURATION_IN_MINUTES'] = str(toggles.automation_maintenance_window_duration_in_minutes)
+            parameters['environment'].update(self.environment)
+
         self.functions = [self.on_schedule(parameters=parameters)]
+        if self.queue:
+            self.functions.append(self.on_queue(parameters=parameters, queue=self.queue))
 
     def on_schedule(self, parameters) -> Function:
 
@@ -43,4 +64,29 @@ class OnMaintenanceWindow(Construct):
              schedule=Schedule.expression(toggles.automation_maintenance_window_expression),
              targets=[LambdaFunction(function)])
 
+        if self.queue:
+            self.queue.grant_send_messages(function)
+
+        return function
+
+    def on_queue(self, parameters, queue) -> Function:
+
+        function = LoggingFunction(self,
+                                   name="OnMaintenanceWindowFromSqs",
+                                   description="Change state of expired accounts at their slot in the maintenance window",
+                                   trigger="FromQueue",
+                                   handler="on_maintenance_window_handler.handle_queue_event",
+                                   parameters=parameters)
+
+        queue.grant_consume_messages(function)
+        queue.grant_send_messages(function)  # delays longer than 15 minutes are done in several hops
+        function.add_event_source(SqsEventSource(queue, batch_size=10, max_concurrency=self.MAX_CONCURRENCY, report_batch_item_failures=True))
+        function.add_environment('ORGANIZATIONS_WRITE_CONCURRENCY', str(self.MAX_CONCURRENCY))  # rate of changes of tags is shared by invocations
+
         return function
+
+    def grant_schedule(self, function):
+        if self.queue:
+            self.queue.grant_send_messages(function)
+            for key, value in self.environment.items():
+                function.add_environment(key, value)
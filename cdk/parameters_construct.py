@@ -15,9 +15,12 @@ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
 SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
+import base64
+import hashlib
 import json
 import logging
 import os
+import zlib
 
 from constructs import Construct
 from aws_cdk.aws_ssm import ParameterDataType, ParameterTier, StringParameter
@@ -29,36 +32,61 @@ class Parameters(Construct):
     ACCOUNTS_PARAMETER = "Accounts"
     DOCUMENTS_PARAMETER = "Documents"
     ORGANIZATIONAL_UNITS_PARAMETER = "OrganizationalUnits"
+    PACKED_SETTINGS_PARAMETER = "PackedSettings"
+    PACKED_SETTINGS_SHARD_SIZE = 8000  # advanced parameters accept up to 8 KB
     PREPARATION_BUILDSPEC_PARAMETER = "PreparationBuildspecTemplate"
     PURGE_BUILDSPEC_PARAMETER = "PurgeBuildspecTemplate"
+    SETTINGS_GENERATION_PARAMETER = "SettingsGeneration"
     WEB_ENDPOINTS_PARAMETER = "WebEndpoints"
 
     def __init__(self, scope: Construct, id: str, web_endpoints={}) -> None:
         super().__init__(scope, id)
 
-        for identifier in toggles.accounts.keys():  # one parameter per managed account
-            content = json.dumps(toggles.accounts[identifier], indent=4)
-            logging.debug(f"parameter Accounts/{identifier} = {content}")
-            StringParameter(
-                self, f"a-{identifier}",
-                string_value=content,
-                data_type=ParameterDataType.TEXT,
-                description="Parameters for managed account {}".format(identifier),
-                parameter_name=self.get_account_parameter(environment=toggles.environment_identifier,
-                                                          identifier=identifier),
-                tier=ParameterTier.STANDARD)
-
-        for identifier in toggles.organizational_units.keys():  # one parameter per managed organizational unit
-            content = json.dumps(toggles.organizational_units[identifier], indent=4)
-            logging.debug(f"parameter OrganizationalUnits/{identifier} = {content}")
-            StringParameter(
-                self, identifier,
-                string_value=content,
-                data_type=ParameterDataType.TEXT,
-                description="Parameters for managed organizational unit {}".format(identifier),
-                parameter_name=self.get_organizational_unit_parameter(environment=toggles.environment_identifier,
-                                                                      identifier=identifier),
-                tier=ParameterTier.STANDARD)
+        if toggles.features_with_packed_settings:  # a few compressed parameters for all accounts and units
+            for index, content in enumerate(self.pack_settings(accounts=toggles.accounts, organizational_units=toggles.organizational_units)):
+                logging.debug(f"parameter PackedSettings/{index:03d} has {len(content)} bytes")
+                StringParameter(
+                    self, f"p-{index:03d}",
+                    string_value=content,
+                    data_type=ParameterDataType.TEXT,
+                    description=f"Packed settings for managed accounts and organizational units, shard {index}",
+                    parameter_name=self.get_packed_settings_parameter(environment=toggles.environment_identifier,
+                                                                      index=index),
+                    tier=ParameterTier.ADVANCED)
+
+        else:
+            for identifier in toggles.accounts.keys():  # one parameter per managed account
+                content = json.dumps(toggles.accounts[identifier], indent=4)
+                logging.debug(f"parameter Accounts/{identifier} = {content}")
+                StringParameter(
+                    self, f"a-{identifier}",
+                    string_value=content,
+                    data_type=ParameterDataType.TEXT,
+                    description="Parameters for managed account {}".format(identifier),
+                    parameter_name=self.get_account_parameter(environment=toggles.environment_identifier,
+                                                              identifier=identifier),
+                    tier=ParameterTier.STANDARD)
+
+            for identifier in toggles.organizational_units.keys():  # one parameter per managed organizational unit
+                content = json.dumps(toggles.organizational_units[identifier], indent=4)
+                logging.debug(f"parameter OrganizationalUnits/{identifier} = {content}")
+                StringParameter(
+                    self, identifier,
+                    string_value=content,
+                    data_type=ParameterDataType.TEXT,
+                    description="Parameters for managed organizational unit {}".format(identifier),
+                    parameter_name=self.get_organizational_unit_parameter(environment=toggles.environment_identifier,
+                                                                          identifier=identifier),
+                    tier=ParameterTier.STANDARD)
+
+        content = self.get_settings_generation()  # changed only when settings of accounts or units are changed
+        StringParameter(
+            self, "SettingsGeneration",
+            string_value=content,
+            data_type=ParameterDataType.TEXT,
+            description="Fingerprint of settings for managed accounts and organizational units",
+            parameter_name=self.get_parameter(toggles.environment_identifier, self.SETTINGS_GENERATION_PARAMETER),
+            tier=ParameterTier.STANDARD)
 
         content = self.get_buildspec_for_preparation()  # the buildspec for account preparation
         StringParameter(
@@ -120,11 +148,30 @@ class Parameters(Construct):
             attributes.append(identifier)
         return cls.PARAMETER_SEPARATOR.join(attributes)
 
+    @classmethod
+    def get_packed_settings_parameter(cls, environment, index=None):
+        attributes = ['', environment, cls.PACKED_SETTINGS_PARAMETER]
+        if index is not None:
+            attributes.append(f"{index:03d}")
+        return cls.PARAMETER_SEPARATOR.join(attributes)
+
+    @classmethod
+    def pack_settings(cls, accounts, organizational_units):
+        ''' compress settings in a single document, and split it in shards that fit in parameters '''
+        content = json.dumps(dict(accounts=accounts, organizational_units=organizational_units), sort_keys=True, separators=(',', ':'))
+        packed = base64.b64encode(zlib.compress(content.encode('utf-8'), 9)).decode('ascii')  # /!\ to be decoded in lambdas/settings.py
+        return [packed[offset:offset + cls.PACKED_SETTINGS_SHARD_SIZE] for offset in range(0, len(packed), cls.PACKED_SETTINGS_SHARD_SIZE)]
+
     @classmethod
     def get_parameter(cls, environment, parameter):
         attributes = ['', environment, parameter]
         return cls.PARAMETER_SEPARATOR.join(attributes)
 
+    @staticmethod
+    def get_settings_generation():
+        content = json.dumps(dict(accounts=toggles.accounts, organizational_units=toggles.organizational_units), sort_keys=True)
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
     def get_buildspec_content(self, file):
         for path in {toggles.settings_path, '.'}:
             name = os.path.join(path, file)
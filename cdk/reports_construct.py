@@ -16,12 +16,14 @@ SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
 from constructs import Construct
-from aws_cdk import RemovalPolicy
-from aws_cdk.aws_s3 import Bucket, BucketEncryption
+from aws_cdk import Duration, RemovalPolicy
+from aws_cdk.aws_s3 import Bucket, BucketEncryption, LifecycleRule
 
 
 class Reports(Construct):
 
+    COSTS_CACHE_EXPIRATION_IN_DAYS = 45  # longer than the expiration of cached costs of closed periods, on day 15 of next month
+
     def __init__(self, scope: Construct, id: str) -> None:
         super().__init__(scope, id)
 
@@ -29,4 +31,7 @@ class Reports(Construct):
             self, id=id,
             encryption=BucketEncryption.S3_MANAGED,
             removal_policy=RemovalPolicy.DESTROY,
-            event_bridge_enabled=True)
+            event_bridge_enabled=True,
+            lifecycle_rules=[LifecycleRule(id="CostsCache",  # cached responses of Cost Explorer are checked only on read
+                                           prefix=toggles.reporting_costs_cache_prefix + '/',
+                                           expiration=Duration.days(self.COSTS_CACHE_EXPIRATION_IN_DAYS))])
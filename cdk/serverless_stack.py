@@ -24,6 +24,8 @@ from aws_cdk.aws_logs import RetentionDays
 from .check_accounts_construct import CheckAccounts
 from .check_health_construct import CheckHealth
 from .cockpit_construct import Cockpit
+from .configuration import Configuration
+from .on_account_directory_construct import OnAccountDirectory
 from .on_account_event_construct import OnAccountEvent
 from .on_activity_construct import OnActivity
 from .on_alert_construct import OnAlert
@@ -41,11 +43,14 @@ from .parameters_construct import Parameters
 from .release_accounts_construct import ReleaseAccounts
 from .reports_construct import Reports
 from .reset_accounts_construct import ResetAccounts
+from .sweeps_construct import Sweeps
 from .to_microsoft_teams_construct import ToMicrosoftTeams
 
 
 class ServerlessStack(Stack):
 
+    SWEEP_LABELS = ['CheckAccounts', 'OnMaintenanceWindow', 'ReleaseAccounts', 'ResetAccounts']  # dispatch shards of accounts
+
     def __init__(self, scope: Construct, id: str, **kwargs) -> None:
         super().__init__(scope, id, env=toggles.aws_environment, **kwargs)
 
@@ -55,6 +60,7 @@ class ServerlessStack(Stack):
         labels = [
             'CheckAccounts',
             'CheckHealth',
+            'OnAccountDirectory',
             'OnAccountEvent',
             'OnActivity',
             'OnAlert',
@@ -72,14 +78,12 @@ class ServerlessStack(Stack):
             'ResetAccounts',
             'ToMicrosoftTeams']
 
-        constructs = {}
-        functions = []
-        for label in labels:
-
-            environment = self.get_environment(bucket_name=self.reports.bucket.bucket_name).copy()
-            parameters = self.get_parameters(environment=environment).copy()
+        environment = self.get_environment(bucket_name=self.reports.bucket.bucket_name).copy()
+        sweeps = Sweeps(self, 'Sweeps', parameters=self.get_parameters(environment=environment).copy())
+        constructs = self.add_constructs(labels=labels, sweeps=sweeps)
 
-            constructs[label] = globals()[label](self, label, parameters=parameters)
+        functions = list(sweeps.functions)
+        for label in labels:
             functions.extend(constructs[label].functions)
 
         for function in functions:
@@ -87,10 +91,12 @@ class ServerlessStack(Stack):
                 function.add_to_role_policy(permission)
 
             self.reports.bucket.grant_read_write(function)  # give permission to produce and edit reports
+            constructs['OnAccountDirectory'].table.grant_read_data(function)  # directory of accounts is shared
 
         tables = []  # the list of dynamodb tables
-        for label in ['OnAccountEvent', 'OnActivity', 'OnTransactionMetering']:
+        for label in ['CheckAccounts', 'OnAccountDirectory', 'OnAccountEvent', 'OnActivity', 'OnTransactionMetering']:
             tables.append(constructs[label].table)
+        tables.append(sweeps.table)
 
         Cockpit(self,
                 "{}Cockpit-{}".format(toggles.environment_identifier, toggles.automation_region),
@@ -105,21 +111,48 @@ class ServerlessStack(Stack):
         for key in toggles.automation_tags.keys():  # cascaded to constructs and to other resources
             Tags.of(self).add(key, toggles.automation_tags[key])
 
+    def add_constructs(self, labels, sweeps) -> dict:
+        constructs = {}
+        for label in labels:
+
+            environment = self.get_environment(bucket_name=self.reports.bucket.bucket_name).copy()
+            if label in self.SWEEP_LABELS:
+                environment.update(sweeps.environment)
+            parameters = self.get_parameters(environment=environment).copy()
+
+            constructs[label] = globals()[label](self, label, parameters=parameters)
+
+            if label in self.SWEEP_LABELS:
+                for function in constructs[label].functions:
+                    sweeps.grant_dispatch(function)
+
+        for function in sweeps.functions:  # shards of checks update the records of checks
+            constructs['CheckAccounts'].table.grant_read_write_data(grantee=function)
+            constructs['OnMaintenanceWindow'].grant_schedule(function)  # shards of expirations are spread over the window
+
+        return constructs
+
     @classmethod
     def get_environment(cls, bucket_name=None) -> dict:  # shared across all lambda functions
         environment = dict(
+            ACCOUNTS_DIRECTORY_DATASTORE=toggles.environment_identifier + toggles.metering_directory_datastore,
             ACCOUNTS_PARAMETER=Parameters.get_account_parameter(environment=toggles.environment_identifier),
             AUTOMATION_ACCOUNT=toggles.automation_account_id,
             AUTOMATION_REGION=toggles.automation_region,
             ENVIRONMENT_IDENTIFIER=toggles.environment_identifier,
             EVENT_BUS_ARN=f"arn:aws:events:{toggles.automation_region}:{toggles.automation_account_id}:event-bus/default",
             ORGANIZATIONAL_UNITS_PARAMETER=Parameters.get_organizational_unit_parameter(environment=toggles.environment_identifier),
+            ORGANIZATIONS_WRITE_RATE=str(toggles.automation_organizations_write_rate),
             ROLE_ARN_TO_MANAGE_ACCOUNTS=toggles.automation_role_arn_to_manage_accounts,
             ROLE_NAME_TO_MANAGE_CODEBUILD=toggles.automation_role_name_to_manage_codebuild,
             TAG_PREFIX=toggles.features_with_tag_prefix,
             VERBOSITY=toggles.automation_verbosity)
         if bucket_name:
             environment['REPORTS_BUCKET_NAME'] = bucket_name
+        if toggles.features_with_compiled_settings:
+            environment['COMPILED_SETTINGS_FILE'] = Configuration.COMPILED_SETTINGS_FILE
+        if toggles.features_with_packed_settings:
+            environment['WITH_PACKED_SETTINGS'] = 'true'  # no parameter for each account or organizational unit
         return environment
 
     @classmethod
@@ -163,7 +196,7 @@ class ServerlessStack(Stack):
                             resources=['*']),
 
             PolicyStatement(effect=Effect.ALLOW,
-                            actions=['ssm:GetParameter', 'ssm:GetParameters', 'ssm:GetParametersByPath'],
+                            actions=['ssm:DescribeParameters', 'ssm:GetParameter', 'ssm:GetParameters', 'ssm:GetParametersByPath'],
                             resources=['*']),
 
             PolicyStatement(effect=Effect.ALLOW,
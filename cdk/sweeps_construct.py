@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Copyright Reply.com or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+from constructs import Construct
+from aws_cdk import Duration, RemovalPolicy
+from aws_cdk.aws_dynamodb import AttributeType, BillingMode, Table, TableEncryption
+from aws_cdk.aws_iam import Effect, PolicyStatement
+from aws_cdk.aws_lambda import Function
+from aws_cdk.aws_lambda_event_sources import SqsEventSource
+from aws_cdk.aws_sqs import DeadLetterQueue, Queue
+
+from cdk import LoggingFunction
+
+
+class Sweeps(Construct):
+
+    BATCH_SIZE = 25       # accounts per shard
+    MAX_CONCURRENCY = 20  # shards processed in parallel
+
+    def __init__(self, scope: Construct, id: str, parameters={}) -> None:
+        super().__init__(scope, id)
+
+        self.table_name = toggles.environment_identifier + toggles.metering_sweeps_datastore
+        self.table = Table(  # progress of sweeps, and checkpoints of long runs
+            self, "SweepsTable",
+            table_name=self.table_name,
+            partition_key={'name': 'Identifier', 'type': AttributeType.STRING},
+            sort_key={'name': 'Order', 'type': AttributeType.STRING},
+            billing_mode=BillingMode.PAY_PER_REQUEST,
+            encryption=TableEncryption.AWS_MANAGED,
+            removal_policy=RemovalPolicy.DESTROY,
+            time_to_live_attribute="Expiration")
+
+        self.environment = dict(SWEEPS_DATASTORE=self.table_name)  # given to lambda functions that handle all accounts
+        self.queue = None
+        self.functions = []
+
+        if toggles.features_with_fan_out_sweeps:  # shards of accounts are processed in parallel
+            self.dead_letter_queue = Queue(self, "DeadLetterQueue", retention_period=Duration.days(14))
+            self.queue = Queue(self, "Queue",
+                               visibility_timeout=Duration.seconds(6 * 900),  # as recommended for lambda functions triggered by a queue
+                               dead_letter_queue=DeadLetterQueue(max_receive_count=3, queue=self.dead_letter_queue))
+
+            self.environment['SWEEPS_BATCH_SIZE'] = str(self.BATCH_SIZE)
+            self.environment['SWEEPS_QUEUE_URL'] = self.queue.queue_url
+
+            parameters['environment'].update(self.environment)
+            parameters['environment']['METERING_CHECKS_DATASTORE'] = toggles.environment_identifier + toggles.metering_checks_datastore
+            parameters['environment']['METERING_CHECKS_TTL'] = str(toggles.metering_checks_ttl_in_seconds)
+            parameters['environment']['REPORTING_COMPLIANCE_PREFIX'] = toggles.reporting_compliance_prefix
+            self.functions.append(self.on_queue(parameters=parameters, queue=self.queue))
+
+        for function in self.functions:
+            self.table.grant_read_write_data(grantee=function)
+
+    def on_queue(self, parameters, queue) -> Function:
+
+        function = LoggingFunction(self,
+                                   name="OnSweep",
+                                   description="Process shards of sweeps across managed accounts",
+                                   trigger="FromQueue",
+                                   handler="on_sweep_handler.handle_queue_event",
+                                   parameters=parameters)
+
+        queue.grant_consume_messages(function)
+        function.add_event_source(SqsEventSource(queue, batch_size=1, max_concurrency=self.MAX_CONCURRENCY, report_batch_item_failures=True))
+        function.add_environment('SWEEPS_MAX_CONCURRENCY', str(self.MAX_CONCURRENCY))  # rate of changes of tags is divided by the shards in flight
+
+        return function
+
+    def grant_dispatch(self, function):
+        if self.queue:
+            self.queue.grant_send_messages(function)
+        self.table.grant_read_write_data(grantee=function)
+        function.add_to_role_policy(PolicyStatement(  # continue long runs in another invocation
+            effect=Effect.ALLOW,
+            actions=['lambda:InvokeFunction'],
+            resources=[f"arn:aws:lambda:{toggles.automation_region}:{toggles.automation_account_id}:function:{toggles.environment_identifier}*"]))
@@ -15,23 +15,38 @@ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
 SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
-from .account import Account, State
+from .account import Account, AccountRecord, AccountTagSession, State
+from .account_directory import AccountDirectory
+from .checkpoint import Checkpoint
+from .compliance import Compliance, Finding
 from .e_mail import Email
 from .events import Events
 from .key_value_store import KeyValueStore
 from .logger import setup_logging, trap_exception, LOGGING_FORMAT
 from .metric import put_metric_data
-from .session import get_account_session, get_assumed_session
-from .settings import Settings
+from .organization import OrganizationSnapshot
+from .session import get_account_session, get_assumed_session, SessionPool
+from .settings import Settings, SettingsIndex
+from .sweep import Sweep
 from .worker import Worker
 
 __all__ = ['Account',
+           'AccountDirectory',
+           'AccountRecord',
+           'AccountTagSession',
+           'Checkpoint',
+           'Compliance',
            'Email',
            'Events',
+           'Finding',
            'KeyValueStore',
            'LOGGING_FORMAT',
+           'OrganizationSnapshot',
+           'SessionPool',
            'Settings',
+           'SettingsIndex',
            'State',
+           'Sweep',
            'get_account_session',
            'get_assumed_session',
            'put_metric_data',
@@ -16,14 +16,19 @@ SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
 import botocore
+from concurrent.futures import as_completed, wait, FIRST_COMPLETED, ThreadPoolExecutor
 from enum import Enum, unique
 import json
 import logging
 import os
-from types import SimpleNamespace
 import re
 
+from account_directory import AccountDirectory
+from cache import Cache
+from clients import get_client
+from organization import OrganizationSnapshot
 from session import get_organizations_session
+from throttling import AdaptiveRateLimiter, is_throttling, TokenBucket
 
 
 @unique
@@ -34,12 +39,140 @@ class State(Enum):  # value is given to tag 'account-state'
     EXPIRED = 'expired'
 
 
+class AccountRecord:
+    ''' description of one account, with tags and organizational unit loaded on first access '''
+
+    __slots__ = ('id', 'arn', 'email', 'name', 'is_active', 'status', 'session', '_tags', '_unit')
+
+    FIELDS = ('id', 'arn', 'email', 'name', 'is_active', 'status', 'tags', 'unit', 'unit_name')
+
+    def __init__(self, id, arn, email, name, is_active, status=None, session=None):
+        self.id = id
+        self.arn = arn
+        self.email = email
+        self.name = name
+        self.is_active = is_active
+        self.status = status
+        self.session = session
+        self._tags = None
+        self._unit = None
+
+    @property
+    def tags(self):
+        if self._tags is None:
+            self._tags = Account.list_tags(account=self.id, session=self.session)
+        return self._tags
+
+    @tags.setter
+    def tags(self, value):
+        self._tags = value
+
+    @property
+    def unit(self):
+        return self.get_unit_details().get('Id', 'Unknown')
+
+    @property
+    def unit_name(self):
+        return self.get_unit_details().get('Name', 'Unknown')
+
+    def get_unit_details(self):
+        if self._unit is None:
+            self._unit = Account.get_organizational_unit_details(account=self.id, session=self.session)
+        return self._unit
+
+    def to_dict(self):
+        ''' all fields of the account, including tags and organizational unit that are loaded if needed '''
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    __dict__ = property(to_dict)  # read-only, for code that used to receive a SimpleNamespace
+
+    def __repr__(self):
+        loaded = ['id', 'arn', 'email', 'name', 'is_active', 'status']
+        loaded += ['tags'] if self._tags is not None else []
+        loaded += ['unit', 'unit_name'] if self._unit is not None else []
+        return "AccountRecord({})".format(', '.join(f"{name}={getattr(self, name)!r}" for name in loaded))
+
+
+class AccountTagSession:
+    ''' record changes of tags on one account, then write only those that are not in place already '''
+
+    def __init__(self, account, tags=None, session=None):
+        self.account = account
+        self.current = dict(tags) if tags is not None else None
+        self.session = session
+        self.updates = {}
+        self.removals = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        if type is None:
+            self.commit()
+
+    def tag(self, tags):
+        for key, value in tags.items():
+            self.updates[key] = value
+            self.removals.discard(key)
+
+    def untag(self, keys):
+        for key in keys:
+            self.updates.pop(key, None)
+            self.removals.add(key)
+
+    def set_state(self, state: State):
+        if not isinstance(state, State):
+            raise ValueError(f"Unexpected state type {state}")
+        self.tag({Account.get_tag_key('state'): state.value})
+
+    def get_current_tags(self):
+        if self.current is None:
+            self.current = Account.list_tags(account=self.account, session=self.session)
+        return self.current
+
+    def get_tags(self):
+        ''' tags of the account once changes have been committed '''
+        tags = {key: value for key, value in self.get_current_tags().items() if key not in self.removals}
+        tags.update(self.updates)
+        return tags
+
+    def commit(self):
+        current = self.get_current_tags()
+        removals = [key for key in sorted(self.removals) if key in current]
+        updates = {key: value for key, value in self.updates.items() if current.get(key) != value}
+        if removals:
+            Account.untag(self.account, removals, session=self.session)
+        if updates:
+            Account.tag(self.account, updates, session=self.session)
+        if not (removals or updates):
+            logging.debug(f"No change of tags on account '{self.account}'")
+        self.current = self.get_tags()
+        self.updates = {}
+        self.removals = set()
+        return len(removals) + len(updates)
+
+
 class Account:
     VALID_EMAIL = re.compile(r'([A-Za-z0-9]+[.-_])*[A-Za-z0-9-.]+@[A-Za-z0-9-]+(\.[A-Z|a-z]{2,})+')
 
     session = None
 
-    ou_cache = {}
+    cache = Cache(size=int(os.environ.get('ACCOUNT_CACHE_SIZE', '8192')),
+                  ttl=int(os.environ.get('ACCOUNT_CACHE_TTL_IN_SECONDS', '300')))
+
+    limiter = AdaptiveRateLimiter()  # shared by concurrent descriptions of accounts
+
+    writer = TokenBucket.shared_by(concurrency=int(os.environ.get('ORGANIZATIONS_WRITE_CONCURRENCY', '1')),  # shared by changes of tags
+                                   rate=float(os.environ.get('ORGANIZATIONS_WRITE_RATE', '2.0')),
+                                   capacity=int(os.environ.get('ORGANIZATIONS_WRITE_BURST', '5')))
+
+    @classmethod
+    def share_writes(cls, concurrency):
+        ''' divide the rate of changes of tags among invocations that run at the same time, e.g., shards of a sweep '''
+        cls.writer = TokenBucket.shared_by(concurrency=concurrency,
+                                           rate=float(os.environ.get('ORGANIZATIONS_WRITE_RATE', '2.0')),
+                                           capacity=int(os.environ.get('ORGANIZATIONS_WRITE_BURST', '5')))
+        return cls.writer
 
     @classmethod
     def get_tag_key(cls, suffix):
@@ -54,14 +187,31 @@ class Account:
     def validate_state(cls, text):
         return text in [state.value for state in State]
 
+    @classmethod
+    def forget(cls, account):
+        ''' invalidate cached information after a change of the account '''
+        logging.debug(f"Forgetting cached information on account '{account}'")
+        for kind in ['attributes', 'parent', 'tags']:
+            cls.cache.forget((kind, account))
+
+    @classmethod
+    def forget_tags(cls, account):
+        cls.cache.forget(('tags', account))
+
     @classmethod
     def list_tags(cls, account, session=None):
+        cached = cls.cache.get(('tags', account))
+        if cached is not None:
+            return dict(cached)
         try:
             tags = {}
             for item in cls.enumerate_tags(account, session):
                 tags[item.get('Key')] = item.get('Value')
+            cls.cache.put(('tags', account), dict(tags))
             return tags
-        except botocore.exceptions.ClientError:
+        except botocore.exceptions.ClientError as error:
+            if is_throttling(error):
+                raise
             return {}
 
     @classmethod
@@ -69,7 +219,7 @@ class Account:
         session = session or get_organizations_session()
 
         logging.debug("Enumerating all accounts")
-        chunk = session.client('organizations').list_accounts()
+        chunk = get_client('organizations', session=session).list_accounts()
         while chunk:
             logging.info("Enumerating {} accounts".format(len(chunk['Accounts'])))
             for item in chunk['Accounts']:
@@ -78,13 +228,21 @@ class Account:
 
             token = chunk.get('NextToken')
             if token:
-                chunk = session.client('organizations').list_accounts(NextToken=token)
+                chunk = get_client('organizations', session=session).list_accounts(NextToken=token)
             else:
                 break
 
     @classmethod
     def scan_all_accounts(cls, session=None):
-        return {x['Id']: cls.describe(id=x['Id']).__dict__ for x in cls.enumerate_all_accounts(session=session)}
+        if AccountDirectory.is_enabled():  # one table scan instead of thousands of Organizations calls
+            try:
+                directory = AccountDirectory()
+                if directory.is_reconciled():
+                    return directory.get_accounts()
+                logging.info("Directory of accounts has not been reconciled recently, reading the organization instead")
+            except botocore.exceptions.ClientError as error:
+                logging.warning(f"Unable to read the directory of accounts: {error}")
+        return OrganizationSnapshot.take(session=session).accounts
 
     @classmethod
     def enumerate_tags(cls, account, session=None):
@@ -92,7 +250,7 @@ class Account:
 
         logging.debug(f"Listing tags for account '{account}'")
         parameters = dict(ResourceId=account)
-        chunk = session.client('organizations').list_tags_for_resource(**parameters)
+        chunk = get_client('organizations', session=session).list_tags_for_resource(**parameters)
         while chunk:
             for item in chunk['Tags']:
                 logging.debug(json.dumps(item))
@@ -100,7 +258,7 @@ class Account:
 
             token = chunk.get('NextToken')
             if token:
-                chunk = session.client('organizations').list_tags_for_resource(**parameters, NextToken=token)
+                chunk = get_client('organizations', session=session).list_tags_for_resource(**parameters, NextToken=token)
             else:
                 break
 
@@ -111,34 +269,37 @@ class Account:
 
         logging.info(f"Tagging account '{account}' with state '{state.value}'")
         session = session or get_organizations_session()
-        session.client('organizations').tag_resource(
-            ResourceId=account,
-            Tags=[dict(Key=cls.get_tag_key('state'), Value=state.value)])
+        cls.writer.call(get_client('organizations', session=session).tag_resource,
+                        ResourceId=account,
+                        Tags=[dict(Key=cls.get_tag_key('state'), Value=state.value)])
+        cls.forget_tags(account)
         logging.debug("Done")
 
     @classmethod
     def tag(cls, account, tags, session=None):
         logging.info(f"Tagging account '{account}' with tags '{tags}'")
         session = session or get_organizations_session()
-        session.client('organizations').tag_resource(
-            ResourceId=account,
-            Tags=[dict(Key=k, Value=tags[k]) for k in tags.keys()])
+        cls.writer.call(get_client('organizations', session=session).tag_resource,
+                        ResourceId=account,
+                        Tags=[dict(Key=k, Value=tags[k]) for k in tags.keys()])
+        cls.forget_tags(account)
         logging.debug("Done")
 
     @classmethod
     def untag(cls, account, keys, session=None):
         logging.info(f"Untagging account '{account}' with tags '{keys}'")
         session = session or get_organizations_session()
-        session.client('organizations').untag_resource(
-            ResourceId=account,
-            TagKeys=list(keys))
+        cls.writer.call(get_client('organizations', session=session).untag_resource,
+                        ResourceId=account,
+                        TagKeys=list(keys))
+        cls.forget_tags(account)
         logging.debug("Done")
 
     @classmethod
     def list(cls, parent, skip=[], session=None):
         logging.debug(f"Listing accounts in parent '{parent}'")
         session = session or get_organizations_session()
-        handle = session.client('organizations')
+        handle = get_client('organizations', session=session)
         try:
             token = None
             while True:
@@ -161,22 +322,93 @@ class Account:
     @classmethod
     def describe(cls, id, session=None):
         session = session or get_organizations_session()
-        item = SimpleNamespace(id=id)
-        attributes = session.client('organizations').describe_account(AccountId=id)['Account']
-        item.arn = attributes['Arn']
-        item.email = attributes['Email']
-        item.name = attributes['Name']
-        item.is_active = True if attributes['Status'] == 'ACTIVE' else False
-        item.tags = cls.list_tags(account=id, session=session)
-        item.unit = cls.get_organizational_unit(account=id)
-        item.unit_name = cls.get_organizational_unit_name(account=id)
-        return item
+        attributes = cls.get_attributes(account=id, session=session)
+        return AccountRecord(id=id,
+                             arn=attributes['Arn'],
+                             email=attributes['Email'],
+                             name=attributes['Name'],
+                             is_active=True if attributes['Status'] == 'ACTIVE' else False,
+                             status=attributes['Status'],
+                             session=session)
 
     @classmethod
-    def get_account_label(cls, account, session=None) -> str:
+    def get_attributes(cls, account, session=None):
+        cached = cls.cache.get(('attributes', account))
+        if cached is not None:
+            return cached
         session = session or get_organizations_session()
+        attributes = get_client('organizations', session=session).describe_account(AccountId=account)['Account']
+        return cls.cache.put(('attributes', account), attributes)
+
+    @classmethod
+    def describe_many(cls, ids, max_workers=8, session=None, preload=('tags',)):
+        ''' describe accounts concurrently, and yield items as soon as they are available '''
+        session = session or get_organizations_session()
+        get_client('organizations', session=session)  # create client before threads compete for it
+
+        def describe(id):
+            try:
+                item = cls.limiter.call(cls.describe, id, session=session)
+                for name in preload:  # load attributes needed by the caller while in the pool of threads
+                    cls.limiter.call(getattr, item, name)
+                return item
+            except botocore.exceptions.ClientError as error:
+                if is_throttling(error):  # the limiter has given up, the account is not missing
+                    logging.error(f"Unable to describe account '{id}' because of throttling: {error}")
+                    raise
+                if error.response['Error']['Code'] == 'AccountNotFoundException':
+                    logging.error(f"Unable to describe account '{id}'. Does it exist? {error}")
+                else:
+                    logging.error(f"Unable to describe account '{id}': {error}")
+
+        for item in cls.map_concurrently(function=describe, ids=ids, max_workers=max_workers):
+            if item:
+                yield item
+
+    @staticmethod
+    def map_concurrently(function, ids, max_workers=8):
+        ''' apply function to each identifier in a pool of threads, and yield results in order of completion '''
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = set()
+            for id in ids:
+                pending.add(executor.submit(function, id))
+                if len(pending) >= 2 * max_workers:  # do not enumerate more identifiers than needed
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            for future in as_completed(pending):
+                yield future.result()
+
+    @classmethod
+    def resolve_labels(cls, ids, session=None, max_workers=8) -> dict:
+        ''' describe accounts concurrently, and return a label for each identifier '''
+        details = cls.resolve_details(ids=ids, session=session, max_workers=max_workers)
+        return {id: f"{item['name']} ({id})" if item.get('name') else id for id, item in details.items()}
+
+    @classmethod
+    def resolve_details(cls, ids, with_units=False, session=None, max_workers=8) -> dict:
+        ''' get name and organizational unit of accounts, with concurrent calls for those that are not in cache '''
+        session = session or get_organizations_session()
+        ids = list(dict.fromkeys(str(id) for id in ids))  # remove duplicates, preserve order
+
+        def resolve(id):
+            details = dict(id=id)
+            try:
+                details['name'] = cls.limiter.call(cls.get_attributes, account=id, session=session)['Name']
+                if with_units:
+                    details['unit_name'] = cls.limiter.call(cls.get_organizational_unit_name, account=id, session=session)
+            except botocore.exceptions.ClientError as error:
+                logging.warning(f"Unable to find account '{id}': {error}")
+            return details
+
+        if ids:
+            get_client('organizations', session=session)  # create client before threads compete for it
+        return {item['id']: item for item in cls.map_concurrently(function=resolve, ids=ids, max_workers=max_workers)}
+
+    @classmethod
+    def get_account_label(cls, account, session=None) -> str:
         try:
-            name = session.client('organizations').describe_account(AccountId=account)['Account']['Name']
+            name = cls.get_attributes(account=account, session=session)['Name']
             return f"{name} ({account})"
         except botocore.exceptions.ClientError:
             logging.warning(f"Unable to find account '{account}'")
@@ -184,9 +416,8 @@ class Account:
 
     @classmethod
     def get_name(cls, account, session=None):
-        session = session or get_organizations_session()
         try:
-            return session.client('organizations').describe_account(AccountId=account)['Account']['Name']
+            return cls.get_attributes(account=account, session=session)['Name']
         except botocore.exceptions.ClientError:
             logging.warning(f"Unable to find account '{account}'")
             return 'Unknown'
@@ -202,19 +433,114 @@ class Account:
     @classmethod
     def get_organizational_unit_details(cls, account, session=None):
         session = session or get_organizations_session()
-        try:
-            unit = session.client('organizations').list_parents(ChildId=account)['Parents'][0]['Id']
-        except botocore.exceptions.ClientError:
-            logging.warning(f"Unable to find parents of account '{account}'")
-            return dict()
+        unit = cls.cache.get(('parent', account))
+        if unit is None:
+            try:
+                unit = get_client('organizations', session=session).list_parents(ChildId=account)['Parents'][0]['Id']
+            except botocore.exceptions.ClientError as error:
+                if is_throttling(error):
+                    raise
+                logging.warning(f"Unable to find parents of account '{account}'")
+                return dict()
+            cls.cache.put(('parent', account), unit)
         if unit.startswith('r-'):
             return dict(Id=unit, Name='Root')
-        cached = cls.ou_cache.get(unit)
+        cached = cls.cache.get(('unit', unit))
         if cached:
             return cached
-        details = session.client('organizations').describe_organizational_unit(OrganizationalUnitId=unit)['OrganizationalUnit']
-        cls.ou_cache[unit] = details
-        return details
+        details = get_client('organizations', session=session).describe_organizational_unit(OrganizationalUnitId=unit)['OrganizationalUnit']
+        return cls.cache.put(('unit', unit), details)
+
+    @classmethod
+    def get_organizational_unit_path(cls, account, session=None):
+        names = []
+        child = account
+        while True:
+            details = cls.get_organizational_unit_details(account=child, session=session)
+            if not details:
+                return 'Unknown'
+            names.insert(0, details['Name'])
+            if details['Id'].startswith('r-'):
+                return '/'.join(names)
+            child = details['Id']
+
+    @classmethod
+    def get_parent(cls, child, session=None):
+        ''' return the parent of an account or of an organizational unit, or None if it cannot be found '''
+        parent = cls.cache.get(('parent', child))
+        if parent is None:
+            session = session or get_organizations_session()
+            try:
+                handle = get_client('organizations', session=session)
+                parent = cls.limiter.call(handle.list_parents, ChildId=child)['Parents'][0]['Id']
+            except botocore.exceptions.ClientError as error:
+                if is_throttling(error):
+                    raise
+                logging.warning(f"Unable to find parents of '{child}'")
+                return None
+            cls.cache.put(('parent', child), parent)
+        return parent
+
+    @classmethod
+    def get_ancestors(cls, account, session=None):
+        ''' list organizational units from the parent of an account up to the root, with memoization of each level '''
+        ancestors = []
+        child = account
+        while True:
+            cached = cls.cache.get(('ancestors', child))
+            if cached is not None:
+                ancestors.extend(cached)
+                break
+            parent = cls.get_parent(child=child, session=session)
+            if parent is None:
+                break
+            ancestors.append(parent)
+            if parent.startswith('r-'):
+                break
+            child = parent
+        for index, unit in enumerate(ancestors[:-1]):  # remember the chain of each unit that has been walked
+            cls.cache.put(('ancestors', unit), ancestors[index + 1:])
+        return ancestors
+
+    @classmethod
+    def list_descendant_units(cls, parents, session=None, max_workers=8):
+        ''' list organizational units below parents, with concurrent calls for each level of the tree '''
+        session = session or get_organizations_session()
+        handle = get_client('organizations', session=session)  # create client before threads compete for it
+
+        def list_children(parent):
+            return cls.list_child_units(parent=parent, handle=handle)
+
+        seen = set(parents)
+        units = []
+        level = list(dict.fromkeys(parents))
+        while level:
+            children = []
+            for items in cls.map_concurrently(function=list_children, ids=level, max_workers=max_workers):
+                for item in items:
+                    if item not in seen:
+                        seen.add(item)
+                        children.append(item)
+            units.extend(children)
+            level = children
+        return units
+
+    @classmethod
+    def list_child_units(cls, parent, handle):
+        ''' list organizational units directly below a parent, and remember the parent of each of them '''
+        def function(**parameters):
+            return cls.limiter.call(handle.list_organizational_units_for_parent, **parameters)
+
+        try:
+            children = [item['Id'] for item in OrganizationSnapshot.enumerate_pages(function, 'OrganizationalUnits', ParentId=parent)]
+        except botocore.exceptions.ClientError as error:
+            if is_throttling(error):
+                raise
+            logging.warning(f"Could not list organizational units in parent '{parent}'")
+            return []
+        for child in children:
+            cls.cache.put(('parent', child), parent)  # spare calls to list_parents() when settings are resolved
+        return children
 
     @classmethod
     def get_cost_management_tag(cls):
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Copyright Reply.com or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import logging
+import os
+from time import time
+
+from key_value_store import KeyValueStore
+
+
+class AccountDirectory:
+    ''' accounts of the organization, persisted in a DynamoDB table and updated on changes '''
+
+    EVENT_NAMES = [  # changes of the organization that are reflected in the directory
+        'CloseAccount',
+        'CreateAccountResult',
+        'MoveAccount',
+        'RemoveAccountFromOrganization',
+        'TagResource',
+        'UntagResource']
+
+    RECONCILIATION = 'Reconciliation'  # hash of the record written after each complete reconciliation
+
+    def __init__(self, table_name=None):
+        self.store = KeyValueStore(table_name=table_name or os.environ['ACCOUNTS_DIRECTORY_DATASTORE'])
+
+    @staticmethod
+    def is_enabled():
+        return bool(os.environ.get('ACCOUNTS_DIRECTORY_DATASTORE'))
+
+    @staticmethod
+    def build_records(snapshot):
+        records = {}
+        for account, attributes in snapshot.accounts.items():
+            records[account] = dict(attributes, path=snapshot.get_path(account))
+        return records
+
+    def get_account(self, account):
+        return self.store.retrieve(hash=str(account))
+
+    def put_account(self, record):
+        self.store.remember(hash=str(record['id']), value=record)
+
+    def forget_account(self, account):
+        self.store.forget(hash=str(account))
+
+    def get_accounts(self):
+        return {item['hash']: item['value'] for item in self.store.scan() if item['hash'] != self.RECONCILIATION}  # /!\ memory-bound
+
+    def mark_reconciliation(self, count, now=None):
+        self.store.remember(hash=self.RECONCILIATION, value=dict(reconciled_at=time() if now is None else now, count=count))
+
+    def is_reconciled(self, now=None):
+        ''' the directory is complete only if it has been reconciled recently with the organization '''
+        marker = self.store.retrieve(hash=self.RECONCILIATION)
+        if not marker:
+            return False
+        age = (time() if now is None else now) - marker['reconciled_at']
+        return age < 3600 * float(os.environ.get('ACCOUNTS_DIRECTORY_MAXIMUM_AGE_IN_HOURS', '36'))
+
+    def reconcile(self, records):
+        ''' repair drift between the directory and a fresh description of the organization '''
+        known = self.get_accounts()
+        counters = dict(written=0, removed=0, unchanged=0)
+        for account, record in records.items():
+            if known.get(account) == record:
+                counters['unchanged'] += 1
+                continue
+            logging.info(f"Updating directory record of account '{account}'")
+            self.put_account(record)
+            counters['written'] += 1
+        for account in known.keys():
+            if account not in records:
+                logging.info(f"Removing directory record of account '{account}'")
+                self.forget_account(account)
+                counters['removed'] += 1
+        return counters
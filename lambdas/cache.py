@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Copyright Reply.com or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+from collections import OrderedDict
+import threading
+import time
+
+
+class Cache:
+    ''' bounded memory of recent values, that survives warm invocations of lambda functions '''
+
+    def __init__(self, size=1024, ttl=300):
+        self.size = size  # maximum number of entries, least recently used ones are evicted first
+        self.ttl = ttl    # seconds before an entry expires
+        self.items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.items.get(key)
+            if entry and entry[0] > time.monotonic():
+                self.items.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self.items[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value, ttl=None):
+        with self.lock:
+            self.items[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self.items.move_to_end(key)
+            while len(self.items) > self.size:
+                self.items.popitem(last=False)
+        return value
+
+    def forget(self, key):
+        with self.lock:
+            self.items.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def get_statistics(self):
+        with self.lock:
+            return dict(hits=self.hits, misses=self.misses, size=len(self.items))
@@ -16,59 +16,197 @@ SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
 import botocore
+import hashlib
+import json
 import logging
+import os
 
 from logger import setup_logging, trap_exception
 setup_logging()
 
 from account import Account, State
+from checkpoint import Checkpoint
+from compliance import Compliance, Finding
+from key_value_store import KeyValueStore
 from settings import Settings
+from sweep import Sweep
 
 
 @trap_exception
 def handle_event(event=None, context=None):
-    logging.info("Checking managed accounts")
-    for account in Settings.enumerate_all_managed_accounts():
-        settings = Settings.get_settings_for_account(identifier=account)
-        handle_account(account=account, settings=settings)
+    force = bool((event or {}).get('force'))
+    logging.info("Checking all managed accounts" if force else "Checking managed accounts")
+    checks = get_table()
+    fingerprints = {}
+
+    def select_accounts():
+        ids = list(Settings.enumerate_all_managed_accounts())
+        fingerprints.update(get_fingerprints(ids) if checks else {})
+        if checks and not force:
+            ids = select_changed_accounts(ids=ids, fingerprints=fingerprints, checks=checks)
+        return ids
+
+    if Sweep.is_enabled():
+        ids = select_accounts()
+        Sweep.dispatch(operation='check', ids=ids, attributes=fingerprints)
+        if not ids:  # no shard will complete the sweep
+            report_compliance(compliance=Compliance(), checks=checks)
+    else:
+        checkpoint = Checkpoint(event=event, context=context)
+        ids = checkpoint.start(enumerate=select_accounts)  # continuations select accounts again, after those handled already
+        compliance = Compliance()
+        handle_shard(ids=ids, attributes=fingerprints, checks=checks, checkpoint=checkpoint, compliance=compliance)
+        if checkpoint.is_finished:
+            report_compliance(compliance=compliance, checks=checks, results=checkpoint.results)
     return '[OK]'
 
 
-def handle_account(account, settings=None):
+def handle_shard(ids, attributes=None, checks=None, checkpoint=None, compliance=None, started=None):
+    fingerprints = attributes or {}
+    checks = checks or get_table()
+    requested = []
+
+    def enumerate_ids():
+        for id in ids:
+            requested.append(id)
+            yield id
+
+    handled = set()
+    items = Account.describe_many(enumerate_ids())
+    for item in checkpoint.track(items) if checkpoint else items:
+        settings = Settings.get_settings_for_account(identifier=item.id, bulk=True)
+        flags = []
+        findings = handle_account(account=item.id, settings=settings, item=item, flags=flags)
+        record_account(account=item.id, findings=findings, flags=flags, fingerprint=fingerprints.get(item.id), checks=checks, checkpoint=checkpoint, compliance=compliance)
+        handled.add(item.id)
+    if checkpoint is None or checkpoint.is_finished:  # else accounts that have not been handled are pending for the next step
+        for id in requested:
+            if id not in handled:  # the account could not be described
+                record_account(account=id, findings=[f"Unable to handle account '{id}'"], flags=[Finding.UNREACHABLE], checks=checks, checkpoint=checkpoint, compliance=compliance)
+
+
+def record_account(account, findings, flags, fingerprint=None, checks=None, checkpoint=None, compliance=None):
+    if compliance is not None:
+        compliance.add(account=account, flags=sum(set(flags)))
+    if checks:  # accounts without fingerprint are checked again on next run, but are reported
+        checks.remember(hash=account, value=dict(fingerprint=fingerprint, findings=findings, flags=sum(set(flags))))
+    elif checkpoint:
+        checkpoint.results[account] = sum(set(flags))
+
+
+def handle_sweep_completion(summary):
+    report_compliance(compliance=Compliance(), checks=get_table())
+
+
+def report_compliance(compliance, checks=None, results=None):
+    ''' produce one report and aggregated metrics for all accounts, including those that have not changed since last check '''
+    managed = set(str(id) for id in Settings.enumerate_all_managed_accounts())  # the table keeps checks of accounts that are not managed anymore
+    if checks:
+        compliance.merge(records=(record for record in checks.scan() if record['hash'] in managed))
+    elif results:  # accounts handled in previous steps of a checkpointed run
+        compliance.merge(records=[dict(hash=id, value=dict(flags=flags)) for id, flags in results.items() if id in managed])
+    logging.info(f"Compliance findings on {len(compliance)} accounts: {compliance.count()}")
+    if os.environ.get('REPORTS_BUCKET_NAME'):
+        compliance.store_report()
+    compliance.publish()
+
+
+def get_table():
+    table_name = os.environ.get('METERING_CHECKS_DATASTORE')
+    if table_name:
+        return KeyValueStore(table_name=table_name, ttl=os.environ.get('METERING_CHECKS_TTL', str(7 * 24 * 60 * 60)))
+
+
+def get_fingerprints(ids):
+    accounts = Account.scan_all_accounts()  # one scan of the directory, or one walk of the organization
+    fingerprints = {}
+    for id in ids:
+        if id in accounts:
+            fingerprints[id] = get_fingerprint(record=accounts[id], settings=Settings.get_settings_for_account(identifier=id, bulk=True))
+    return fingerprints
+
+
+def get_fingerprint(record, settings=None):  # accounts are checked again when their settings change, e.g., expected tags
+    text = json.dumps(dict(tags=record.get('tags', {}),
+                           status=record.get('status'),
+                           is_active=record.get('is_active'),  # for records that do not carry the status
+                           unit=record.get('unit'),
+                           settings=settings or {}), sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def select_changed_accounts(ids, fingerprints, checks):
+    previous = {item['hash']: item['value'] for item in checks.scan()}
+    changed = []
+    for id in ids:
+        if fingerprints.get(id) and previous.get(id, {}).get('fingerprint') == fingerprints[id]:
+            for finding in previous[id].get('findings', []):
+                logging.warning(finding)
+            continue
+        changed.append(id)
+    logging.info(f"Checking {len(changed)} accounts that have changed, out of {len(ids)} managed accounts")
+    return changed
+
+
+def handle_account(account, settings=None, item=None, flags=None):
     logging.debug(f"Handling account '{account}'")
+    findings = []
+    flags = flags if flags is not None else []
     try:
-        item = Account.describe(account)
-        validate_tags(item)
-        validate_additional_tags(item, expected_tags=settings.get("account_tags", {}))
-    except ValueError as error:
+        item = item or Account.describe(account)
+        validate_tags(item, findings=findings, flags=flags)
+        validate_additional_tags(item, expected_tags=(settings or {}).get("account_tags", {}), findings=findings, flags=flags)
+    except NonCompliantAccount as error:
         logging.error(error)
+        findings.append(str(error))
+        flags.append(error.flag)
     except botocore.exceptions.ClientError:
         logging.error(f"Unable to handle account '{account}'. Does it exist?")
+        findings.append(f"Unable to handle account '{account}'")
+        flags.append(Finding.UNREACHABLE)
+    return findings
+
 
+class NonCompliantAccount(ValueError):
+    def __init__(self, message, flag):
+        super().__init__(message)
+        self.flag = flag
 
-def validate_tags(item):
+
+def validate_tags(item, findings=None, flags=None):
     key = Account.get_tag_key('holder')
     if key not in item.tags.keys():
-        raise ValueError(f"Account '{item.id}' has no tag '{key}'")
+        raise NonCompliantAccount(f"Account '{item.id}' has no tag '{key}'", flag=Finding.MISSING_HOLDER)
     holder = item.tags[key]
     if not Account.validate_holder(holder):
-        raise ValueError(f"Account '{item.id}' assigned to '{holder}' has invalid value for tag '{key}'")
+        raise NonCompliantAccount(f"Account '{item.id}' assigned to '{holder}' has invalid value for tag '{key}'", flag=Finding.MISSING_HOLDER)
 
     key = Account.get_tag_key('state')
     if key not in item.tags.keys():
-        raise ValueError(f"Account '{item.id}' assigned to '{holder}' has no tag '{key}'")
+        raise NonCompliantAccount(f"Account '{item.id}' assigned to '{holder}' has no tag '{key}'", flag=Finding.INVALID_STATE)
     state = item.tags[key]
     if not Account.validate_state(state):
-        raise ValueError(f"Account '{item.id}' assigned to '{holder}' has invalid value '{state}' for tag '{key}'")
+        raise NonCompliantAccount(f"Account '{item.id}' assigned to '{holder}' has invalid value '{state}' for tag '{key}'", flag=Finding.INVALID_STATE)
     if state not in [State.RELEASED.value]:
-        logging.warning(f"Account '{item.id}' assigned to '{holder}' is in transient state '{state}'")
+        report(f"Account '{item.id}' assigned to '{holder}' is in transient state '{state}'", findings=findings, flags=flags, flag=Finding.TRANSIENT_STATE)
     logging.info(f"Account '{item.id}' assigned to '{holder}' has been checked and is OK")
 
 
-def validate_additional_tags(item, expected_tags):
+def validate_additional_tags(item, expected_tags, findings=None, flags=None):
     holder = item.tags.get(Account.get_tag_key('holder'))
+    drift = []
     for key in expected_tags.keys():
         if key not in item.tags.keys():
-            logging.warning(f"Account '{item.id}' assigned to '{holder}' has no tag '{key}'")
+            report(f"Account '{item.id}' assigned to '{holder}' has no tag '{key}'", findings=findings, flags=drift, flag=Finding.TAG_DRIFT)
         elif item.tags[key] != expected_tags[key]:
-            logging.warning(f"Account '{item.id}' assigned to '{holder}' has unexpected value '{item.tags[key]}' for tag '{key}'")
+            report(f"Account '{item.id}' assigned to '{holder}' has unexpected value '{item.tags[key]}' for tag '{key}'", findings=findings, flags=drift, flag=Finding.TAG_DRIFT)
+    if drift and flags is not None:
+        flags.append(Finding.TAG_DRIFT)  # counted once per account
+
+
+def report(finding, findings=None, flags=None, flag=None):
+    logging.warning(finding)
+    if findings is not None:
+        findings.append(finding)
+    if flags is not None and flag:
+        flags.append(flag)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Copyright Reply.com or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import json
+import logging
+import os
+from time import time
+from uuid import uuid4
+
+from clients import get_client
+from sweep import Sweep
+
+
+class Checkpoint:
+    ''' remember progress of a loop over accounts, and continue it in another invocation before a timeout '''
+
+    RANGE = 'checkpoint'  # records of checkpoints are in the table of sweeps
+
+    def __init__(self, event=None, context=None, store=None, margin=None):
+        self.event = event or {}
+        self.context = context
+        self.run = self.event.get('run') or self.event.get('id') or str(uuid4())  # scheduled events come with a unique identifier
+        self.step = int(self.event.get('step', 0))
+        self.margin = margin if margin is not None else int(os.environ.get('CHECKPOINT_MARGIN_IN_SECONDS', '90'))
+        self.store = store or Sweep.get_table()
+        self.ids = []
+        self.pulled = []
+        self.handled = set()
+        self.cursor = ''  # accounts are handled in order of identifiers, up to this one
+        self.pending = []  # accounts up to the cursor that have not been handled yet
+        self.started = time()  # carried across invocations, e.g., for slots of a maintenance window
+        self.results = {}  # carried across invocations, e.g., findings on accounts handled in previous steps
+        self.is_active = False
+        self.is_finished = False
+
+    def start(self, enumerate):
+        ''' yield identifiers to handle in this invocation, or nothing if this step has been handled already '''
+        record = self.store.retrieve(hash=self.run, range=self.RANGE) if self.store else None
+        if record and record.get('step') == self.step and self.is_resumable(record):
+            self.cursor = record.get('cursor', '')
+            self.pending = record.get('pending', [])
+            self.started = record.get('started', self.started)
+            self.results = self.load_results()
+            logging.info(f"Continuing run '{self.run}' at step {self.step} after account '{self.cursor}'")
+        elif not (self.step == 0 and record is None):
+            logging.warning(f"Ignoring duplicate invocation for step {self.step} of run '{self.run}'")
+            return iter([])
+        following = sorted(id for id in set(str(id) for id in enumerate()) if id > self.cursor)
+        self.ids = self.pending + following
+        self.save(step=self.step, cursor=self.cursor, pending=self.pending, started=self.started,
+                  claimed=True, request=self.get_request(), lease=time() + self.get_remaining_seconds())
+        self.is_active = True
+        return self.pull()
+
+    def is_resumable(self, record):
+        ''' a step is resumed if it has not been claimed, if it is retried, or if the invocation that claimed it is over '''
+        if record.get('finished'):
+            return False
+        if not record.get('claimed'):
+            return True
+        if record.get('request') and record.get('request') == self.get_request():  # asynchronous retry of a failed invocation
+            return True
+        return record.get('lease', 0) < time()
+
+    def pull(self):
+        ''' yield identifiers, and remember how far they have been consumed '''
+        for id in self.ids:
+            self.pulled.append(id)
+            yield id
+
+    def track(self, items):
+        ''' yield items until time runs short, then continue with remaining items in another invocation '''
+        for item in items:
+            if self.is_running_out_of_time():
+                self.suspend()
+                return
+            yield item
+            self.handled.add(item.id)
+        self.finish()
+
+    def is_running_out_of_time(self):
+        if self.context is None:
+            return False
+        return self.context.get_remaining_time_in_millis() < 1000 * self.margin
+
+    def get_remaining_seconds(self):
+        if self.context is None:
+            return 900  # the longest duration of a Lambda function
+        return self.context.get_remaining_time_in_millis() / 1000
+
+    def get_request(self):
+        return getattr(self.context, 'aws_request_id', None)
+
+    def suspend(self):
+        pending = [id for id in self.pulled if id not in self.handled]
+        cursor = max([self.cursor] + self.pulled)
+        if not (self.is_active and self.store):
+            logging.warning(f"Unable to continue run '{self.run}', accounts after '{cursor}' and {len(pending)} other accounts have been skipped")
+            return
+        logging.info(f"Suspending run '{self.run}' at step {self.step} after account '{cursor}', with {len(pending)} pending accounts")
+        self.save_results()
+        self.save(step=self.step + 1, cursor=cursor, pending=pending, started=self.started, claimed=False)
+        get_client('lambda').invoke(FunctionName=self.context.invoked_function_arn,
+                                    InvocationType='Event',
+                                    Payload=json.dumps(dict(self.event, run=self.run, step=self.step + 1)))  # with options of the original event
+        self.is_active = False
+
+    def finish(self):
+        if self.is_active:
+            logging.info(f"Completed run '{self.run}' at step {self.step}")
+            self.save_results()
+            self.save(step=self.step, cursor=max([self.cursor] + self.pulled), pending=[], started=self.started, claimed=True, finished=True)
+            self.is_active = False
+            self.is_finished = True
+
+    def save(self, **value):
+        if self.store:
+            self.store.remember(hash=self.run, range=self.RANGE, value=value)
+
+    def save_results(self):
+        ''' one record per step, so that the size of records does not grow with the number of accounts '''
+        step_results = {id: value for id, value in self.results.items() if id in self.handled}
+        if self.store and step_results:
+            self.store.remember(hash=self.run, range=f"{self.RANGE}#{self.step}", value=step_results)
+
+    def load_results(self):
+        results = {}
+        for record in self.store.enumerate(hash=self.run):
+            if record['range'].startswith(f"{self.RANGE}#") and int(record['range'].split('#')[1]) < self.step:
+                results.update(record['value'])
+        return results
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Copyright Reply.com or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+from boto3.session import Session
+import botocore.session
+from botocore.config import Config
+import os
+from threading import Lock
+from weakref import WeakKeyDictionary
+
+default_session = None  # shared across warm invocations
+
+clients = WeakKeyDictionary()  # clients per session, released with the session
+clients_lock = Lock()  # creation of clients is not thread-safe in boto3
+
+
+def get_config():
+    ''' settings given to every client created from sessions of this module '''
+    return Config(max_pool_connections=int(os.environ.get('CLIENT_MAX_POOL_CONNECTIONS', '32')),
+                  connect_timeout=int(os.environ.get('CLIENT_CONNECT_TIMEOUT_IN_SECONDS', '5')),
+                  read_timeout=int(os.environ.get('CLIENT_READ_TIMEOUT_IN_SECONDS', '60')),
+                  retries=dict(mode='adaptive', max_attempts=int(os.environ.get('CLIENT_MAX_ATTEMPTS', '8'))))
+
+
+def get_config_for_service(service):
+    ''' settings that override defaults for a given service, if any '''
+    if service == 'organizations':  # throttling is left to the pacing of calls in the account module
+        return Config(retries=dict(mode='standard', total_max_attempts=int(os.environ.get('ORGANIZATIONS_MAX_ATTEMPTS', '2'))))
+    return None
+
+
+def build_session(**parameters):
+    ''' create a session whose clients are configured for lambda functions '''
+    core = botocore.session.get_session()
+    core.set_default_client_config(get_config())
+    return Session(botocore_session=core, **parameters)
+
+
+def get_default_session():
+    global default_session
+    with clients_lock:
+        if not default_session:
+            default_session = build_session()
+    return default_session
+
+
+def get_client(service, session=None, region=None):
+    ''' get a client from cache, or create it '''
+    session = session or get_default_session()
+    key = (service, region)
+    with clients_lock:
+        cached = clients.setdefault(session, {})
+        if key not in cached:
+            parameters = dict(region_name=region) if region else {}
+            config = get_config_for_service(service)
+            if config:
+                parameters['config'] = config  # merged with the default config of the session
+            cached[key] = session.client(service, **parameters)
+        return cached[key]
+
+
+def forget_clients():
+    global default_session
+    with clients_lock:
+        clients.clear()
+        default_session = None
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Copyright Reply.com or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+from array import array
+from csv import DictWriter
+from datetime import date
+from enum import IntFlag
+import io
+import logging
+import os
+
+from clients import get_client
+from metric import put_metric_data
+
+
+class Finding(IntFlag):
+    ''' types of findings on a managed account, combined in a single integer per account '''
+    MISSING_HOLDER = 1
+    INVALID_STATE = 2
+    TRANSIENT_STATE = 4
+    TAG_DRIFT = 8
+    UNREACHABLE = 16
+
+
+class Compliance:
+    ''' compliance of managed accounts, kept in flat arrays so that memory does not grow with objects per account '''
+
+    def __init__(self):
+        self.accounts = array('Q')  # account identifiers have 12 digits
+        self.flags = array('B')
+
+    def __len__(self):
+        return len(self.accounts)
+
+    def add(self, account, flags=0):
+        self.accounts.append(int(account))
+        self.flags.append(int(flags))
+
+    def merge(self, records):
+        ''' add flags of accounts checked in previous runs, e.g., from the table of checks '''
+        known = set(self.accounts)
+        for record in records:
+            if record['hash'].isdigit() and int(record['hash']) not in known:
+                self.add(account=record['hash'], flags=record['value'].get('flags', 0))
+
+    def items(self):
+        for account, flags in zip(self.accounts, self.flags):
+            yield f"{account:012d}", Finding(flags)
+
+    def count(self):
+        counts = {finding.name: 0 for finding in Finding}
+        for flags in self.flags:
+            for finding in Finding:
+                if flags & finding:
+                    counts[finding.name] += 1
+        return counts
+
+    def build_report(self):
+        buffer = io.StringIO()
+        writer = DictWriter(buffer, fieldnames=['Account', 'Compliant'] + [finding.name for finding in Finding])
+        writer.writeheader()
+        for account, flags in self.items():
+            row = {'Account': account, 'Compliant': 'no' if flags else 'yes'}
+            row.update({finding.name: 'x' if flags & finding else '' for finding in Finding})
+            writer.writerow(row)
+        return buffer.getvalue()
+
+    @staticmethod
+    def get_report_path(today=None):
+        today = today or date.today()
+        return '/'.join([os.environ.get("REPORTING_COMPLIANCE_PREFIX", 'SpaReports/Compliance'),
+                         f"{today.year:04d}",
+                         f"{today.month:02d}",
+                         f"{today.year:04d}-{today.month:02d}-{today.day:02d}-compliance.csv"])
+
+    def store_report(self):
+        logging.info(f"Storing compliance report on {len(self)} accounts")
+        get_client("s3").put_object(Bucket=os.environ['REPORTS_BUCKET_NAME'],
+                                    Key=self.get_report_path(),
+                                    Body=self.build_report())
+
+    def publish(self):
+        for name, value in self.count().items():
+            put_metric_data(name='ComplianceFindings',
+                            dimensions=[dict(Name='Finding', Value=name),
+                                        dict(Name='Environment', Value=os.environ.get('ENVIRONMENT_IDENTIFIER', 'Spa'))],
+                            value=value)
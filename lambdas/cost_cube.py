@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Copyright Reply.com or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+from array import array
+
+
+class CostCube:
+    ''' amounts of costs in a float column, with one column of interned codes per dimension '''
+
+    DIMENSIONS = ('cost_center', 'unit', 'account', 'name', 'value')  # value is the charge, the service or the usage type
+
+    def __init__(self, dimension='service'):
+        self.dimension = dimension  # the key of values in breakdowns, e.g., 'charge', 'service' or 'usage'
+        self.codes = {name: {} for name in self.DIMENSIONS}
+        self.labels = {name: [] for name in self.DIMENSIONS}
+        self.columns = {name: array('I') for name in self.DIMENSIONS}
+        self.amounts = array('d')
+        self.indexes = {}  # positions of rows per code, built on first selection
+
+    def __len__(self):
+        return len(self.amounts)
+
+    @classmethod
+    def of(cls, costs, dimension='service', cost_center=None, account=None):
+        ''' use a cube as-is, or build it from breakdowns of costs per cost center, or from a single breakdown '''
+        if isinstance(costs, cls):
+            return costs
+        if not isinstance(costs, dict):  # a list, or a generator of items
+            costs = {cost_center: costs}
+        cube = cls(dimension=dimension)
+        for key, breakdown in costs.items():
+            for item in breakdown:
+                cube.add(cost_center=key,
+                         unit=item.get('unit', ''),
+                         account=item.get('account', account),  # breakdowns of one account do not repeat it
+                         name=item.get('name', ''),
+                         value=item[dimension],
+                         amount=item['amount'])
+        return cube
+
+    def add(self, cost_center, unit, account, name, value, amount):
+        for dimension, label in zip(self.DIMENSIONS, (cost_center, unit, account, name, value)):
+            self.columns[dimension].append(self.intern(dimension, label))
+        self.amounts.append(float(amount))  # amounts are parsed only once
+        self.indexes.clear()
+
+    def intern(self, dimension, label):
+        codes = self.codes[dimension]
+        code = codes.get(label)
+        if code is None:
+            code = codes[label] = len(self.labels[dimension])
+            self.labels[dimension].append(label)
+        return code
+
+    def get_values(self, dimension):
+        return sorted(self.labels[dimension], key=str)
+
+    def select(self, where=None):
+        ''' list positions of rows that match all conditions, e.g., where=dict(cost_center='abc') '''
+        positions = range(len(self.amounts))
+        for dimension, label in (where or {}).items():
+            code = self.codes[dimension].get(label)
+            if isinstance(positions, range):  # one pass over the column for all labels, then direct lookups
+                positions = self.get_index(dimension).get(code, [])
+            else:
+                column = self.columns[dimension]
+                positions = [position for position in positions if column[position] == code]
+        return positions
+
+    def get_index(self, dimension):
+        if dimension not in self.indexes:
+            index = {}
+            for position, code in enumerate(self.columns[dimension]):
+                index.setdefault(code, array('I')).append(position)
+            self.indexes[dimension] = index
+        return self.indexes[dimension]
+
+    def rows(self, dimensions=DIMENSIONS, where=None):
+        ''' yield decoded labels and amount of each matching row, in order of insertion '''
+        columns = [(self.columns[dimension], self.labels[dimension]) for dimension in dimensions]
+        for position in self.select(where):
+            yield tuple(labels[column[position]] for column, labels in columns) + (self.amounts[position],)
+
+    def group_by(self, dimensions, where=None):
+        ''' sum amounts per combination of labels, in order of first appearance '''
+        columns = [self.columns[dimension] for dimension in dimensions]
+        sums = {}
+        for position in self.select(where):
+            key = tuple(column[position] for column in columns)
+            sums[key] = sums.get(key, 0.0) + self.amounts[position]
+        labels = [self.labels[dimension] for dimension in dimensions]
+        return {tuple(labels[index][code] for index, code in enumerate(key)): amount for key, amount in sums.items()}
+
+    def sum(self, where=None):
+        return sum(self.amounts[position] for position in self.select(where))
+
+    def pivot(self, dimensions, column='value', where=None):
+        ''' sum amounts per combination of labels, with one entry per label of the column dimension '''
+        table = {}
+        for key, amount in self.group_by(tuple(dimensions) + (column,), where=where).items():
+            cells = table.setdefault(key[:-1], {})
+            cells[key[-1]] = amount
+        return table
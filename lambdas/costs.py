@@ -15,14 +15,22 @@ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
 SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
+import botocore
 from csv import DictWriter
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta, timezone
+import gzip
+import hashlib
 import io
+import json
 import logging
+import os
+from time import time
 import xlsxwriter
 from xlsxwriter.utility import xl_rowcol_to_cell
 
 from account import Account
+from clients import get_client
+from cost_cube import CostCube
 from session import get_account_session, get_organizations_session
 
 
@@ -31,6 +39,80 @@ class Costs:
     # record types that are only visible to member accounts
     COSTLY_RECORDS = ['Usage', 'Upfront', 'Recurring', 'Support', 'Tax', 'Other']
 
+    # costs of a period are not updated anymore a few days after its end
+    CLOSED_AFTER_DAYS = 5
+
+    # stale days of stored costs that are fetched one by one, else the whole range is fetched with one request
+    MAXIMUM_DAILY_REQUESTS = 2
+
+    # cached costs of closed periods are fetched again on this day of next month, since late adjustments are still possible
+    CLOSED_CACHE_EXPIRATION_DAY = 15
+
+    # views of monthly costs per account, as the second dimension of grouping and a filter on costly records
+    MONTHLY_VIEWS = dict(charge=('RECORD_TYPE', False),
+                         service=('SERVICE', True),
+                         usage=('USAGE_TYPE', True))
+
+    @classmethod
+    def get_cost_and_usage(cls, costs, today=None, refresh=False, **parameters):
+        ''' call Cost Explorer, or reuse a previous response to the same request, unless refresh is set '''
+        bucket = os.environ.get('REPORTS_BUCKET_NAME')
+        prefix = os.environ.get('COSTS_CACHE_PREFIX')
+        if not (bucket and prefix):
+            return costs.get_cost_and_usage(**parameters)
+
+        key = cls.get_cache_key(prefix=prefix, parameters=parameters)
+        chunk = None if refresh else cls.read_cached_chunk(bucket=bucket, key=key)
+        if chunk is None:
+            chunk = costs.get_cost_and_usage(**parameters)
+            expiration = cls.get_cache_expiration(period=parameters['TimePeriod'], today=today)
+            cls.write_cached_chunk(bucket=bucket, key=key, chunk=chunk, expiration=expiration)
+        return chunk
+
+    @staticmethod
+    def get_cache_key(prefix, parameters):
+        text = json.dumps(parameters, sort_keys=True, separators=(',', ':'))  # same request, same key
+        return f"{prefix}/{hashlib.sha256(text.encode()).hexdigest()}.json.gz"
+
+    @classmethod
+    def is_closed_period(cls, period, today=None):
+        today = today or date.today()
+        return date.fromisoformat(period['End']) + timedelta(days=cls.CLOSED_AFTER_DAYS) <= today
+
+    @classmethod
+    def get_cache_expiration(cls, period, today=None):
+        ''' keep costs of open periods for a short time, and costs of closed periods until next month '''
+        if not cls.is_closed_period(period=period, today=today):
+            return time() + int(os.environ.get('COSTS_CACHE_TTL_IN_SECONDS', '3600'))
+        today = today or date.today()
+        expiration = (today.replace(day=1) + timedelta(days=32)).replace(day=cls.CLOSED_CACHE_EXPIRATION_DAY)
+        return datetime(expiration.year, expiration.month, expiration.day, tzinfo=timezone.utc).timestamp()
+
+    @staticmethod
+    def read_cached_chunk(bucket, key):
+        try:
+            response = get_client('s3').get_object(Bucket=bucket, Key=key)
+        except botocore.exceptions.ClientError:  # not cached yet
+            return None
+        expiration = response.get('Metadata', {}).get('expiration')
+        if expiration and float(expiration) < time():
+            logging.debug(f"Cached costs at '{key}' have expired")
+            return None
+        logging.debug(f"Using cached costs at '{key}'")
+        return json.loads(gzip.decompress(response['Body'].read()))
+
+    @staticmethod
+    def write_cached_chunk(bucket, key, chunk, expiration):
+        content = {name: value for name, value in chunk.items() if name != 'ResponseMetadata'}
+        metadata = dict(expiration=str(expiration))
+        try:
+            get_client('s3').put_object(Bucket=bucket,
+                                        Key=key,
+                                        Body=gzip.compress(json.dumps(content).encode()),
+                                        Metadata=metadata)
+        except botocore.exceptions.ClientError as exception:  # the cache is an optimization, not a requirement
+            logging.warning(exception)
+
     @classmethod
     def enumerate_daily_costs_per_account(cls, day=None, session=None):
         logging.info("Fetching daily cost and usage information per account")
@@ -38,13 +120,13 @@ class Costs:
         start = day
         end = day + timedelta(days=1)
         session = session or get_organizations_session()
-        costs = session.client('ce')
+        costs = get_client('ce', session=session)
         parameters = dict(TimePeriod=dict(Start=start.isoformat()[:10], End=end.isoformat()[:10]),
                           Granularity='DAILY',
                           Metrics=['UnblendedCost'],
                           Filter=dict(Dimensions=dict(Key='RECORD_TYPE', Values=cls.COSTLY_RECORDS)),
                           GroupBy=[dict(Type='DIMENSION', Key='LINKED_ACCOUNT')])
-        chunk = costs.get_cost_and_usage(**parameters)
+        chunk = cls.get_cost_and_usage(costs, **parameters)
         logging.debug(chunk)
         while chunk.get('ResultsByTime'):
             for result in chunk['ResultsByTime']:
@@ -53,24 +135,191 @@ class Costs:
                     amount = group['Metrics']['UnblendedCost']['Amount']
                     yield account, float(amount)
             if chunk.get('NextPageToken'):
-                chunk = costs.get_cost_and_usage(NextPageToken=chunk.get('NextPageToken'), **parameters)
+                chunk = cls.get_cost_and_usage(costs, NextPageToken=chunk.get('NextPageToken'), **parameters)
                 logging.debug(chunk)
             else:
                 break
 
+    @classmethod
+    def enumerate_daily_services_per_account(cls, day=None, session=None):
+        logging.info("Fetching daily service costs per account")
+        day = day or date.today()
+        session = session or get_organizations_session()
+        costs = get_client('ce', session=session)
+        parameters = dict(TimePeriod=dict(Start=day.isoformat()[:10], End=(day + timedelta(days=1)).isoformat()[:10]),
+                          Granularity='DAILY',
+                          Metrics=['UnblendedCost'],
+                          Filter=dict(Dimensions=dict(Key='RECORD_TYPE', Values=cls.COSTLY_RECORDS)),
+                          GroupBy=[dict(Type='DIMENSION', Key='LINKED_ACCOUNT'),
+                                   dict(Type='DIMENSION', Key='SERVICE')])
+        for account, breakdown in cls.fetch_breakdowns_per_account(costs=costs, parameters=parameters, label='service').items():
+            for item in breakdown:
+                yield account, item['service'], item['amount']
+
+    @staticmethod
+    def get_daily_store_key(day):
+        return '/'.join([os.environ['COSTS_DAILY_PREFIX'],
+                         f"{day.year:04d}",
+                         f"{day.month:02d}",
+                         f"{day.isoformat()[:10]}.json.gz"])
+
+    @classmethod
+    def store_daily_services(cls, day, rows):
+        ''' persist rows of (account, service, amount) for one day, in one compressed object '''
+        logging.info(f"Storing {len(rows)} daily service costs for {day.isoformat()[:10]}")
+        get_client('s3').put_object(Bucket=os.environ['REPORTS_BUCKET_NAME'],
+                                    Key=cls.get_daily_store_key(day),
+                                    Body=gzip.compress(json.dumps(rows, separators=(',', ':')).encode()))
+
+    @classmethod
+    def load_daily_services(cls, day):
+        try:
+            response = get_client('s3').get_object(Bucket=os.environ['REPORTS_BUCKET_NAME'], Key=cls.get_daily_store_key(day))
+        except botocore.exceptions.ClientError:  # this day has not been ingested
+            return None
+        return json.loads(gzip.decompress(response['Body'].read()))
+
+    @staticmethod
+    def get_days_of_month(day):
+        start = day.replace(day=1)
+        end = (start + timedelta(days=32)).replace(day=1)
+        return [start + timedelta(days=offset) for offset in range((end - start).days)]
+
+    @classmethod
+    def enumerate_monthly_services_per_account_from_store(cls, day=None, rows_per_day=None):
+        ''' aggregate a month of daily service costs, or return None if some days are missing '''
+        day = day or date.today()
+        rows_per_day = rows_per_day or {}
+        amounts = {}
+        for current in cls.get_days_of_month(day):
+            rows = rows_per_day[current] if current in rows_per_day else cls.load_daily_services(current)
+            if rows is None:
+                logging.info(f"Daily service costs for {current.isoformat()[:10]} have not been stored")
+                return None
+            for account, service, amount in rows:
+                amounts[(account, service)] = amounts.get((account, service), 0.0) + float(amount)
+
+        breakdowns_per_account = {}
+        for (account, service), amount in amounts.items():
+            breakdowns_per_account.setdefault(account, []).append({'account': account, 'service': service, 'amount': str(amount)})
+        return breakdowns_per_account.items()
+
+    @classmethod
+    def get_stored_monthly_services(cls, day=None, session=None):
+        ''' aggregate stored daily costs, once days that differ from Cost Explorer have been stored again '''
+        if not os.environ.get('COSTS_DAILY_PREFIX'):
+            return None
+        rows_per_day = cls.reconcile_monthly_services(day=day, session=session)
+        breakdowns = cls.enumerate_monthly_services_per_account_from_store(day=day, rows_per_day=rows_per_day)
+        if breakdowns is None:
+            return None
+        logging.info("Using stored daily service costs")
+        return list(breakdowns)
+
+    @classmethod
+    def reconcile_monthly_services(cls, day=None, session=None, tolerance=0.01, today=None):
+        ''' store again past days that are missing or that differ from Cost Explorer, e.g., on late adjustments, and return rows per day '''
+        day = day or date.today()
+        today = today or date.today()
+        expected = cls.get_daily_totals_per_account(day=day, session=session, refresh=True)  # not cached, to see late adjustments
+        rows_per_day = {}
+        stale = []
+        for current in cls.get_days_of_month(day):
+            if current >= today:  # costs of this day are not complete yet
+                break
+            rows = cls.load_daily_services(current)
+            totals = expected.get(current.isoformat()[:10], {})
+            if rows is None or cls.is_drifting(rows=rows, totals=totals, tolerance=tolerance):
+                stale.append(current)
+            else:
+                rows_per_day[current] = rows
+
+        if len(stale) > cls.MAXIMUM_DAILY_REQUESTS:  # one request for the whole range, instead of one request per day
+            periods = [(stale[0], stale[-1] + timedelta(days=1))]
+        else:
+            periods = [(current, current + timedelta(days=1)) for current in stale]
+        for start, end in periods:
+            fetched = cls.fetch_daily_services_per_account(start=start, end=end, session=session)
+            for current in stale:
+                if start <= current < end:
+                    logging.info(f"Storing again daily service costs for {current.isoformat()[:10]}")
+                    rows_per_day[current] = fetched.get(current.isoformat()[:10], [])
+                    cls.store_daily_services(day=current, rows=rows_per_day[current])
+        return rows_per_day
+
+    @classmethod
+    def fetch_daily_services_per_account(cls, start, end, session=None):
+        ''' get rows of (account, service, amount) for each day of a period, with one request to Cost Explorer '''
+        parameters = dict(TimePeriod=dict(Start=start.isoformat()[:10], End=end.isoformat()[:10]),
+                          Granularity='DAILY',
+                          Metrics=['UnblendedCost'],
+                          Filter=dict(Dimensions=dict(Key='RECORD_TYPE', Values=cls.COSTLY_RECORDS)),
+                          GroupBy=[dict(Type='DIMENSION', Key='LINKED_ACCOUNT'),
+                                   dict(Type='DIMENSION', Key='SERVICE')])
+        session = session or get_organizations_session()
+        costs = get_client('ce', session=session)
+        rows_per_day = {}
+        chunk = cls.get_cost_and_usage(costs, refresh=True, **parameters)  # stored days differ from cached responses as well
+        while chunk.get('ResultsByTime'):
+            for result in chunk['ResultsByTime']:
+                rows = rows_per_day.setdefault(result['TimePeriod']['Start'], [])
+                for group in result['Groups']:
+                    rows.append([group['Keys'][0], group['Keys'][1], group['Metrics']['UnblendedCost']['Amount']])
+            if not chunk.get('NextPageToken'):
+                break
+            chunk = cls.get_cost_and_usage(costs, refresh=True, NextPageToken=chunk.get('NextPageToken'), **parameters)
+        return rows_per_day
+
+    @classmethod
+    def get_daily_totals_per_account(cls, day=None, session=None, refresh=False):
+        ''' get the total of each account on each day of the month, with one request to Cost Explorer '''
+        day = day or date.today()
+        start = day.replace(day=1)
+        end = (start + timedelta(days=32)).replace(day=1)
+        parameters = dict(TimePeriod=dict(Start=start.isoformat()[:10], End=end.isoformat()[:10]),
+                          Granularity='DAILY',
+                          Metrics=['UnblendedCost'],
+                          Filter=dict(Dimensions=dict(Key='RECORD_TYPE', Values=cls.COSTLY_RECORDS)),
+                          GroupBy=[dict(Type='DIMENSION', Key='LINKED_ACCOUNT')])
+        session = session or get_organizations_session()
+        costs = get_client('ce', session=session)
+        totals = {}
+        chunk = cls.get_cost_and_usage(costs, refresh=refresh, **parameters)
+        while chunk.get('ResultsByTime'):
+            for result in chunk['ResultsByTime']:
+                amounts = totals.setdefault(result['TimePeriod']['Start'], {})
+                for group in result['Groups']:
+                    amounts[group['Keys'][0]] = float(group['Metrics']['UnblendedCost']['Amount'])
+            if not chunk.get('NextPageToken'):
+                break
+            chunk = cls.get_cost_and_usage(costs, refresh=refresh, NextPageToken=chunk.get('NextPageToken'), **parameters)
+        return totals
+
+    @staticmethod
+    def is_drifting(rows, totals, tolerance=0.01):
+        stored = {}
+        for account, _, amount in rows:
+            stored[account] = stored.get(account, 0.0) + float(amount)
+        for account in set(totals.keys()) | set(stored.keys()):
+            if abs(totals.get(account, 0.0) - stored.get(account, 0.0)) > tolerance:
+                logging.warning(f"Stored costs of account '{account}' differ from Cost Explorer, "
+                                f"{stored.get(account, 0.0):.2f} instead of {totals.get(account, 0.0):.2f}")
+                return True
+        return False
+
     @classmethod
     def enumerate_monthly_costs_for_account(cls, account, day=None, session=None):
         logging.info(f"Fetching monthly cost and usage information for account '{account}'...")
         day = day or date.today()
         session = session or get_account_session(account=account)
-        costs = session.client('ce')
+        costs = get_client('ce', session=session)
         parameters = dict(TimePeriod=dict(Start=day.replace(day=1).isoformat()[:10], End=day.isoformat()[:10]),
                           Granularity='MONTHLY',
                           Metrics=['UnblendedCost'],
                           Filter=dict(And=[dict(Dimensions=dict(Key='LINKED_ACCOUNT', Values=[account])),
                                            dict(Dimensions=dict(Key='RECORD_TYPE', Values=cls.COSTLY_RECORDS))]),
                           GroupBy=[dict(Type='DIMENSION', Key='SERVICE')])
-        chunk = costs.get_cost_and_usage(**parameters)
+        chunk = cls.get_cost_and_usage(costs, **parameters)
         logging.debug(chunk)
         while chunk.get('ResultsByTime'):
             for result in chunk['ResultsByTime']:
@@ -80,7 +329,7 @@ class Costs:
                            'service': group['Keys'][0],
                            'amount': float(group['Metrics']['UnblendedCost']['Amount'])}
             if chunk.get('NextPageToken'):
-                chunk = costs.get_cost_and_usage(NextPageToken=chunk.get('NextPageToken'), **parameters)
+                chunk = cls.get_cost_and_usage(costs, NextPageToken=chunk.get('NextPageToken'), **parameters)
                 logging.debug(chunk)
             else:
                 break
@@ -94,6 +343,10 @@ class Costs:
     @classmethod
     def enumerate_monthly_services_per_account(cls, day=None, session=None):
         logging.info("Fetching monthly service costs per account")
+        breakdowns = cls.get_stored_monthly_services(day=day, session=session)
+        if breakdowns is not None:
+            yield from breakdowns
+            return
         filter = dict(Dimensions=dict(Key='RECORD_TYPE', Values=cls.COSTLY_RECORDS))  # same data as seen from member accounts
         for account, breakdown in cls._enumerate_monthly_costs_per_account_for_dimension(dimension='SERVICE', label='service', filter=filter, day=day, session=session):
             yield account, breakdown
@@ -107,15 +360,20 @@ class Costs:
 
     @classmethod
     def _enumerate_monthly_costs_per_account_for_dimension(cls, dimension, label, filter=None, day=None, session=None):
-        if dimension not in ['RECORD_TYPE', 'SERVICE', 'USAGE_TYPE']:
-            raise ValueError("Invalid dimension, should be RECORD_TYPE or SERVICE")
         logging.debug(f"Fetching monthly information per account for dimension {dimension}")
         label = label or dimension.lower()
+        parameters = cls.get_monthly_parameters(dimension=dimension, filter=filter, day=day)
+        session = session or get_organizations_session()
+        costs = get_client('ce', session=session)
+        return cls.fetch_breakdowns_per_account(costs=costs, parameters=parameters, label=label).items()
+
+    @staticmethod
+    def get_monthly_parameters(dimension, filter=None, day=None):
+        if dimension not in ['RECORD_TYPE', 'SERVICE', 'USAGE_TYPE']:
+            raise ValueError("Invalid dimension, should be RECORD_TYPE or SERVICE")
         day = day or date.today()
         start = day.replace(day=1)                         # first day of this month is included
         end = (start + timedelta(days=32)).replace(day=1)  # first day of next month is excluded
-        session = session or get_organizations_session()
-        costs = session.client('ce')
         parameters = dict(TimePeriod=dict(Start=start.isoformat()[:10], End=end.isoformat()[:10]),
                           Granularity='MONTHLY',
                           Metrics=['UnblendedCost'],
@@ -123,7 +381,11 @@ class Costs:
                                    dict(Type='DIMENSION', Key=dimension)])
         if filter:
             parameters['Filter'] = filter
-        chunk = costs.get_cost_and_usage(**parameters)
+        return parameters
+
+    @classmethod
+    def fetch_breakdowns_per_account(cls, costs, parameters, label):
+        chunk = cls.get_cost_and_usage(costs, **parameters)
         logging.debug(chunk)
         breakdowns_per_account = {}
         while chunk.get('ResultsByTime'):
@@ -136,11 +398,50 @@ class Costs:
                     cumulated.append({'account': account, label: breakdown, 'amount': amount})
                     breakdowns_per_account[account] = cumulated
             if chunk.get('NextPageToken'):
-                chunk = costs.get_cost_and_usage(NextPageToken=chunk.get('NextPageToken'), **parameters)
+                chunk = cls.get_cost_and_usage(costs, NextPageToken=chunk.get('NextPageToken'), **parameters)
                 logging.debug(chunk)
             else:
                 break
-        return breakdowns_per_account.items()
+        return breakdowns_per_account
+
+    @classmethod
+    def plan_monthly_queries(cls, labels, day=None):
+        ''' list distinct requests to Cost Explorer, each with the labels of views that it covers '''
+        plan = {}
+        for label in dict.fromkeys(labels):  # remove duplicates, preserve order
+            if label not in cls.MONTHLY_VIEWS.keys():
+                raise ValueError(f"Unexpected view '{label}' of monthly costs")
+            dimension, costly = cls.MONTHLY_VIEWS[label]
+            filter = dict(Dimensions=dict(Key='RECORD_TYPE', Values=cls.COSTLY_RECORDS)) if costly else None
+            parameters = cls.get_monthly_parameters(dimension=dimension, filter=filter, day=day)
+            key = json.dumps(parameters, sort_keys=True)
+            plan.setdefault(key, (parameters, []))[1].append(label)
+        return list(plan.values())
+
+    @classmethod
+    def enumerate_monthly_views_per_account(cls, labels, day=None, session=None, max_workers=3):
+        ''' fetch several views of monthly costs with the minimum number of concurrent requests '''
+        views = {}
+        if 'service' in labels:
+            stored = cls.get_stored_monthly_services(day=day, session=session)
+            if stored is not None:  # no need to query Cost Explorer for this view
+                views['service'] = stored
+                labels = [label for label in labels if label != 'service']
+
+        plan = cls.plan_monthly_queries(labels=labels, day=day)
+        logging.info(f"Fetching {len(plan)} monthly views per account: {', '.join(dict.fromkeys(labels))}")
+        session = session or get_organizations_session()
+        costs = get_client('ce', session=session)
+
+        def fetch(query):
+            parameters, labels = query
+            return labels, cls.fetch_breakdowns_per_account(costs=costs, parameters=parameters, label=labels[0])
+
+        for labels, breakdowns_per_account in Account.map_concurrently(fetch, plan, max_workers=max_workers):
+            for label in labels:  # the same response is split across views
+                views[label] = [(account, [dict(account=item['account'], amount=item['amount'], **{label: item[labels[0]]}) for item in breakdown])
+                                for account, breakdown in breakdowns_per_account.items()]
+        return views
 
     @classmethod
     def get_charges_per_cost_center(cls, accounts, day=None, session=None):
@@ -163,14 +464,30 @@ class Costs:
                                               day=day,
                                               session=session)
 
+    @classmethod
+    def get_views_per_cost_center(cls, labels, accounts, day=None, session=None):
+        ''' get several views of monthly costs per cost center, and resolve unknown accounts only once '''
+        views = cls.enumerate_monthly_views_per_account(labels=labels, day=day, session=session)
+        unknown = {account for breakdowns in views.values() for account, _ in breakdowns if not accounts.get(str(account), {}).get('name')}
+        resolved = Account.resolve_details(ids=sorted(unknown), with_units=True)  # closed accounts are not in the organization anymore
+        return {label: cls._set_cost_centers(breakdowns=breakdowns, accounts=accounts, resolved=resolved) for label, breakdowns in views.items()}
+
     @classmethod
     def _get_costs_per_cost_center(cls, map_function, accounts, day=None, session=None):
+        breakdowns = list(map_function(day=day, session=session))
+        unknown = [account for account, _ in breakdowns if not accounts.get(str(account), {}).get('name')]
+        resolved = Account.resolve_details(ids=unknown, with_units=True)  # closed accounts are not in the organization anymore
+        return cls._set_cost_centers(breakdowns=breakdowns, accounts=accounts, resolved=resolved)
+
+    @staticmethod
+    def _set_cost_centers(breakdowns, accounts, resolved):
         costs = {}
-        for account, breakdown in map_function(day=day, session=session):
+        for account, breakdown in breakdowns:
             logging.debug(f"Processing costs for account '{account}'")
             attributes = accounts.get(str(account), {})
-            more = dict(name=attributes.get('name') or Account.get_name(account),
-                        unit=attributes.get('unit_name') or Account.get_organizational_unit_name(account))
+            details = resolved.get(str(account), {})
+            more = dict(name=attributes.get('name') or details.get('name') or 'Unknown',
+                        unit=attributes.get('unit_name') or details.get('unit_name') or 'Unknown')
             for item in breakdown:
                 item.update(more)
             logging.debug(breakdown)
@@ -192,11 +509,12 @@ class Costs:
         worksheet.write_row(0, 0, headers)
         widths = {index: len(headers[index]) for index in range(len(headers))}
         row = 1
-        for item in breakdown:
+        cube = CostCube.of(breakdown, dimension='service', account=account)
+        for service, amount in cube.rows(dimensions=('value',)):
             data = [day.isoformat()[:7],
                     str(account),
-                    str(item['service']),
-                    float(item['amount'])]
+                    str(service),
+                    amount]
             worksheet.write_row(row, 0, data)
             for index in range(len(data)):
                 widths[index] = max(widths[index], len(str(data[index])))
@@ -235,16 +553,15 @@ class Costs:
         buffer = io.StringIO()
         writer = DictWriter(buffer, fieldnames=['Month', 'Cost Center', 'Organizational Unit', 'Account', 'Name', label, 'Amount (USD)'])
         writer.writeheader()
-        total = 0.0
-        for item in breakdown:
-            amount = float(item['amount'])
-            total += amount
+        cube = CostCube.of(breakdown, dimension=dimension, cost_center=cost_center)
+        where = dict(cost_center=cost_center)
+        for unit, account, name, value, amount in cube.rows(dimensions=('unit', 'account', 'name', 'value'), where=where):
             row = {'Month': day.isoformat()[:7],
                    'Cost Center': cost_center,
-                   'Account': item['account'],
-                   'Name': item.get('name', ''),
-                   'Organizational Unit': item.get('unit', ''),
-                   label: item[dimension],
+                   'Account': account,
+                   'Name': name,
+                   'Organizational Unit': unit,
+                   label: value,
                    'Amount (USD)': amount}
             writer.writerow(row)
         row = {'Month': day.isoformat()[:7],
@@ -253,7 +570,7 @@ class Costs:
                'Name': '',
                'Organizational Unit': '',
                label: '',
-               'Amount (USD)': total}
+               'Amount (USD)': cube.sum(where=where)}
         writer.writerow(row)
         return buffer.getvalue()
 
@@ -269,14 +586,15 @@ class Costs:
         worksheet.write_row(0, 0, headers)
         widths = {index: len(headers[index]) for index in range(len(headers))}
         row = 1
-        for item in breakdown:
+        cube = CostCube.of(breakdown, dimension='service', cost_center=cost_center)
+        for unit, account, name, service, amount in cube.rows(dimensions=('unit', 'account', 'name', 'value'), where=dict(cost_center=cost_center)):
             data = [day.isoformat()[:7],
                     str(cost_center),
-                    str(item['unit']),
-                    str(item['account']),
-                    str(item['name']),
-                    str(item['service']),
-                    float(item['amount'])]
+                    str(unit),
+                    str(account),
+                    str(name),
+                    str(service),
+                    amount]
             worksheet.write_row(row, 0, data)
             for index in range(len(data)):
                 widths[index] = max(widths[index], len(str(data[index])))
@@ -295,24 +613,15 @@ class Costs:
     def build_summary_of_charges_csv_report(cls, charges, day):
         logging.info("Building CSV report: summary of charges")
         buffer = io.StringIO()
-        types = set()
-        for cost_center in charges.keys():
-            types = types.union(set(item['charge'] for item in charges[cost_center]))
-        labels = {k: f"{k} (USD)" for k in types}
+        cube = CostCube.of(charges, dimension='charge')
+        labels = {k: f"{k} (USD)" for k in cube.get_values('value')}
         headers = ['Month', 'Cost Center', 'Organizational Unit', 'Account', 'Charges (USD)']
         headers.extend(sorted(list(labels.values())))
         logging.debug(headers)
         writer = DictWriter(buffer, fieldnames=headers)
         writer.writeheader()
-        for cost_center in sorted(charges.keys()):
-            units = {}
-            for item in charges[cost_center]:
-                accounts = units.get(item['unit']) or {}
-                label = f"{item['name']} ({item['account']})"
-                values = accounts.get(label) or []
-                values.append(item)
-                accounts[label] = values
-                units[item['unit']] = accounts
+        for cost_center in cube.get_values('cost_center'):
+            units = cls._set_breakdowns_per_unit_and_per_account(cube=cube, cost_center=cost_center)
             for name in sorted(units.keys()):
                 accounts = units[name]
                 for account in sorted(accounts.keys()):
@@ -321,10 +630,8 @@ class Costs:
                            'Cost Center': cost_center,
                            'Organizational Unit': name,
                            'Account': account}
-                    for item in accounts[account]:
-                        header = labels[item['charge']]
-                        amount = float(item['amount'])
-                        row[header] = amount
+                    for charge, amount in accounts[account].items():
+                        row[labels[charge]] = amount
                         total += amount
                     row['Charges (USD)'] = total
                     logging.debug(row)
@@ -337,10 +644,8 @@ class Costs:
         buffer = io.BytesIO()
         workbook = xlsxwriter.Workbook(buffer)
         worksheet = workbook.add_worksheet()
-        types = set()
-        for cost_center in charges.keys():
-            types = types.union(set(item['charge'] for item in charges[cost_center]))
-        labels = sorted(types)
+        cube = CostCube.of(charges, dimension='charge')
+        labels = cube.get_values('value')
         headers = ['Month', 'Cost Center', 'Organizational Unit', 'Account', f"Charges ({currency})"]
         headers.extend([f"{label} ({currency})" for label in labels])
         logging.debug(headers)
@@ -349,8 +654,8 @@ class Costs:
         units_subs = []
         row = 1
         month = day.isoformat()[:7]
-        for cost_center in sorted(charges.keys()):
-            units = cls._set_breakdowns_per_unit_and_per_account(items=charges[cost_center])
+        for cost_center in cube.get_values('cost_center'):
+            units = cls._set_breakdowns_per_unit_and_per_account(cube=cube, cost_center=cost_center)
             accounts_subs = []
             for unit in sorted(units.keys()):
                 unit_head = row
@@ -388,21 +693,16 @@ class Costs:
         writer = DictWriter(buffer, fieldnames=['Month', 'Cost Center', 'Organizational Unit', 'Amount (USD)'])
         writer.writeheader()
         summary = 0.0
-        for cost_center in sorted(costs.keys()):
-            units = {}
-            total = 0.0
-            for item in costs[cost_center]:
-                amount = float(item['amount'])
-                name = item['unit']
-                value = units.get(name, 0.0)
-                units[name] = value + amount
-                total += amount
+        cube = CostCube.of(costs, dimension='service')
+        for cost_center in cube.get_values('cost_center'):
+            where = dict(cost_center=cost_center)
+            total = cube.sum(where=where)
             summary += total
-            for name in units.keys():
+            for (name,), amount in cube.group_by(dimensions=('unit',), where=where).items():
                 row = {'Month': day.isoformat()[:7],
                        'Cost Center': cost_center,
                        'Organizational Unit': name,
-                       'Amount (USD)': units[name]}
+                       'Amount (USD)': amount}
                 writer.writerow(row)
             row = {'Month': day.isoformat()[:7],
                    'Cost Center': cost_center,
@@ -430,16 +730,11 @@ class Costs:
         subs = []
         row = 1
         month = day.isoformat()[:7]
-        for cost_center in sorted(costs.keys()):
+        cube = CostCube.of(costs, dimension='service')
+        for cost_center in cube.get_values('cost_center'):
             head = row
-            units = {}
-            for item in costs[cost_center]:
-                amount = float(item['amount'])
-                name = item['unit']
-                value = units.get(name, 0.0)
-                units[name] = value + amount
-            for name in units.keys():
-                data = [month, str(cost_center), name, units[name]]
+            for (name,), amount in cube.group_by(dimensions=('unit',), where=dict(cost_center=cost_center)).items():
+                data = [month, str(cost_center), name, amount]
                 worksheet.write_row(row, 0, data)
                 worksheet.set_row(row, None, None, {'level': 2, 'hidden': True})
                 row += 1
@@ -463,15 +758,10 @@ class Costs:
         return buffer.getvalue()
 
     @staticmethod
-    def _set_breakdowns_per_unit_and_per_account(items):
+    def _set_breakdowns_per_unit_and_per_account(cube, cost_center):
         units = {}
-        for item in items:
-            accounts = units.get(item['unit']) or {}
-            label = f"{item['name']} ({item['account']})"
-            amounts = accounts.get(label) or {}
-            amounts[item['charge']] = float(item['amount'])
-            accounts[label] = amounts
-            units[item['unit']] = accounts
+        for (unit, name, account), amounts in cube.pivot(dimensions=('unit', 'name', 'account'), where=dict(cost_center=cost_center)).items():
+            units.setdefault(unit, {})[f"{name} ({account})"] = amounts
         return units
 
     @staticmethod
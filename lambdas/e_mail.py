@@ -15,7 +15,6 @@ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
 SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
-from boto3.session import Session
 from email import encoders
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
@@ -23,6 +22,8 @@ from email.mime.base import MIMEBase
 import logging
 import os
 
+from clients import get_client
+
 
 class Email:
 
@@ -58,8 +59,7 @@ class Email:
             raise ValueError("Missing object prefix 's3://'")
         bucket, key = object[5:].split('/', 1)
         logging.debug(f"Looking for S3 bucket '{bucket}' and object '{key}'")
-        session = session or Session()
-        s3 = session.client('s3')
+        s3 = get_client('s3', session=session)
         stream = s3.get_object(Bucket=bucket, Key=key)['Body']
         return cls.get_mime_attachment(name=os.path.basename(key), content=stream.read())
 
@@ -76,8 +76,7 @@ class Email:
     @classmethod
     def send_raw_email(cls, sender: str, recipients: str, raw: str, session=None) -> str:
         logging.debug("Sending SES raw message")
-        session = session or Session()
-        ses = session.client('ses')
+        ses = get_client('ses', session=session)
         if isinstance(recipients, str):
             recipients = [recipient.strip() for recipient in recipients.split(',')]
         logging.debug(f"From: '{sender}'")
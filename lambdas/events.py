@@ -15,7 +15,6 @@ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
 SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
-from boto3.session import Session
 import json
 import logging
 import os
@@ -24,6 +23,7 @@ from types import SimpleNamespace
 from uuid import uuid4
 
 from account import Account
+from clients import get_client
 
 
 class Events:
@@ -138,6 +138,8 @@ class Events:
         if len(decoded.account) != 12:
             raise ValueError(f"Invalid account identifier '{decoded.account}'")
 
+        Account.forget(decoded.account)  # the account has moved, cached information is obsolete
+
         decoded.organizational_unit = event['detail']['requestParameters']['destinationParentId']
         if matches and decoded.organizational_unit not in matches:
             logging.debug(matches)
@@ -145,6 +147,32 @@ class Events:
 
         return decoded
 
+    @staticmethod
+    def decode_organization_change_event(event, matches=None):
+        decoded = SimpleNamespace()
+
+        decoded.name = event['detail']['eventName']
+        if matches and decoded.name not in matches:
+            raise ValueError(f"Unexpected event name '{decoded.name}'")
+
+        if decoded.name == 'CreateAccountResult':  # service event issued on completion of CreateAccount
+            status = event['detail']['serviceEventDetails']['createAccountStatus']
+            if status.get('state') != 'SUCCEEDED':
+                raise ValueError(f"Account has not been created, state is '{status.get('state')}'")
+            decoded.account = status['accountId']
+        else:
+            parameters = event['detail']['requestParameters']
+            decoded.account = parameters.get('accountId') or parameters.get('resourceId') or ''
+        if len(decoded.account) != 12 or not decoded.account.isdigit():
+            raise ValueError(f"Invalid account identifier '{decoded.account}'")
+
+        if decoded.name in ('TagResource', 'UntagResource'):
+            Account.forget_tags(decoded.account)
+        else:
+            Account.forget(decoded.account)
+
+        return decoded
+
     @classmethod
     def decode_spa_event(cls, event, match=None):
         decoded = SimpleNamespace()
@@ -179,6 +207,8 @@ class Events:
         if len(decoded.account) != 12:
             raise ValueError(f"Invalid account identifier '{decoded.account}'")
 
+        Account.forget_tags(decoded.account)  # tags have changed, cached values are obsolete
+
         expected = Account.get_tag_key('state')
         for item in event['detail']['requestParameters']['tags']:
             if item['key'] == expected:
@@ -232,8 +262,7 @@ class Events:
     @classmethod
     def put_event(cls, event, session=None):
         logging.info(f"Putting event {event}")
-        session = session or Session()
-        session.client('events').put_events(Entries=[event])
+        get_client('events', session=session).put_events(Entries=[event])
         logging.debug("Done")
 
     @staticmethod
@@ -15,17 +15,18 @@ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
 SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
-import boto3
 import json
 import logging
 from time import time
 
+from clients import get_client
+
 
 class KeyValueStore:
 
     def __init__(self, table_name, ttl=0):
         logging.debug(f"Using key-value store on DynamoDB table '{table_name}'")
-        self.dynamodb = boto3.client('dynamodb')
+        self.dynamodb = get_client('dynamodb')
         self.table_name = table_name
         self.ttl = ttl or (366 * 24 * 60 * 60)  # default is one year TTL
 
@@ -45,6 +46,17 @@ class KeyValueStore:
                                      'Expiration': dict(N=str(int(time()) + int(self.ttl)))},
                                ReturnValues='NONE')
 
+    def add_to_set(self, hash, attribute, values, range='-'):
+        ''' add strings to a set attribute of an existing record, and return the set before the update '''
+        logging.debug(f"Adding {values} to attribute '{attribute}' of record {hash}/{range} in key-value store '{self.table_name}'")
+        result = self.dynamodb.update_item(TableName=self.table_name,
+                                           Key={'Identifier': dict(S=hash), 'Order': dict(S=range)},
+                                           UpdateExpression="ADD #attribute :values",
+                                           ExpressionAttributeNames={'#attribute': attribute},
+                                           ExpressionAttributeValues={':values': dict(SS=list(values))},
+                                           ReturnValues='ALL_OLD')  # the previous set, even if it is not changed
+        return set(result.get('Attributes', {}).get(attribute, {}).get('SS', []))
+
     def retrieve(self, hash, range='-'):
         logging.debug(f"Retrieving record {hash}/{range} from key-value store '{self.table_name}'")
         result = self.dynamodb.get_item(TableName=self.table_name,
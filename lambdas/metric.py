@@ -15,9 +15,10 @@ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
 SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
-from boto3.session import Session
 import logging
 
+from clients import get_client
+
 
 def put_metric_data(name, dimensions, value=1, unit='Count', timestamp=None, session=None):
     logging.debug(f"Putting data for metric '{name}' and dimensions '{dimensions}'")
@@ -27,7 +28,6 @@ def put_metric_data(name, dimensions, value=1, unit='Count', timestamp=None, ses
                       Value=value)
     if timestamp:
         parameters['Timestamp'] = timestamp
-    session = session or Session()
-    session.client('cloudwatch').put_metric_data(MetricData=[parameters],
-                                                 Namespace="SustainablePersonalAccount")
+    get_client('cloudwatch', session=session).put_metric_data(MetricData=[parameters],
+                                                              Namespace="SustainablePersonalAccount")
     logging.debug("Done")
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Copyright Reply.com or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import json
+import logging
+
+from logger import setup_logging, trap_exception
+setup_logging()
+
+from account import Account
+from account_directory import AccountDirectory
+from events import Events
+from organization import OrganizationSnapshot
+
+
+@trap_exception
+def handle_organization_event(event, context=None, session=None):
+    logging.debug(json.dumps(event))
+    input = Events.decode_organization_change_event(event=event, matches=AccountDirectory.EVENT_NAMES)
+    directory = AccountDirectory()
+    if input.name == 'RemoveAccountFromOrganization':
+        directory.forget_account(input.account)
+    elif input.name in ('TagResource', 'UntagResource'):
+        update_tags(account=input.account, directory=directory, session=session)
+    else:
+        update_account(account=input.account, directory=directory, session=session)
+    return f"[OK] {input.name} {input.account}"
+
+
+def update_tags(account, directory, session=None):
+    record = directory.get_account(account)
+    if not record:
+        return update_account(account=account, directory=directory, session=session)
+    logging.info(f"Updating tags of account '{account}' in directory")
+    record['tags'] = Account.list_tags(account=account, session=session)
+    directory.put_account(record)
+
+
+def update_account(account, directory, session=None):
+    logging.info(f"Updating account '{account}' in directory")
+    record = Account.describe(account, session=session).to_dict()
+    record['path'] = Account.get_organizational_unit_path(account=account, session=session)
+    directory.put_account(record)
+
+
+@trap_exception
+def handle_reconciliation(event=None, context=None, session=None):
+    logging.info("Reconciling the directory of accounts with the organization")
+    records = AccountDirectory.build_records(OrganizationSnapshot.take(session=session))
+    directory = AccountDirectory()
+    counters = directory.reconcile(records)
+    directory.mark_reconciliation(count=len(records))  # the directory can be read instead of the organization
+    logging.info(f"Directory has been reconciled: {counters}")
+    return "[OK]"
@@ -15,7 +15,6 @@ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
 SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
-import boto3
 import botocore
 from csv import DictWriter
 from datetime import date
@@ -28,9 +27,12 @@ from logger import setup_logging, trap_exception
 setup_logging()
 
 from account import Account
+from account_directory import AccountDirectory
+from clients import get_client
 from events import Events
 from key_value_store import KeyValueStore
 from metric import put_metric_data
+from organization import OrganizationSnapshot
 from settings import Settings
 
 
@@ -39,6 +41,7 @@ def handle_account_event(event, context=None, emit=None):
     input = Events.decode_account_event(event)
     update_shadow_on_account_event(input)
     put_metrics(input)
+    logging.info(f"Account cache: {Account.cache.get_statistics()}")
     return f"[OK] {input.label} {input.account}"
 
 
@@ -46,8 +49,9 @@ def update_shadow_on_account_event(input):
     logging.info(f"Remembering '{input.label}' for '{input.account}'")
     shadows = get_table()
     shadow = shadows.retrieve(hash=str(input.account)) or {}
+    Account.forget_tags(input.account)  # tags are changed by other functions before they emit account events
     try:
-        shadow.update(Account.describe(input.account).__dict__)
+        shadow.update(Account.describe(input.account).to_dict())
     except botocore.exceptions.ClientError:
         logging.warning(f"No information could be found for account {input.account}")
     if input.label == 'PreparationReport':
@@ -155,18 +159,15 @@ def get_table():
                          ttl=os.environ.get('METERING_SHADOWS_TTL', str(181 * 24 * 60 * 60)))
 
 
-def build_report(records):
+def build_report(records, units=None):
     logging.info("Building inventory report from shadows")
+    units = units if units is not None else get_organizational_unit_names()
     buffer = io.StringIO()
     writer = DictWriter(buffer, fieldnames=['Cost Center', 'Cost Owner', 'Organizational Unit', 'Account', 'Name', 'Email', 'State', 'Console Login'])
     writer.writeheader()
     for record in records:
         item = record['value']
-        try:
-            ou_name = Account.get_organizational_unit_name(item['id'])
-        except Exception as exception:
-            logging.warning(exception)
-            ou_name = "Unknown"
+        ou_name = units.get(item['id'], 'Unknown')
         row = {'Account': item['id'],
                'Cost Center': Account.get_cost_center(item['tags']),
                'Cost Owner': item['tags']['cost-owner'],
@@ -179,6 +180,20 @@ def build_report(records):
     return buffer.getvalue()
 
 
+def get_organizational_unit_names():
+    if AccountDirectory.is_enabled():
+        try:
+            return {account: record['unit_name'] for account, record in AccountDirectory().get_accounts().items()}
+        except botocore.exceptions.ClientError as exception:
+            logging.warning(exception)
+    try:
+        snapshot = OrganizationSnapshot.take(with_tags=False)  # one walk of the organization, instead of one call per account
+    except botocore.exceptions.ClientError as exception:
+        logging.warning(exception)
+        return {}
+    return {account: attributes['unit_name'] for account, attributes in snapshot.accounts.items()}
+
+
 def get_report_path(today=None):
     today = today or date.today()
     return '/'.join([os.environ["REPORTING_INVENTORIES_PREFIX"],
@@ -190,6 +205,6 @@ def get_report_path(today=None):
 def store_report(report):
     logging.info("Storing inventory report")
     logging.debug(report)
-    boto3.client("s3").put_object(Bucket=os.environ['REPORTS_BUCKET_NAME'],
-                                  Key=get_report_path(),
-                                  Body=report)
+    get_client("s3").put_object(Bucket=os.environ['REPORTS_BUCKET_NAME'],
+                                Key=get_report_path(),
+                                Body=report)
@@ -15,7 +15,6 @@ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
 SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
-import boto3
 from csv import DictWriter
 from datetime import date, datetime, timedelta
 import io
@@ -28,6 +27,7 @@ from logger import setup_logging, trap_exception
 setup_logging()
 
 from account import Account
+from clients import get_client
 from events import Events
 from key_value_store import KeyValueStore
 from metric import put_metric_data
@@ -140,9 +140,9 @@ def get_reporter():
 def store_report(label, report):
     logging.info("Storing activity report")
     logging.debug(report)
-    boto3.client("s3").put_object(Bucket=os.environ['REPORTS_BUCKET_NAME'],
-                                  Key=get_report_path(label),
-                                  Body=report)
+    get_client("s3").put_object(Bucket=os.environ['REPORTS_BUCKET_NAME'],
+                                Key=get_report_path(label),
+                                Body=report)
 
 
 def get_report_path(label, day=None):
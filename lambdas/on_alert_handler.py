@@ -62,17 +62,28 @@ def handle_codebuild_event(event, context, session=None):
 @trap_exception
 def handle_sqs_event(event, context, session=None):
     logging.info("Receiving budget alerts from queue")
+    labels = Account.resolve_labels(ids=get_account_ids(event['Records']), session=session)  # one pass for a storm of alerts
     for record in event['Records']:
-        handle_sqs_record(record, session=session)
+        handle_sqs_record(record, session=session, labels=labels)
     return '[OK]'
 
 
-def handle_sqs_record(record, session=None):
+def get_account_ids(records):
+    ids = []
+    for record in records:
+        try:
+            ids.append(json.loads(record['body'])['TopicArn'].split(':')[4])
+        except (json.decoder.JSONDecodeError, KeyError, IndexError):
+            continue
+    return ids
+
+
+def handle_sqs_record(record, session=None, labels={}):
     logging.debug(record)
     try:
         body = json.loads(record['body'])
         account_id = body['TopicArn'].split(':')[4]
-        label = Account.get_account_label(account=account_id, session=session)
+        label = labels.get(account_id) or Account.get_account_label(account=account_id, session=session)
         Events.emit_exception_event(label='BudgetAlertException',
                                     payload=dict(account=account_id,
                                                  message=get_notification_message(account=label, message=body['Message']),
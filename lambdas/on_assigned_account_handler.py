@@ -15,50 +15,81 @@ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
 SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
-from boto3.session import Session
 from botocore.exceptions import ClientError
 import json
 import os
 import logging
 
-from logger import setup_logging, trap_exception
+from logger import setup_logging
 setup_logging()
 
-from account import Account, State
+from account import Account, AccountTagSession, State
+from clients import get_client
 from events import Events
+from session import SessionPool
 from settings import Settings
 from worker import Worker
 
 
-@trap_exception
-def handle_tag_event(event, context, session=None):
+def handle_tag_event(event, context, session=None):  # no trap_exception, failed messages are reported to the queue
+    failures = []
+    messages = {}
+    settings = {}
     for record in event['Records']:
-        detail = json.loads(record['body'])
-        logging.debug(detail)
-        item = dict(detail=detail)
-        logging.debug(json.dumps(item))
-        input = Events.decode_tag_account_event(event=item, match=State.ASSIGNED)
-        handle_account(input.account, session=session)
-    return '[OK]'
-
-
-def handle_account(account, session=None):
-    settings = Settings.get_settings_for_account(identifier=account, session=session)
+        try:
+            detail = json.loads(record['body'])
+            logging.debug(detail)
+            input = Events.decode_tag_account_event(event=dict(detail=detail), match=State.ASSIGNED)
+            settings[input.account] = Settings.get_settings_for_account(identifier=input.account, session=session)
+            messages[input.account] = record['messageId']
+        except Exception as error:
+            logging.exception(error)
+            failures.append(dict(itemIdentifier=record['messageId']))
+
+    pool = SessionPool(max_workers=int(os.environ.get('SESSION_POOL_MAX_WORKERS', '8')), session=session)
+    for account, member in enumerate_accounts(settings=settings, pool=pool):
+        try:
+            handle_account(account, settings=settings[account], session=session, member=member)
+        except Exception as error:  # do not lose other accounts of the batch
+            logging.exception(f"Unable to handle account '{account}': {error}")
+            failures.append(dict(itemIdentifier=messages[account]))
+    logging.info(f"Sessions to assigned accounts: {pool.get_statistics()}")
+    return dict(batchItemFailures=failures)
+
+
+def enumerate_accounts(settings, pool):
+    ''' yield (account, member session), roles are assumed concurrently and only in accounts to prepare '''
+    to_prepare = []
+    for account, item in settings.items():
+        if is_preparation_enabled(item):
+            to_prepare.append(account)
+        else:
+            yield account, None
+    if to_prepare:
+        yield from pool.enumerate_sessions(to_prepare)  # accounts are prepared one by one
+
+
+def is_preparation_enabled(settings):
+    return settings.get('preparation', {}).get('feature') == 'enabled'
+
+
+def handle_account(account, settings, session=None, member=None):
     result = Events.emit_account_event('AssignedAccount', account)
-    if 'preparation' not in settings.keys() or settings['preparation'].get('feature') != 'enabled':
+    if not is_preparation_enabled(settings):
         logging.info("Skipping the preparation of the account")
         Account.set_state(account=account, state=State.RELEASED, session=session)
     else:
         tag_account(account=account, settings=settings, session=session)
         topic_arn = prepare_topic(account=account, session=session)
-        prepare_account(account=account, settings=settings, topic_arn=topic_arn, session=session)
+        prepare_account(account=account, settings=settings, topic_arn=topic_arn, session=session, member=member)
     return result
 
 
 def tag_account(account, settings, session=None):
     tags = settings.get("account_tags", {})
     if tags:
-        Account.tag(account, tags, session=session)
+        with AccountTagSession(account, session=session) as changes:  # skip tags that are in place already
+            changes.tag(tags)
 
 
 def prepare_topic(account, session=None):
@@ -67,18 +98,17 @@ def prepare_topic(account, session=None):
     return topic_arn
 
 
-def prepare_account(account, settings, topic_arn, session=None):
+def prepare_account(account, settings, topic_arn, session=None, member=None):
     Worker.prepare(details=Account.describe(id=account, session=session),
                    settings=settings,
                    event_bus_arn=os.environ['EVENT_BUS_ARN'],
                    topic_arn=topic_arn,
                    buildspec=get_buildspec(session=session),
-                   session=session)
+                   session=member)  # assumed in the account by the pool, or assumed again by the worker if None
 
 
 def get_buildspec(session=None):
-    session = session or Session()
-    item = session.client('ssm').get_parameter(Name=os.environ['PREPARATION_BUILDSPEC_PARAMETER'])
+    item = get_client('ssm', session=session).get_parameter(Name=os.environ['PREPARATION_BUILDSPEC_PARAMETER'])
     return item['Parameter']['Value']
 
 
@@ -89,8 +119,7 @@ def get_queue_arn():
 
 
 def subscribe_queue_to_topic(topic_arn, queue_arn, session=None):
-    session = session or Session()
-    sns = session.client('sns')
+    sns = get_client('sns', session=session)
     try:
         logging.info(f"Subscribing central queue to topic '{topic_arn}'")
         sns.subscribe(TopicArn=topic_arn, Protocol='sqs', Endpoint=queue_arn)
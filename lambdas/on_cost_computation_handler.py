@@ -15,7 +15,6 @@ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
 SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
-import boto3
 from datetime import date, timedelta
 import json
 import logging
@@ -28,6 +27,8 @@ from logger import setup_logging, trap_exception
 setup_logging()
 
 from account import Account
+from clients import get_client
+from cost_cube import CostCube
 from costs import Costs
 from e_mail import Email
 from events import Events
@@ -44,7 +45,7 @@ def handle_daily_metrics(event=None, context=None, session=None):
     logging.info(f"Computing daily cost metrics per cost center for '{this_day}'")
     accounts = Account.scan_all_accounts()
     costs = {}
-    for account, amount in Costs.enumerate_daily_costs_per_account(day=this_day, session=session):
+    for account, amount in enumerate_daily_costs_per_account(day=this_day, session=session):
         logging.info(f"Costs for account '{account}' are {amount:.2f} on {this_day}")
         cost_center = Account.get_cost_center(tags=accounts.get(str(account), {}).get('tags', {}))
         costs[cost_center] = costs.get(cost_center, 0.0) + float(amount)
@@ -61,6 +62,19 @@ def handle_daily_metrics(event=None, context=None, session=None):
     return '[OK]'
 
 
+def enumerate_daily_costs_per_account(day, session=None):
+    if not os.environ.get('COSTS_DAILY_PREFIX'):
+        yield from Costs.enumerate_daily_costs_per_account(day=day, session=session)
+        return
+
+    rows = list(Costs.enumerate_daily_services_per_account(day=day, session=session))  # also used for monthly reports
+    Costs.store_daily_services(day=day, rows=rows)
+    amounts = {}
+    for account, _, amount in rows:
+        amounts[account] = amounts.get(account, 0.0) + float(amount)
+    yield from amounts.items()
+
+
 @trap_exception
 def handle_monthly_reports(event=None, context=None, session=None):
     build_monthly_reports(event=event, context=context, session=session)
@@ -84,18 +98,21 @@ def build_monthly_reports(event=None, context=None, session=None):
     else:
         last_day_of_previous_month = date.today().replace(day=1) - timedelta(days=1)
     accounts = Account.scan_all_accounts()
+    views = Costs.get_views_per_cost_center(labels=['service', 'usage', 'charge'], accounts=accounts, day=last_day_of_previous_month, session=session)
 
-    build_service_reports_per_cost_center(accounts=accounts, day=last_day_of_previous_month, session=session)
-    build_usage_reports_per_cost_center(accounts=accounts, day=last_day_of_previous_month, session=session)
+    build_service_reports_per_cost_center(accounts=accounts, day=last_day_of_previous_month, session=session, services=views['service'])
+    build_usage_reports_per_cost_center(accounts=accounts, day=last_day_of_previous_month, session=session, usages=views['usage'])
 
-    reports = build_charge_reports_per_cost_center(accounts=accounts, day=last_day_of_previous_month, session=session)
+    reports = build_charge_reports_per_cost_center(accounts=accounts, day=last_day_of_previous_month, session=session, charges=views['charge'])
     logging.debug(reports)
     return last_day_of_previous_month, reports
 
 
-def build_charge_reports_per_cost_center(accounts, day, session):
+def build_charge_reports_per_cost_center(accounts, day, session, charges=None):
     logging.info(f"Computing charge reports per cost center for month {day.isoformat()[:7]}")
-    charges = Costs.get_charges_per_cost_center(accounts=accounts, day=day, session=session)
+    if charges is None:
+        charges = Costs.get_charges_per_cost_center(accounts=accounts, day=day, session=session)
+    charges = CostCube.of(charges, dimension='charge')  # amounts are parsed once for all reports
 
     paths = []
 
@@ -124,13 +141,15 @@ def build_charge_reports_per_cost_center(accounts, day, session):
     return [f"s3://{os.environ['REPORTS_BUCKET_NAME']}/{path}" for path in paths]
 
 
-def build_service_reports_per_cost_center(accounts, day, session):
+def build_service_reports_per_cost_center(accounts, day, session, services=None):
     logging.info(f"Computing service reports per cost center for month {day.isoformat()[:7]}")
-    services = Costs.get_services_per_cost_center(accounts=accounts, day=day, session=session)
-    for cost_center in services.keys():
-        store_report(report=Costs.build_breakdown_of_services_csv_report_for_cost_center(cost_center=cost_center, day=day, breakdown=services[cost_center]),
+    if services is None:
+        services = Costs.get_services_per_cost_center(accounts=accounts, day=day, session=session)
+    services = CostCube.of(services, dimension='service')  # amounts are parsed once for all reports
+    for cost_center in services.get_values('cost_center'):
+        store_report(report=Costs.build_breakdown_of_services_csv_report_for_cost_center(cost_center=cost_center, day=day, breakdown=services),
                      path=get_report_path(cost_center=cost_center, label='services', day=day))
-        store_report(report=Costs.build_breakdown_of_services_excel_report_for_cost_center(cost_center=cost_center, day=day, breakdown=services[cost_center]),
+        store_report(report=Costs.build_breakdown_of_services_excel_report_for_cost_center(cost_center=cost_center, day=day, breakdown=services),
                      path=get_report_path(cost_center=cost_center, label='services', day=day, suffix='xlsx'))
 
     store_report(report=Costs.build_summary_of_services_csv_report(costs=services, day=day),
@@ -139,11 +158,13 @@ def build_service_reports_per_cost_center(accounts, day, session):
     store_report(report=Costs.build_summary_of_services_excel_report(costs=services, day=day), path=path)
 
 
-def build_usage_reports_per_cost_center(accounts, day, session):
+def build_usage_reports_per_cost_center(accounts, day, session, usages=None):
     logging.info(f"Computing usage reports per cost center for month {day.isoformat()[:7]}")
-    usages = Costs.get_usages_per_cost_center(accounts=accounts, day=day, session=session)
-    for cost_center in usages.keys():
-        store_report(report=Costs.build_breakdown_of_usages_csv_report_for_cost_center(cost_center=cost_center, day=day, breakdown=usages[cost_center]),
+    if usages is None:
+        usages = Costs.get_usages_per_cost_center(accounts=accounts, day=day, session=session)
+    usages = CostCube.of(usages, dimension='usage')  # amounts are parsed once for all reports
+    for cost_center in usages.get_values('cost_center'):
+        store_report(report=Costs.build_breakdown_of_usages_csv_report_for_cost_center(cost_center=cost_center, day=day, breakdown=usages),
                      path=get_report_path(cost_center=cost_center, label='usages', day=day))
 
 
@@ -197,6 +218,6 @@ def get_report_path(cost_center, label, day=None, suffix='csv'):
 
 def store_report(path, report):
     logging.info(f"Storing report on S3 bucket on '{path}'")
-    boto3.client("s3").put_object(Bucket=os.environ['REPORTS_BUCKET_NAME'],
-                                  Key=path,
-                                  Body=report)
+    get_client("s3").put_object(Bucket=os.environ['REPORTS_BUCKET_NAME'],
+                                Key=path,
+                                Body=report)
@@ -16,8 +16,6 @@ SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
 from base64 import b64encode
-import boto3
-from boto3.session import Session
 import botocore
 from datetime import date
 import json
@@ -28,6 +26,7 @@ from logger import setup_logging, trap_exception
 setup_logging()
 
 from account import Account
+from clients import get_client
 from costs import Costs
 from events import Events
 from metric import put_metric_data
@@ -52,6 +51,7 @@ def handle_exception(event, context=None, session=None):
                     dimensions=[dict(Name='Label', Value=input.label),
                                 dict(Name='Environment', Value=Events.get_environment())],
                     session=session)
+    logging.info(f"Account cache: {Account.cache.get_statistics()}")
     return f"[OK] {input.label}"
 
 
@@ -64,8 +64,7 @@ def handle_attachment_request(event, context=None):  # web proxy to attachments
 def start_incident(label, payload, session=None):
     logging.info(f"Starting incident '{payload}'")
     title = payload.get('title', '*no title*')
-    session = session or Session()
-    incidents = session.client('ssm-incidents')
+    incidents = get_client('ssm-incidents', session=session)
     response = incidents.start_incident(title=title,
                                         impact=int(payload.get('impact', 4)),
                                         responsePlanArn=os.environ['RESPONSE_PLAN_ARN'])
@@ -84,8 +83,7 @@ def tag_incident(incident_arn, payload, session=None):
 
     logging.info("Tagging incident report with account information")
     try:
-        session = session or Session()
-        incidents = session.client('ssm-incidents')
+        incidents = get_client('ssm-incidents', session=session)
         attributes = Account.describe(id=account)
         incidents.tag_resource(resourceArn=incident_arn,
                                tags={'account': account,
@@ -127,7 +125,6 @@ def build_notification(input):
 
 def publish_notification(notification, session=None):
     logging.info(f"Publishing notification: {notification}")
-    session = session or Session()
     publish_notification_on_microsoft_teams(notification=notification, session=session)
     publish_notification_on_sns(notification=notification, session=session)
 
@@ -140,8 +137,7 @@ def publish_notification_on_sns(notification, session=None):
     topic_arn = os.environ.get('TOPIC_ARN', None)
     if topic_arn:
         logging.info(f"Publishing on SNS: {topic_arn}")
-        session = session or Session()
-        session.client('sns').publish(TopicArn=topic_arn, **notification)
+        get_client('sns', session=session).publish(TopicArn=topic_arn, **notification)
 
 
 def get_report_path(label, day=None):
@@ -155,15 +151,14 @@ def get_report_path(label, day=None):
 def store_report(path, report):
     logging.info("Storing report on S3 bucket...")
     logging.debug(report)
-    boto3.client("s3").put_object(Bucket=os.environ['REPORTS_BUCKET_NAME'],
-                                  Key=path,
-                                  Body=report)
+    get_client("s3").put_object(Bucket=os.environ['REPORTS_BUCKET_NAME'],
+                                Key=path,
+                                Body=report)
 
 
 def add_related_item(incident_arn, title, url, session):
     logging.info(f"Attaching URL '{url}' to incident record...")
-    session = session or Session()
-    im = session.client('ssm-incidents')
+    im = get_client('ssm-incidents', session=session)
     im.update_related_items(
         incidentRecordArn=incident_arn,
         relatedItemsUpdate=dict(itemToAdd={'identifier': dict(type='ATTACHMENT', value=dict(url=url)),
@@ -179,7 +174,7 @@ def get_report_url(path):
 
 
 def get_download_attachment_web_endpoint():
-    ssm = boto3.client('ssm')
+    ssm = get_client('ssm')
     item = ssm.get_parameter(Name=os.environ['WEB_ENDPOINTS_PARAMETER'])
     web_endpoints = json.loads(item['Parameter']['Value'])
     return web_endpoints["OnException.DownloadAttachment.WebEndpoint"]
@@ -204,7 +199,7 @@ def download_attachment(path, headers={}):
     bucket = os.environ['REPORTS_BUCKET_NAME']
     path = '/'.join([os.environ["REPORTING_EXCEPTIONS_PREFIX"], path.lstrip('/')])
     logging.info(f"Looking for object key '{path}' in bucket '{bucket}'")
-    s3 = boto3.client('s3')
+    s3 = get_client('s3')
     try:
         response = s3.get_object(Bucket=bucket, Key=path)
         file_name = os.path.basename(path)
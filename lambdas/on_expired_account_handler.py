@@ -15,7 +15,6 @@ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
 SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
-from boto3.session import Session
 import json
 import logging
 import os
@@ -24,6 +23,7 @@ from logger import setup_logging, trap_exception
 setup_logging()
 
 from account import Account, State
+from clients import get_client
 from events import Events
 from settings import Settings
 from worker import Worker
@@ -52,6 +52,5 @@ def handle_account(account, session=None):
 
 
 def get_buildspec(session=None):
-    session = session or Session()
-    item = session.client('ssm').get_parameter(Name=os.environ['PURGE_BUILDSPEC_PARAMETER'])
+    item = get_client('ssm', session=session).get_parameter(Name=os.environ['PURGE_BUILDSPEC_PARAMETER'])
     return item['Parameter']['Value']
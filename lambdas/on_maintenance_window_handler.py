@@ -16,33 +16,101 @@ SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
 import botocore
+import hashlib
+import json
 import logging
+import os
+from time import time
 
 from logger import setup_logging, trap_exception
 setup_logging()
 
 from account import Account, State
+from checkpoint import Checkpoint
+from clients import get_client
 from settings import Settings
+from sweep import Sweep
+
+MAXIMUM_DELAY_IN_SECONDS = 900  # as accepted by SQS for one message
 
 
 @trap_exception
 def handle_schedule_event(event=None, context=None):
     logging.info("Expiring managed accounts")
-    for account in Settings.enumerate_all_managed_accounts():
-        handle_account(account=account)
+    if Sweep.is_enabled():
+        Sweep.dispatch(operation='expire', ids=Settings.enumerate_all_managed_accounts())
+    else:
+        checkpoint = Checkpoint(event=event, context=context)
+        handle_shard(ids=checkpoint.start(enumerate=Settings.enumerate_all_managed_accounts), checkpoint=checkpoint)
     return "[OK]"
 
 
-def handle_account(account):
+def handle_shard(ids, attributes=None, checkpoint=None, started=None):
+    window = int(os.environ.get('MAINTENANCE_WINDOW_DURATION_IN_MINUTES', '0'))
+    items = Account.describe_many(ids)
+    for item in checkpoint.track(items) if checkpoint else items:
+        if window and os.environ.get('EXPIRATIONS_QUEUE_URL'):
+            schedule_account(account=item.id, item=item, window=window, started=checkpoint.started if checkpoint else started)
+        else:
+            handle_account(account=item.id, item=item)
+    Account.writer.publish(dimensions=[dict(Name='Operation', Value='SetState')])
+
+
+def handle_account(account, item=None):
     logging.debug(f"Handling account '{account}'")
     try:
-        item = Account.describe(account)
-        state = item.tags.get(Account.get_tag_key('state'))
-        if not item.is_active:
-            logging.info(f"Ignoring inactive account '{account}'")
-        elif state and state != State.RELEASED.value:
-            logging.info(f"Ignoring account '{account}' that is in state '{state}'")
-        else:
+        item = item or Account.describe(account)
+        if is_expirable(account=account, item=item):
             Account.set_state(account=account, state=State.EXPIRED)
     except botocore.exceptions.ClientError:
         logging.error(f"Unable to handle account '{account}'. Does it exist?")
+
+
+def is_expirable(account, item):
+    state = item.tags.get(Account.get_tag_key('state'))
+    if not item.is_active:
+        logging.info(f"Ignoring inactive account '{account}'")
+    elif state and state != State.RELEASED.value:
+        logging.info(f"Ignoring account '{account}' that is in state '{state}'")
+    else:
+        return True
+    return False
+
+
+def get_slot(account, window):
+    ''' spread accounts evenly over slots of one minute, and always give the same slot to an account '''
+    return int(hashlib.sha256(str(account).encode()).hexdigest(), 16) % window
+
+
+def schedule_account(account, item, window, now=None, started=None):
+    try:
+        if is_expirable(account=account, item=item):
+            slot = get_slot(account=account, window=window)
+            logging.info(f"Scheduling the expiration of account '{account}' in {slot} minutes")
+            begin = started or (time() if now is None else now)  # slots are relative to the start of the run, across continuations
+            delay_account(account=account, due=begin + 60 * slot, now=now)
+    except botocore.exceptions.ClientError:
+        logging.error(f"Unable to handle account '{account}'. Does it exist?")
+
+
+def delay_account(account, due, now=None):
+    delay = max(0, min(MAXIMUM_DELAY_IN_SECONDS, int(due - (time() if now is None else now))))  # longer delays are done in several hops
+    get_client('sqs').send_message(QueueUrl=os.environ['EXPIRATIONS_QUEUE_URL'],
+                                   MessageBody=json.dumps(dict(account=account, due=due)),
+                                   DelaySeconds=delay)
+
+
+def handle_queue_event(event, context=None):  # no trap_exception, failed messages are reported to the queue
+    failures = []
+    for record in event.get('Records', []):
+        try:
+            message = json.loads(record['body'])
+            if message['due'] > time() + 1:  # not yet
+                delay_account(account=message['account'], due=message['due'])
+            else:
+                handle_account(account=message['account'])
+        except Exception as error:
+            logging.exception(error)
+            failures.append(dict(itemIdentifier=record['messageId']))
+    Account.writer.publish(dimensions=[dict(Name='Operation', Value='SetState')])
+    return dict(batchItemFailures=failures)
@@ -46,11 +46,13 @@ def handle_account_event(event, context=None, emit=None):
     else:
         logging.debug(f"Do not meter event '{input.label}'")
 
+    logging.info(f"Account cache: {Account.cache.get_statistics()}")
     return f"[OK] {input.label} {input.account}"
 
 
 def begin_transaction(transaction, account_id, transactions):
     logging.info(f"Beginning transaction '{transaction}' for account '{account_id}")
+    Account.forget_tags(account_id)  # tags are changed by other functions before they emit account events
     record = Account.list_tags(account_id)
     record['cost-center'] = Account.get_cost_center(record)
     record.update(dict(transaction=transaction, account=account_id, begin=time()))
@@ -21,7 +21,7 @@ import logging
 from logger import setup_logging, trap_exception
 setup_logging()
 
-from account import Account, State
+from account import Account, AccountTagSession, State
 from events import Events
 from settings import Settings
 
@@ -43,24 +43,21 @@ def handle_tag_event(event, context, session=None):
 def handle_account(account, session=None):
     settings = Settings.get_settings_for_account(identifier=account, session=session)
 
-    keys = settings.get("unset_tags", [])
-    if keys:
-        Account.untag(account, keys, session=session)
-
     item = Account.describe(account, session=session)
-    updated = inspect_tags(item=item, settings=settings)
-    if item.tags != updated:
-        Account.tag(account, updated, session=session)
+    with AccountTagSession(account, tags=item.tags, session=session) as changes:  # at most one write per kind of change
+        changes.untag(settings.get("unset_tags", []))
+        changes.tag(inspect_tags(item=item, settings=settings, tags=changes.get_tags()))
     return Events.emit_account_event('CreatedAccount', account)
 
 
-def inspect_tags(item, settings):
-    updated = settings.get("account_tags", {})
+def inspect_tags(item, settings, tags=None):
+    updated = dict(settings.get("account_tags", {}))
 
     updated[Account.get_tag_key('state')] = State.ASSIGNED.value
 
     key = Account.get_tag_key('holder')
-    holder = item.tags.get(key) or item.email
+    tags = item.tags if tags is None else tags
+    holder = tags.get(key) or item.email
     if not Account.validate_holder(holder):
         logging.warning(f"Account '{item.id}' has invalid holder '{holder}'")
     updated[key] = holder
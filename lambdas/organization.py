@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Copyright Reply.com or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import botocore
+from functools import partial
+import logging
+
+from clients import get_client
+from session import get_organizations_session
+from throttling import AdaptiveRateLimiter
+
+
+class OrganizationSnapshot:
+    ''' describe all accounts of the organization with a single walk of the tree '''
+
+    limiter = AdaptiveRateLimiter()  # one call per account to list tags
+
+    def __init__(self, session=None):
+        self.session = session or get_organizations_session()
+        self.accounts = {}  # same shape as items returned by Account.scan_all_accounts()
+        self.units = {}
+
+    @classmethod
+    def take(cls, session=None, with_tags=True):
+        snapshot = cls(session=session)
+        snapshot.scan(with_tags=with_tags)
+        return snapshot
+
+    def scan(self, with_tags=True):
+        logging.info("Scanning the organization from the root")
+        handle = get_client('organizations', session=self.session)
+        queue = []
+        for root in self.enumerate_pages(handle.list_roots, 'Roots'):
+            self.units[root['Id']] = dict(Id=root['Id'], Name='Root', Path='Root')
+            queue.append(root['Id'])
+
+        while queue:
+            parent = queue.pop(0)
+            logging.debug(f"Scanning organizational unit '{parent}'")
+            for item in self.enumerate_pages(handle.list_accounts_for_parent, 'Accounts', ParentId=parent):
+                self.accounts[item['Id']] = self.build_account(item, parent=parent)
+            for item in self.enumerate_pages(handle.list_organizational_units_for_parent, 'OrganizationalUnits', ParentId=parent):
+                path = '/'.join([self.units[parent]['Path'], item['Name']])
+                self.units[item['Id']] = dict(Id=item['Id'], Name=item['Name'], Path=path)
+                queue.append(item['Id'])
+
+        if with_tags:
+            for account in self.accounts.keys():
+                self.accounts[account]['tags'] = self.list_tags(account=account, handle=handle)
+
+        logging.info(f"Found {len(self.accounts)} accounts in {len(self.units)} organizational units")
+        return self.accounts
+
+    def build_account(self, item, parent):
+        return dict(id=item['Id'],
+                    arn=item['Arn'],
+                    email=item['Email'],
+                    name=item['Name'],
+                    is_active=True if item['Status'] == 'ACTIVE' else False,
+                    status=item['Status'],
+                    tags={},
+                    unit=parent,
+                    unit_name=self.units[parent]['Name'])
+
+    def get_path(self, account):
+        return self.units.get(self.accounts[account]['unit'], {}).get('Path', 'Unknown')
+
+    def list_tags(self, account, handle):
+        try:
+            tags = {}
+            for item in self.enumerate_pages(partial(self.limiter.call, handle.list_tags_for_resource), 'Tags', ResourceId=account):
+                tags[item.get('Key')] = item.get('Value')
+            return tags
+        except botocore.exceptions.ClientError as error:
+            logging.error(f"Unable to list tags of account '{account}'. Does it exist? {error}")
+            return {}
+
+    @staticmethod
+    def enumerate_pages(function, key, **parameters):
+        chunk = function(**parameters)
+        while chunk:
+            for item in chunk[key]:
+                yield item
+
+            token = chunk.get('NextToken')
+            if token:
+                chunk = function(**parameters, NextToken=token)
+            else:
+                break
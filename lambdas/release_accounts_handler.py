@@ -22,21 +22,33 @@ from logger import setup_logging, trap_exception
 setup_logging()
 
 from account import Account, State
+from checkpoint import Checkpoint
 from settings import Settings
+from sweep import Sweep
 
 
 @trap_exception
 def handle_event(event=None, context=None):
     logging.info("Releasing managed accounts")
-    for account in Settings.enumerate_all_managed_accounts():
-        handle_account(account=account)
+    if Sweep.is_enabled():
+        Sweep.dispatch(operation='release', ids=Settings.enumerate_all_managed_accounts())
+    else:
+        checkpoint = Checkpoint(event=event, context=context)
+        handle_shard(ids=checkpoint.start(enumerate=Settings.enumerate_all_managed_accounts), checkpoint=checkpoint)
     return "[OK]"
 
 
-def handle_account(account):
+def handle_shard(ids, attributes=None, checkpoint=None, started=None):
+    items = Account.describe_many(ids)
+    for item in checkpoint.track(items) if checkpoint else items:
+        handle_account(account=item.id, item=item)
+    Account.writer.publish(dimensions=[dict(Name='Operation', Value='SetState')])
+
+
+def handle_account(account, item=None):
     logging.debug(f"Handling account '{account}'")
     try:
-        item = Account.describe(account)
+        item = item or Account.describe(account)
         state = item.tags.get(Account.get_tag_key('state'))
         if not item.is_active:
             logging.info(f"Ignoring inactive account '{account}'")
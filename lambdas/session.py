@@ -15,23 +15,29 @@ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
 SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
-from boto3.session import Session
 import botocore
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
 import os
 import logging
+from threading import Lock
+from time import monotonic
 from uuid import uuid4
 
-cache = None  # session with permissions on top-level account of the organization
+from cache import Cache
+from clients import build_session, get_client, get_default_session
+
+sessions = Cache(size=int(os.environ.get('SESSION_CACHE_SIZE', '16')))  # assumed sessions, shared across warm invocations
+
+REFRESH_MARGIN = timedelta(minutes=15)  # renew credentials before any lambda function could outlive them
 
 
 def get_organizations_session(session=None):
     ''' get session to top account in the organization '''
-    global cache
-    if cache:
-        return cache
     role = os.environ.get('ROLE_ARN_TO_MANAGE_ACCOUNTS')
-    cache = get_assumed_session(role_arn=role, session=session) if role else Session()
-    return cache
+    if role:
+        return get_assumed_session(role_arn=role, session=session)  # refreshed before expiration
+    return get_default_session()
 
 
 def get_account_session(account, session=None):
@@ -39,19 +45,23 @@ def get_account_session(account, session=None):
     name = os.environ.get('ROLE_NAME_TO_MANAGE_CODEBUILD', 'AWSControlTowerExecution')
     via = get_organizations_session(session=session)
     target = get_assumed_session(role_arn=f'arn:aws:iam::{account}:role/{name}', session=via)
-    identity = target.client('sts').get_caller_identity()
-    logging.debug(f"Using identity {identity}")
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        identity = get_client('sts', session=target).get_caller_identity()
+        logging.debug(f"Using identity {identity}")
     return target
 
 
 def get_assumed_session(role_arn, region=None, name=None, session=None):
-    ''' assume a role and derive new session '''
-    session = session or Session()
-    sts = session.client('sts')
+    ''' assume a role and derive new session, or reuse one that has not expired yet '''
+    key = (role_arn, region, name)
+    cached = sessions.get(key)  # expired entries are removed on read
+    if cached:
+        return cached
+
+    sts = get_client('sts', session=session)
 
-    name = name or 'SPA-{}'.format(uuid4())
     try:
-        response = sts.assume_role(RoleArn=role_arn, RoleSessionName=name)
+        response = sts.assume_role(RoleArn=role_arn, RoleSessionName=name or 'SPA-{}'.format(uuid4()))
     except botocore.exceptions.ParamValidationError:
         raise ValueError(f"Invalid role ARN '{role_arn}' or name '{name}' for assume role")
 
@@ -61,4 +71,67 @@ def get_assumed_session(role_arn, region=None, name=None, session=None):
     if region:
         parameters['region_name'] = region
 
-    return Session(**parameters)
+    assumed = build_session(**parameters)
+    expiration = response['Credentials'].get('Expiration')
+    if isinstance(expiration, datetime):
+        expiration = expiration if expiration.tzinfo else expiration.replace(tzinfo=timezone.utc)
+        ttl = (expiration - REFRESH_MARGIN - datetime.now(timezone.utc)).total_seconds()
+        if ttl > 0:
+            sessions.put(key, assumed, ttl=ttl)
+    return assumed
+
+
+def forget_sessions():
+    sessions.clear()
+
+
+class SessionPool:
+    ''' assume roles into member accounts concurrently, and hand over sessions as soon as they are ready '''
+
+    def __init__(self, max_workers=8, session=None):
+        self.max_workers = max_workers
+        self.session = session
+        self.latencies = {}
+        self.failures = {}
+        self.lock = Lock()
+
+    def enumerate_sessions(self, accounts):
+        ''' yield (account, session) in order of completion, with session None for accounts that cannot be reached '''
+        get_client('sts', session=get_organizations_session(session=self.session))  # assume top-level role once, before threads
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = set()
+            for account in accounts:
+                pending.add(executor.submit(self.assume, account))
+                if len(pending) >= 2 * self.max_workers:  # do not enumerate more accounts than needed
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    yield from self.collect(done)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                yield from self.collect(done)
+
+    def assume(self, account):
+        start = monotonic()
+        try:
+            session = get_account_session(account=account, session=self.session)
+        except (botocore.exceptions.ClientError, ValueError) as error:
+            logging.error(f"Unable to assume role in account '{account}': {error}")
+            with self.lock:
+                self.failures[account] = str(error)
+            return account, None
+        with self.lock:
+            self.latencies[account] = monotonic() - start
+        return account, session
+
+    @staticmethod
+    def collect(futures):
+        for future in futures:
+            yield future.result()
+
+    def get_statistics(self):
+        with self.lock:
+            latencies = list(self.latencies.values())
+            return dict(sessions=len(latencies),
+                        failures=len(self.failures),
+                        average_latency=sum(latencies) / len(latencies) if latencies else 0.0,
+                        maximum_latency=max(latencies, default=0.0))
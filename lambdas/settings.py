@@ -15,14 +15,175 @@ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
 SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
-from boto3.session import Session
+import base64
 import botocore
 from itertools import chain
 import json
 import logging
 import os
+from threading import Lock
+import time
+import zlib
 
 from account import Account
+from cache import Cache
+from clients import get_client
+
+
+class SettingsIndex:
+    ''' settings of all managed accounts and organizational units, loaded in bulk and shared across warm invocations '''
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl            # seconds before the generation of settings is checked again
+        self.parameters = {}      # version, identifier and settings for each parameter name
+        self.accounts = {}
+        self.units = {}
+        self.inherited = {}       # settings resolved for each chain of organizational units
+        self.generation = None    # as set on each deployment of settings
+        self.loaded_at = None
+        self.lock = Lock()
+
+    def is_loaded(self):
+        return self.loaded_at is not None and time.monotonic() < self.loaded_at + self.ttl
+
+    def load(self, session=None):
+        ''' read all parameters for accounts and organizational units with paginated calls '''
+        generation = self.get_generation(session=session)  # read first, so that a concurrent deployment is detected later on
+        parameters = {}
+        paginator = get_client('ssm', session=session).get_paginator('get_parameters_by_path')
+        for path in self.get_paths():
+            logging.debug(f"Loading settings in path {path}")
+            for page in paginator.paginate(Path=path, Recursive=True, PaginationConfig=dict(PageSize=10)):
+                for item in page.get('Parameters', []):
+                    parameters[item['Name']] = self.build_entry(item)
+        self.set_parameters(parameters, generation=generation)
+        logging.debug(f"Indexed settings of {len(self.accounts)} accounts and {len(self.units)} organizational units")
+        return self
+
+    def load_file(self, name):
+        ''' read settings compiled on deployment -- see cdk/configuration.py '''
+        with open(name) as stream:
+            content = json.load(stream)
+        with self.lock:
+            self.accounts = content.get('accounts', {})
+            self.units = content.get('organizational_units', {})
+            self.inherited = {}
+            self.loaded_at = time.monotonic()
+        logging.debug(f"Loaded settings of {len(self.accounts)} accounts and {len(self.units)} organizational units from '{name}'")
+        return self
+
+    def revalidate(self, session=None):
+        ''' check the generation of settings, and fetch only parameters that have changed since previous load '''
+        generation = self.get_generation(session=session)
+        if generation is not None and generation == self.generation:
+            logging.debug(f"Settings are still at generation {generation}")
+            with self.lock:
+                self.loaded_at = time.monotonic()
+            return self
+
+        versions = self.list_versions(session=session)
+        parameters = {name: entry for name, entry in self.parameters.items() if entry['version'] == versions.get(name)}
+        changed = [name for name in versions.keys() if name not in parameters]
+        logging.debug(f"Fetching {len(changed)} new or changed parameters")
+        ssm = get_client('ssm', session=session)
+        for offset in range(0, len(changed), 10):  # get_parameters() accepts up to 10 names
+            for item in ssm.get_parameters(Names=changed[offset:offset + 10]).get('Parameters', []):
+                parameters[item['Name']] = self.build_entry(item)
+        self.set_parameters(parameters, generation=generation)
+        return self
+
+    def refresh(self, session=None):
+        if self.loaded_at is None:
+            self.load(session=session)
+        elif not self.is_loaded():
+            self.revalidate(session=session)
+        return self
+
+    @staticmethod
+    def build_entry(item):
+        if item['Name'].startswith(Settings.get_packed_settings_parameter_name() + Settings.PARAMETER_SEPARATOR):
+            return dict(version=item.get('Version'), packed=item['Value'])  # decoded once all shards are there
+        settings = json.loads(item['Value'])
+        return dict(version=item.get('Version'),
+                    identifier=settings.get('identifier') or item['Name'].split(Settings.PARAMETER_SEPARATOR)[-1],
+                    settings=settings)
+
+    def set_parameters(self, parameters, generation=None):
+        prefix = Settings.get_account_parameter_name() + Settings.PARAMETER_SEPARATOR
+        try:
+            accounts, units = self.unpack([parameters[name]['packed'] for name in sorted(parameters.keys()) if 'packed' in parameters[name]])
+        except (zlib.error, ValueError) as exception:  # shards of different deployments, including binascii.Error and json errors
+            logging.warning(f"Unable to unpack settings, until shards match generation {generation} again - {exception}")
+            accounts, units = {}, {}  # settings are read from other parameters meanwhile
+            generation = None  # check parameters again on next refresh
+        for name, entry in parameters.items():
+            if 'settings' in entry:
+                index = accounts if name.startswith(prefix) else units
+                index[entry['identifier']] = entry['settings']
+        with self.lock:
+            self.parameters = parameters
+            self.accounts, self.units = accounts, units
+            self.inherited = {}
+            self.generation = generation
+            self.loaded_at = time.monotonic()
+
+    @staticmethod
+    def unpack(shards):
+        ''' decode settings packed on deployment -- see cdk/parameters_construct.py '''
+        if not shards:
+            return {}, {}
+        content = json.loads(zlib.decompress(base64.b64decode(''.join(shards))).decode('utf-8'))
+        return content.get('accounts', {}), content.get('organizational_units', {})
+
+    @classmethod
+    def list_versions(cls, session=None):
+        ''' get metadata of parameters, without their values '''
+        versions = {}
+        paginator = get_client('ssm', session=session).get_paginator('describe_parameters')
+        for path in cls.get_paths():
+            filters = [dict(Key='Path', Option='Recursive', Values=[path])]
+            for page in paginator.paginate(ParameterFilters=filters, PaginationConfig=dict(PageSize=50)):
+                for item in page.get('Parameters', []):
+                    versions[item['Name']] = item['Version']
+        return versions
+
+    @staticmethod
+    def get_paths():
+        return [Settings.get_account_parameter_name(),
+                Settings.get_organizational_unit_parameter_name(),
+                Settings.get_packed_settings_parameter_name()]
+
+    @staticmethod
+    def get_generation(session=None):
+        name = Settings.get_settings_generation_parameter_name()
+        try:
+            return get_client('ssm', session=session).get_parameter(Name=name)['Parameter']['Value']
+        except botocore.exceptions.ClientError:
+            logging.debug(f"Unable to read parameter '{name}'")
+            return None
+
+    def forget(self):
+        with self.lock:
+            self.parameters = {}
+            self.accounts, self.units = {}, {}
+            self.inherited = {}
+            self.generation = None
+            self.loaded_at = None
+
+    def get_account_settings(self, identifier):
+        return self.accounts.get(identifier)
+
+    def get_organizational_unit_settings(self, identifier):
+        return self.units.get(identifier)
+
+    def get_inherited_settings(self, units):
+        ''' get settings of the nearest configured unit, from a chain of units that starts with the parent '''
+        key = tuple(units)
+        if key not in self.inherited:
+            settings = next((self.units[unit] for unit in units if unit in self.units), None)
+            with self.lock:
+                self.inherited[key] = settings
+        return self.inherited[key]
 
 
 class Settings:
@@ -30,8 +191,16 @@ class Settings:
     PARAMETER_SEPARATOR = "/"  # /!\ to be duplicated in resources/parameters_construct.py
     ACCOUNTS_PARAMETER = "Accounts"
     ORGANIZATIONAL_UNITS_PARAMETER = "OrganizationalUnits"
+    PACKED_SETTINGS_PARAMETER = "PackedSettings"  # /!\ to be duplicated in resources/parameters_construct.py
+    SETTINGS_GENERATION_PARAMETER = "SettingsGeneration"
 
-    cache = {}
+    cache = Cache(size=1024, ttl=int(os.environ.get('SETTINGS_CACHE_TTL_IN_SECONDS', '3600')))  # parameters read one by one, or None if missing
+    cache_generation = None  # generation of settings when the cache was last checked
+    cache_checked_at = None
+
+    index = SettingsIndex(ttl=int(os.environ.get('SETTINGS_INDEX_TTL_IN_SECONDS', '300')))
+
+    compiled = None  # settings copied along the code on deployment, if any
 
     @classmethod
     def enumerate_all_managed_accounts(cls, session=None):
@@ -47,35 +216,36 @@ class Settings:
     @classmethod
     def enumerate_accounts_in_managed_organizational_units(cls, skip=[], session=None):
         logging.info("Enumerating accounts in configured organizational units")
-        for identifier in cls.enumerate_organizational_units(session=session):
+        units = list(cls.enumerate_organizational_units(session=session))
+        units.extend(Account.list_descendant_units(parents=units, session=session))
+        for identifier in units:
             logging.info(f"Scanning organizational unit '{identifier}'")
             for account in Account.list(parent=identifier, skip=skip, session=session):
                 yield account
 
     @classmethod
     def enumerate_accounts(cls, session=None):
-        path = cls.get_account_parameter_name()
-        return cls.enumerate_identifiers_by_path(path=path, session=session)
+        return iter(list(cls.get_index(session=session).accounts.keys()))
 
     @classmethod
     def enumerate_organizational_units(cls, session=None):
-        path = cls.get_organizational_unit_parameter_name()
-        return cls.enumerate_identifiers_by_path(path=path, session=session)
+        return iter(list(cls.get_index(session=session).units.keys()))
+
+    @classmethod
+    def get_index(cls, session=None):
+        return cls.index.refresh()  # the index is shared across sessions, and read with the default ssm client
 
     @classmethod
-    def enumerate_identifiers_by_path(cls, path, session=None):
-        logging.debug(f"Enumerating identifiers in path {path}")
-        session = session or Session()
-        chunk = session.client('ssm').get_parameters_by_path(Path=path)
-        while chunk.get('Parameters'):
-            for item in chunk.get('Parameters'):
-                attributes = json.loads(item['Value'])
-                yield attributes['identifier']
-            more = chunk.get('NextToken')
-            if more:
-                chunk = session.client('ssm').get_parameters_by_path(Path=path, NextToken=more)
-            else:
-                break
+    def get_compiled_settings(cls):
+        if cls.compiled is None:
+            cls.compiled = SettingsIndex(ttl=float('inf'))
+            name = os.environ.get('COMPILED_SETTINGS_FILE')
+            if name:
+                try:
+                    cls.compiled.load_file(os.path.join(os.path.dirname(os.path.abspath(__file__)), name))
+                except (OSError, ValueError) as exception:
+                    logging.warning(f"Unable to load compiled settings - {exception}")
+        return cls.compiled
 
     @classmethod
     def get_account_parameter_name(cls, identifier=None):
@@ -86,11 +256,7 @@ class Settings:
 
     @classmethod
     def get_account_settings(cls, identifier, session=None) -> dict:
-        session = session or Session()
-        name = cls.get_account_parameter_name(identifier=identifier)
-        item = session.client('ssm').get_parameter(Name=name)
-        if item:
-            return json.loads(item['Parameter']['Value'])
+        return cls.get_parameter_settings(name=cls.get_account_parameter_name(identifier=identifier), session=session)
 
     @classmethod
     def get_organizational_unit_parameter_name(cls, identifier=None):
@@ -101,28 +267,89 @@ class Settings:
 
     @classmethod
     def get_organizational_unit_settings(cls, identifier, session=None) -> dict:
-        if identifier in cls.cache.keys():
-            return cls.cache[identifier]
-        session = session or Session()
-        name = cls.get_organizational_unit_parameter_name(identifier=identifier)
-        item = session.client('ssm').get_parameter(Name=name)
-        settings = json.loads(item['Parameter']['Value'])
-        cls.cache[identifier] = settings
+        return cls.get_parameter_settings(name=cls.get_organizational_unit_parameter_name(identifier=identifier), session=session)
+
+    @classmethod
+    def get_parameter_settings(cls, name, session=None):
+        ''' read settings from one parameter, or None if it does not exist, and keep both until next deployment '''
+        cls.revalidate_cache(session=session)
+        cached = cls.cache.get(name)
+        if cached is not None:
+            return cached['settings']
+        try:
+            item = get_client('ssm', session=session).get_parameter(Name=name)
+            settings = json.loads(item['Parameter']['Value'])
+        except botocore.exceptions.ClientError as exception:
+            if exception.response['Error']['Code'] != 'ParameterNotFound':
+                raise
+            settings = None  # remembered as well, e.g., for accounts that inherit settings of units
+        cls.cache.put(name, dict(settings=settings))
         return settings
 
     @classmethod
-    def get_settings_for_account(cls, identifier, session=None) -> dict:
-        '''return either explicit account settings, or settings inherited from parent organizational unit'''
+    def revalidate_cache(cls, session=None):
+        ''' forget cached parameters when the generation of settings has changed, checked at most once per ttl of the index '''
+        now = time.monotonic()
+        if cls.cache_checked_at is not None and now < cls.cache_checked_at + cls.index.ttl:
+            return
+        generation = SettingsIndex.get_generation(session=session)
+        if generation is None or generation != cls.cache_generation:  # without generation, parameters are read again after the ttl
+            logging.debug(f"Forgetting cached settings of generation {cls.cache_generation}")
+            cls.cache.clear()
+        cls.cache_generation, cls.cache_checked_at = generation, now
+
+    @classmethod
+    def get_packed_settings_parameter_name(cls):
+        return cls.PARAMETER_SEPARATOR.join(['', cls.get_environment(), cls.PACKED_SETTINGS_PARAMETER])
+
+    @classmethod
+    def get_settings_generation_parameter_name(cls):
+        return cls.PARAMETER_SEPARATOR.join(['', cls.get_environment(), cls.SETTINGS_GENERATION_PARAMETER])
+
+    @classmethod
+    def get_settings_for_account(cls, identifier, session=None, bulk=False) -> dict:
+        '''return either explicit account settings, or settings inherited from ancestor organizational units
+
+        Sweeps of all accounts set bulk=True, so that settings of the organization are indexed at once. Handlers of
+        single accounts read only the parameters they need, unless the index has been loaded already or settings
+        are packed in a few parameters.'''
+        settings = cls.get_settings_from_index(index=cls.get_compiled_settings(), identifier=identifier)
+        if settings is not None:  # no network call for accounts known at deployment
+            return settings
+        if not (bulk or cls.index.is_loaded() or cls.is_packed()):
+            return cls.get_settings_for_account_from_parameters(identifier=identifier, session=session)
         try:
-            settings = cls.get_account_settings(identifier=identifier, session=session)
+            index = cls.get_index(session=session)
         except botocore.exceptions.ClientError as exception:
-            try:
-                unit = Account.get_organizational_unit(account=identifier)
-                settings = cls.get_organizational_unit_settings(identifier=unit, session=session)
-            except botocore.exceptions.ClientError:
-                raise ValueError(f"No settings could be found for account {identifier}")
+            logging.warning(f"Unable to index settings - {exception}")
+            return cls.get_settings_for_account_from_parameters(identifier=identifier, session=session)
+        settings = cls.get_settings_from_index(index=index, identifier=identifier)
+        if settings is None:  # not indexed yet, or given by the session of the caller
+            return cls.get_settings_for_account_from_parameters(identifier=identifier, session=session)
+        return settings
+
+    @classmethod
+    def get_settings_from_index(cls, index, identifier):
+        settings = index.get_account_settings(identifier)
+        if settings is None and index.units:
+            settings = index.get_inherited_settings(units=Account.get_ancestors(account=identifier))
         return settings
 
+    @classmethod
+    def get_settings_for_account_from_parameters(cls, identifier, session=None) -> dict:
+        settings = cls.get_account_settings(identifier=identifier, session=session)
+        if settings is not None:
+            return settings
+        for unit in Account.get_ancestors(account=identifier):  # from the parent up to the root
+            settings = cls.get_organizational_unit_settings(identifier=unit, session=session)
+            if settings is not None:
+                return settings
+        raise ValueError(f"No settings could be found for account {identifier}")
+
+    @staticmethod
+    def is_packed():
+        return bool(os.environ.get('WITH_PACKED_SETTINGS'))
+
     @classmethod
     def get_environment(cls):
         return os.environ.get('ENVIRONMENT_IDENTIFIER', 'Spa')
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Copyright Reply.com or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import importlib
+import json
+import logging
+import os
+from time import time
+from uuid import uuid4
+
+from account import Account
+from clients import get_client
+from key_value_store import KeyValueStore
+from metric import put_metric_data
+
+
+class Sweep:
+    ''' spread the processing of managed accounts over a queue, and track the completion of shards '''
+
+    OPERATIONS = dict(check='check_accounts_handler',  # each module has a function handle_shard(ids, attributes, started)
+                      expire='on_maintenance_window_handler',
+                      release='release_accounts_handler',
+                      reset='reset_accounts_handler')
+
+    @staticmethod
+    def is_enabled():
+        return bool(os.environ.get('SWEEPS_QUEUE_URL'))
+
+    @staticmethod
+    def get_table():
+        table_name = os.environ.get('SWEEPS_DATASTORE')
+        if table_name:
+            return KeyValueStore(table_name=table_name, ttl=os.environ.get('SWEEPS_TTL', str(7 * 24 * 60 * 60)))
+
+    @classmethod
+    def dispatch(cls, operation, ids, attributes=None, batch_size=None, queue_url=None, store=None):
+        ''' write batches of accounts to the queue, and return the identifier of the sweep '''
+        if operation not in cls.OPERATIONS.keys():
+            raise ValueError(f"Unexpected operation '{operation}' for a sweep")
+        queue_url = queue_url or os.environ['SWEEPS_QUEUE_URL']
+        batch_size = batch_size or int(os.environ.get('SWEEPS_BATCH_SIZE', '25'))
+        attributes = attributes or {}
+        ids = list(ids)
+        batches = [ids[offset:offset + batch_size] for offset in range(0, len(ids), batch_size)]
+        sweep = str(uuid4())
+        begin = time()  # shared by all shards, e.g., as the origin of slots in the maintenance window
+
+        store = store or cls.get_table()
+        if store:
+            store.remember(hash=sweep, value=dict(operation=operation, accounts=len(ids), shards=len(batches), begin=begin))
+
+        messages = []
+        for index, batch in enumerate(batches):
+            messages.append(dict(sweep=sweep,
+                                 operation=operation,
+                                 shard=index,
+                                 shards=len(batches),
+                                 begin=begin,
+                                 accounts=batch,
+                                 attributes={id: attributes[id] for id in batch if id in attributes}))
+
+        sqs = get_client('sqs')
+        for offset in range(0, len(messages), 10):  # send_message_batch() accepts up to 10 messages
+            entries = [dict(Id=str(offset + index), MessageBody=json.dumps(message)) for index, message in enumerate(messages[offset:offset + 10])]
+            result = sqs.send_message_batch(QueueUrl=queue_url, Entries=entries)
+            if result.get('Failed'):
+                raise RuntimeError(f"Unable to dispatch shards of sweep '{sweep}': {result['Failed']}")
+
+        logging.info(f"Dispatched {len(ids)} accounts in {len(batches)} shards of sweep '{sweep}'")
+        return sweep
+
+    @classmethod
+    def process(cls, message, store=None):
+        ''' handle one shard of a sweep, and report on the sweep when all shards have been handled '''
+        logging.info(f"Processing shard {message['shard'] + 1}/{message['shards']} of sweep '{message['sweep']}'")
+        module = importlib.import_module(cls.OPERATIONS[message['operation']])
+        Account.share_writes(concurrency=cls.get_concurrency(message))
+        module.handle_shard(ids=message['accounts'], attributes=message.get('attributes', {}), started=message.get('begin'))
+        store = store or cls.get_table()
+        summary = cls.complete(message=message, store=store) if store else None
+        if summary and hasattr(module, 'handle_sweep_completion'):  # e.g., one report across all shards
+            module.handle_sweep_completion(summary)
+
+    @staticmethod
+    def get_concurrency(message):
+        ''' shards of a sweep that can be processed in parallel -- see cdk/sweeps_construct.py '''
+        return max(1, min(message['shards'], int(os.environ.get('SWEEPS_MAX_CONCURRENCY', '1'))))
+
+    @classmethod
+    def complete(cls, message, store):
+        done = store.add_to_set(hash=message['sweep'], attribute='Shards', values=[str(message['shard'])])
+        if str(message['shard']) in done or len(done) + 1 < message['shards']:  # duplicate message, or other shards are pending
+            return None
+        record = store.retrieve(hash=message['sweep']) or {}
+        summary = dict(sweep=message['sweep'],
+                       operation=message['operation'],
+                       accounts=record.get('accounts'),
+                       shards=message['shards'],
+                       duration=time() - record.get('begin', time()))
+        logging.info(f"Completed sweep '{summary['sweep']}' of operation '{summary['operation']}' on {summary['accounts']} accounts "
+                     f"in {summary['shards']} shards and {summary['duration']:.1f} seconds")
+        put_metric_data(name='SweepDuration',
+                        dimensions=[dict(Name='Operation', Value=summary['operation']),
+                                    dict(Name='Environment', Value=os.environ.get('ENVIRONMENT_IDENTIFIER', 'Spa'))],
+                        value=summary['duration'],
+                        unit='Seconds')
+        return summary
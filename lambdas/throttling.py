@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Copyright Reply.com or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import botocore
+import logging
+import random
+import threading
+import time
+
+from metric import put_metric_data
+
+
+def is_throttling(error):
+    return isinstance(error, botocore.exceptions.ClientError) and error.response['Error']['Code'] == 'TooManyRequestsException'
+
+
+class AdaptiveRateLimiter:
+    ''' pace calls to an API, with additive increase and multiplicative decrease of the rate '''
+
+    def __init__(self, rate=4.0, minimum=0.5, maximum=20.0, increase=0.1, decrease=0.5, retries=5):
+        self.rate = rate          # calls per second
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase  # added to the rate on each successful call
+        self.decrease = decrease  # applied to the rate on each throttled call
+        self.retries = retries
+        self.next_call = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            delay = max(0.0, self.next_call - now)
+            self.next_call = max(now, self.next_call) + 1.0 / self.rate
+        if delay:
+            time.sleep(delay)
+
+    def on_success(self):
+        with self.lock:
+            self.rate = min(self.maximum, self.rate + self.increase)
+
+    def on_throttle(self):
+        with self.lock:
+            self.rate = max(self.minimum, self.rate * self.decrease)
+            logging.warning(f"Throttling detected, slowing down to {self.rate:.2f} calls per second")
+
+    def call(self, function, *args, **kwargs):
+        attempt = 0
+        while True:
+            self.acquire()
+            try:
+                result = function(*args, **kwargs)
+            except botocore.exceptions.ClientError as error:
+                if not is_throttling(error) or attempt >= self.retries:
+                    raise
+                self.on_throttle()
+                attempt += 1
+                continue
+            self.on_success()
+            return result
+
+
+class TokenBucket:
+    ''' let calls go at a steady rate with limited bursts, and retry throttled calls after jittered delays '''
+
+    def __init__(self, rate=2.0, capacity=5, retries=8, base=0.5, cap=20.0):
+        self.rate = rate          # tokens added per second
+        self.capacity = capacity  # maximum number of calls in a burst
+        self.retries = retries
+        self.base = base          # seconds of the first back-off, doubled on each retry
+        self.cap = cap            # maximum seconds of a back-off
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.throttled = 0.0      # seconds spent in back-off since last publication
+        self.lock = threading.Lock()
+
+    @classmethod
+    def shared_by(cls, concurrency, rate, capacity, **kwargs):
+        ''' get the bucket of one of several concurrent invocations that share a budget of calls '''
+        concurrency = max(1, concurrency)
+        return cls(rate=rate / concurrency, capacity=max(1, capacity // concurrency), **kwargs)
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1.0  # a negative balance reserves a future token
+            delay = max(0.0, -self.tokens / self.rate)
+        if delay:
+            time.sleep(delay)
+
+    def call(self, function, *args, **kwargs):
+        attempt = 0
+        while True:
+            self.acquire()
+            try:
+                return function(*args, **kwargs)
+            except botocore.exceptions.ClientError as error:
+                if not is_throttling(error) or attempt >= self.retries:
+                    raise
+                delay = random.uniform(0.0, min(self.cap, self.base * 2 ** attempt))  # full jitter
+                with self.lock:
+                    self.throttled += delay
+                logging.warning(f"Throttling detected, retrying in {delay:.2f} seconds")
+                time.sleep(delay)
+                attempt += 1
+
+    def publish(self, name='ThrottledTime', dimensions=None):
+        ''' put a metric of the time spent in back-off, if any '''
+        with self.lock:
+            throttled, self.throttled = self.throttled, 0.0
+        if throttled:
+            put_metric_data(name=name, dimensions=dimensions or [], value=throttled, unit='Seconds')
+        return throttled
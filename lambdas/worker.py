@@ -16,12 +16,12 @@ SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
 from botocore.exceptions import ClientError
-from boto3.session import Session
 import json
 import logging
 import os
 import time
 
+from clients import get_client
 from session import get_account_session
 
 
@@ -65,8 +65,7 @@ class Worker:
 
     @classmethod
     def deploy_events_rule(cls, event_bus_arn, role_arn, name, pattern, description="", session=None):
-        session = session or Session()
-        events = session.client('events')
+        events = get_client('events', session=session)
 
         if event_bus_arn == events.describe_event_bus().get('Arn'):
             logging.info(f"We are already on event bus '{event_bus_arn}'; there is no need for an additional forwarding rule")
@@ -90,8 +89,7 @@ class Worker:
 
     @classmethod
     def deploy_project(cls, name, description, buildspec, role, variables={}, session=None):
-        session = session or Session()
-        client = session.client('codebuild')
+        client = get_client('codebuild', session=session)
         environment_variables = [dict(name=k, value=str(variables[k]), type="PLAINTEXT") for k in variables.keys()]
         retries = 0
         while retries < 5:  # we may have to wait for IAM role to be really available
@@ -129,8 +127,7 @@ class Worker:
 
     @classmethod
     def deploy_role_for_codebuild(cls, name="SpaRoleForServerlessComputing", policy="AdministratorAccess", session=None):
-        session = session or Session()
-        iam = session.client('iam')
+        iam = get_client('iam', session=session)
 
         logging.info(f"Deploying role '{name}' for serverless computing with CodeBuild, ECS and Lambda")
 
@@ -166,8 +163,7 @@ class Worker:
 
     @classmethod
     def deploy_role_for_events(cls, event_bus_arn, name="SpaRoleForEvents", session=None):
-        session = session or Session()
-        iam = session.client('iam')
+        iam = get_client('iam', session=session)
 
         logging.info(f"Deploying role '{name}' for events rule")
 
@@ -213,8 +209,7 @@ class Worker:
 
     @classmethod
     def deploy_topic_for_alerts(cls, name="SpaAlertTopic", account=None):
-        session = get_account_session(account) if account else Session()
-        sns = session.client('sns')
+        sns = get_client('sns', session=get_account_session(account) if account else None)
 
         logging.info(f"Deploying topic '{name}' for budget alerts")
 
@@ -248,8 +243,7 @@ class Worker:
 
     @classmethod
     def grant_publishing_from_budgets(cls, topic_arn, account=None):
-        session = get_account_session(account) if account else Session()
-        sns = session.client('sns')
+        sns = get_client('sns', session=get_account_session(account) if account else None)
 
         try:
             logging.info("Allowing budgets to post message")
@@ -332,7 +326,7 @@ class Worker:
         session = session or get_account_session(details.id)
 
         logging.info(f"Preparing account '{details.id}'...")
-        logging.debug(f"account: {details.__dict__}")
+        logging.debug(f"account: {details}")
         logging.debug(f"settings: {settings}")
         role_arn = cls.deploy_role_for_events(event_bus_arn=event_bus_arn, session=session)
         cls.deploy_console_login_events_rule(event_bus_arn=event_bus_arn, role_arn=role_arn, session=session)
@@ -366,8 +360,7 @@ class Worker:
 
     @classmethod
     def run_project(cls, name, session=None):
-        session = session or Session()
-        client = session.client('codebuild')
+        client = get_client('codebuild', session=session)
         logging.info(f"Starting project build '{name}'")
         result = client.start_build(projectName=name)
         logging.debug(result.get('build'))
@@ -15,6 +15,8 @@ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
 SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
+import pytest
+
 from fixture_account import account_describe_mock
 
 from fixture_key_value_store import given_an_empty_table, given_a_table_of_activities, given_a_table_of_shadows
@@ -27,3 +29,38 @@ from fixture_cost_explorer import (sample_accounts,
                                    sample_chunk_monthly_charges_per_account,
                                    sample_chunk_monthly_services_per_account,
                                    sample_chunk_monthly_usages_per_account)
+
+
+@pytest.fixture(autouse=True)
+def forget_cached_accounts():
+    from account import Account  # as used by lambda handlers
+    from lambdas import Account as PackagedAccount  # as used by tests
+    for cache in {Account.cache, PackagedAccount.cache}:
+        cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def forget_assumed_sessions():
+    import session  # as used by lambda handlers
+    from lambdas import session as packaged_session  # as used by tests
+    for module in {session, packaged_session}:
+        module.forget_sessions()
+
+
+@pytest.fixture(autouse=True)
+def forget_clients():
+    import clients  # as used by lambda handlers
+    from lambdas import clients as packaged_clients  # as used by tests
+    for module in {clients, packaged_clients}:
+        module.forget_clients()
+
+
+@pytest.fixture(autouse=True)
+def forget_settings():
+    from settings import Settings  # as used by lambda handlers
+    from lambdas import Settings as PackagedSettings  # as used by tests
+    for item in {Settings, PackagedSettings}:
+        item.index.forget()
+        item.cache.clear()
+        item.cache_generation, item.cache_checked_at = None, None
+        item.compiled = None
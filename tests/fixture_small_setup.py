@@ -55,7 +55,8 @@ def _given_a_small_setup(environment='Spa'):
 
     context = SimpleNamespace(session=session)
 
-    context.root_id = session.client('organizations').create_organization(FeatureSet="ALL")["Organization"]["MasterAccountId"]
+    session.client('organizations').create_organization(FeatureSet="ALL")
+    context.root_id = session.client('organizations').list_roots()["Roots"][0]["Id"]
 
     result = session.client('organizations').create_account(Email="aws@example.com", AccountName="Example Corporation")
     context.root_account = result["CreateAccountStatus"]["AccountId"]
@@ -21,6 +21,7 @@ logging.getLogger('urllib3').setLevel(logging.CRITICAL)
 
 from io import BytesIO
 from unittest.mock import patch
+import json
 import os
 import pytest
 from types import SimpleNamespace
@@ -104,6 +105,9 @@ def test_set_default_values(toggles):
     assert toggles.automation_role_name_to_manage_codebuild == 'AWSControlTowerExecution'
     assert toggles.automation_verbosity == 'INFO'
     assert toggles.features_with_arm_architecture is False
+    assert toggles.features_with_compiled_settings is False
+    assert toggles.features_with_fan_out_sweeps is False
+    assert toggles.features_with_packed_settings is False
     assert toggles.features_with_cost_email_recipients is None
     assert toggles.features_with_cost_extra_currencies is None
     assert toggles.features_with_cost_management_tag is None
@@ -115,6 +119,9 @@ def test_set_default_values(toggles):
     assert toggles.features_with_tag_prefix == 'account-'
     assert toggles.metering_activities_datastore == 'ActivitiesTable'
     assert toggles.metering_activities_ttl_in_seconds == 31622400
+    assert toggles.metering_checks_datastore == 'ChecksTable'
+    assert toggles.metering_checks_ttl_in_seconds == 604800
+    assert toggles.metering_directory_datastore == 'DirectoryTable'
     assert toggles.metering_shadows_datastore == 'ShadowsTable'
     assert toggles.metering_shadows_ttl_in_seconds == 15811200
     assert toggles.metering_transactions_datastore == 'TransactionsTable'
@@ -176,6 +183,7 @@ def test_set_from_yaml(toggles):
     Configuration.set_from_yaml('fixtures/settings/settings.yaml', toggles=toggles)
     assert toggles.automation_account_id == '123456789012'
     assert toggles.automation_cockpit_markdown_text.strip() == '# Sustainable Personal Accounts Dashboard\nCurrently under active development (beta)'
+    assert toggles.automation_maintenance_window_duration_in_minutes == 0
     assert toggles.automation_maintenance_window_expression == 'cron(0 18 ? * SAT *)'
     assert toggles.automation_region == 'eu-west-1'
     assert toggles.automation_role_arn_to_manage_accounts == 'arn:aws:iam::222222222222:role/SpaAccountsManagementRole'
@@ -368,3 +376,15 @@ def test_validate_organizational_unit_on_missing_identifier():
     }
     with pytest.raises(AttributeError):
         Configuration.validate_organizational_unit(ou)
+
+
+@pytest.mark.unit_tests
+def test_write_compiled_settings(toggles, tmp_path):
+    settings = dict(defaults=dict(note='a note'), organizational_units=[dict(identifier='ou-1234')])
+    Configuration.set_from_settings(settings, toggles=toggles)
+    toggles.accounts = {}
+    name = Configuration.write_compiled_settings(directory=str(tmp_path), toggles=toggles)
+    with open(name) as stream:
+        content = json.load(stream)
+    assert content['accounts'] == {}
+    assert content['organizational_units']['ou-1234']['identifier'] == 'ou-1234'
@@ -21,7 +21,10 @@ logging.getLogger('urllib3').setLevel(logging.CRITICAL)
 
 from aws_cdk import Stack
 from aws_cdk.assertions import Template
+import base64
+import json
 import pytest
+import zlib
 
 from cdk import Configuration, Parameters
 
@@ -53,3 +56,33 @@ def test_resources_count():
     Parameters(scope=stack, id='my_construct')
     resources = Template.from_stack(stack).find_resources(type="AWS::SSM::Parameter")
     assert len(resources.keys()) >= 3
+
+
+@pytest.mark.unit_tests
+def test_get_settings_generation():
+    Configuration.initialize(stream='fixtures/settings/settings.yaml')
+    generation = Parameters.get_settings_generation()
+    assert len(generation) == 64
+    assert Parameters.get_settings_generation() == generation
+
+
+@pytest.mark.unit_tests
+def test_pack_settings():
+    accounts = {f"{i:012d}": dict(identifier=f"{i:012d}", note=f"account {i}") for i in range(3000)}
+    shards = Parameters.pack_settings(accounts=accounts, organizational_units={})
+    assert 1 < len(shards) < 20
+    assert max(len(shard) for shard in shards) <= Parameters.PACKED_SETTINGS_SHARD_SIZE
+    content = json.loads(zlib.decompress(base64.b64decode(''.join(shards))))
+    assert content == dict(accounts=accounts, organizational_units={})
+
+
+@pytest.mark.unit_tests
+def test_resources_count_with_packed_settings():
+    Configuration.initialize(stream='fixtures/settings/settings.yaml')
+    toggles.features_with_packed_settings = True
+    stack = Stack()
+    Parameters(scope=stack, id='my_construct')
+    resources = Template.from_stack(stack).find_resources(type="AWS::SSM::Parameter")
+    names = [item['Properties']['Name'] for item in resources.values()]
+    assert not [name for name in names if '/Accounts/' in name or '/OrganizationalUnits/' in name]
+    assert [name for name in names if '/PackedSettings/' in name]
@@ -40,6 +40,20 @@ def test_bucket_encryption():
         dict(BucketEncryption=dict(ServerSideEncryptionConfiguration=[dict(ServerSideEncryptionByDefault=dict(SSEAlgorithm="AES256"))])))
 
 
+@pytest.mark.unit_tests
+def test_expiration_of_cached_costs():
+    Configuration.initialize(stream='fixtures/settings/settings.yaml')
+    stack = Stack()
+    Reports(scope=stack, id='my_construct')
+    template = Template.from_stack(stack)
+    template.has_resource_properties(
+        "AWS::S3::Bucket",
+        dict(LifecycleConfiguration=dict(Rules=[dict(Id='CostsCache',
+                                                      Prefix=toggles.reporting_costs_cache_prefix + '/',
+                                                      ExpirationInDays=Reports.COSTS_CACHE_EXPIRATION_IN_DAYS,
+                                                      Status='Enabled')])))
+
+
 @pytest.mark.unit_tests
 def test_resources_count():
     Configuration.initialize(stream='fixtures/settings/settings.yaml')
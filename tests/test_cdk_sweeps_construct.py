@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Copyright Reply.com or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import logging
+logging.getLogger('botocore').setLevel(logging.CRITICAL)
+logging.getLogger('urllib3').setLevel(logging.CRITICAL)
+
+from aws_cdk import Stack
+from aws_cdk.assertions import Match, Template
+import pytest
+
+from cdk import Configuration
+from cdk.serverless_stack import ServerlessStack
+from cdk.sweeps_construct import Sweeps
+
+# pytestmark = pytest.mark.wip
+
+
+@pytest.mark.unit_tests
+def test_resources_count():
+    Configuration.initialize(stream='fixtures/settings/settings.yaml')
+    stack = Stack()
+    Sweeps(scope=stack, id='my_construct', parameters=ServerlessStack.get_parameters())
+    template = Template.from_stack(stack)
+    template.resource_count_is("AWS::DynamoDB::Table", 1)
+    template.resource_count_is("AWS::Lambda::Function", 0)
+    template.resource_count_is("AWS::SQS::Queue", 0)
+
+
+@pytest.mark.unit_tests
+def test_resources_count_with_fan_out_sweeps():
+    Configuration.initialize(stream='fixtures/settings/settings.yaml')
+    toggles.features_with_fan_out_sweeps = True
+    stack = Stack()
+    Sweeps(scope=stack, id='my_construct', parameters=ServerlessStack.get_parameters())
+    template = Template.from_stack(stack)
+    template.resource_count_is("AWS::DynamoDB::Table", 1)
+    template.resource_count_is("AWS::Lambda::Function", 1)
+    template.resource_count_is("AWS::SQS::Queue", 2)
+    template.has_resource_properties(
+        "AWS::Lambda::EventSourceMapping",
+        dict(FunctionResponseTypes=['ReportBatchItemFailures']))
+    template.has_resource_properties(
+        "AWS::Lambda::Function",
+        dict(Environment=dict(Variables=Match.object_like(dict(SWEEPS_MAX_CONCURRENCY=str(Sweeps.MAX_CONCURRENCY),
+                                                               ORGANIZATIONS_WRITE_RATE='2')))))
@@ -19,13 +19,15 @@ import logging
 logging.getLogger('botocore').setLevel(logging.CRITICAL)
 logging.getLogger('urllib3').setLevel(logging.CRITICAL)
 
-from unittest.mock import Mock, patch
+import botocore
+from unittest.mock import ANY, Mock, patch
 from moto import mock_aws
 import os
 import pytest
 from types import SimpleNamespace
 
-from lambdas import Account, State
+from lambdas import Account, AccountRecord, AccountTagSession, State
+from lambdas.throttling import AdaptiveRateLimiter
 
 # pytestmark = pytest.mark.wip
 
@@ -111,7 +113,7 @@ def test_set_state_to_vanilla():
     Account.set_state(account='0123456789012',
                       state=State.VANILLA,
                       session=session)
-    session.client.assert_called_with('organizations')
+    session.client.assert_called_with('organizations', config=ANY)
     session.client.return_value.tag_resource.assert_called_with(
         ResourceId='0123456789012',
         Tags=[{'Key': 'account-state', 'Value': 'vanilla'}])
@@ -123,7 +125,7 @@ def test_set_state_to_assigned():
     Account.set_state(account='0123456789012',
                       state=State.ASSIGNED,
                       session=session)
-    session.client.assert_called_with('organizations')
+    session.client.assert_called_with('organizations', config=ANY)
     session.client.return_value.tag_resource.assert_called_with(
         ResourceId='0123456789012',
         Tags=[{'Key': 'account-state', 'Value': 'assigned'}])
@@ -135,7 +137,7 @@ def test_set_state_to_released():
     Account.set_state(account='0123456789012',
                       state=State.RELEASED,
                       session=session)
-    session.client.assert_called_with('organizations')
+    session.client.assert_called_with('organizations', config=ANY)
     session.client.return_value.tag_resource.assert_called_with(
         ResourceId='0123456789012',
         Tags=[{'Key': 'account-state', 'Value': 'released'}])
@@ -147,7 +149,7 @@ def test_set_state_to_expired():
     Account.set_state(account='0123456789012',
                       state=State.EXPIRED,
                       session=session)
-    session.client.assert_called_with('organizations')
+    session.client.assert_called_with('organizations', config=ANY)
     session.client.return_value.tag_resource.assert_called_with(
         ResourceId='0123456789012',
         Tags=[{'Key': 'account-state', 'Value': 'expired'}])
@@ -229,6 +231,29 @@ def test_get_organizational_unit_name(given_a_small_setup):
     assert Account.get_organizational_unit_name(account='*unknown*') == "Unknown"
 
 
+@pytest.mark.integration_tests
+@mock_aws
+def test_get_ancestors(given_a_small_setup):
+    context = given_a_small_setup()
+    nested_ou = context.session.client('organizations').create_organizational_unit(ParentId=context.sandbox_ou, Name='nested')['OrganizationalUnit']['Id']
+    context.session.client('organizations').move_account(AccountId=context.bob_account, SourceParentId=context.sandbox_ou, DestinationParentId=nested_ou)
+    assert Account.get_ancestors(account=context.alice_account) == [context.sandbox_ou, context.root_id]
+    assert Account.get_ancestors(account=context.bob_account) == [nested_ou, context.sandbox_ou, context.root_id]
+    assert Account.get_ancestors(account='*unknown*') == []
+
+
+@pytest.mark.integration_tests
+@mock_aws
+def test_list_descendant_units(given_a_small_setup):
+    context = given_a_small_setup()
+    handle = context.session.client('organizations')
+    nested_ou = handle.create_organizational_unit(ParentId=context.sandbox_ou, Name='nested')['OrganizationalUnit']['Id']
+    deeper_ou = handle.create_organizational_unit(ParentId=nested_ou, Name='deeper')['OrganizationalUnit']['Id']
+    assert Account.list_descendant_units(parents=[context.sandbox_ou]) == [nested_ou, deeper_ou]
+    assert Account.list_descendant_units(parents=[context.sandbox_ou, nested_ou]) == [deeper_ou]
+    assert Account.get_parent(child=deeper_ou) == nested_ou
+
+
 @pytest.mark.unit_tests
 def test_validate_holder():
     Account.validate_holder('alpha-nc.aws.cloudops.fr@example.com')
@@ -264,3 +289,116 @@ def test_get_cost_center():
     with patch.dict(os.environ, dict(COST_MANAGEMENT_TAG='customTag')):
         assert Account.get_cost_center(tags=defaultTag) == 'NoCostTag'
         assert Account.get_cost_center(tags=customTag) == 'customised BU'
+
+
+@pytest.mark.integration_tests
+@mock_aws
+def test_describe_many(given_a_small_setup):
+    context = given_a_small_setup()
+    ids = [context.alice_account, context.bob_account, '210987654321', context.crm_account]
+    items = {item.id: item for item in Account.describe_many(ids=iter(ids), max_workers=2)}
+    assert set(items.keys()) == {context.alice_account, context.bob_account, context.crm_account}
+    assert items[context.alice_account].email == 'alice@example.com'
+    assert items[context.bob_account].tags.get('account-state') == 'expired'
+    assert items[context.crm_account].unit == context.committed_ou
+
+
+@pytest.mark.unit_tests
+def test_describe_many_when_throttled(monkeypatch):
+    throttled = botocore.exceptions.ClientError(dict(Error=dict(Code='TooManyRequestsException')), 'DescribeAccount')
+    monkeypatch.setattr(Account, 'describe', Mock(side_effect=throttled))
+    monkeypatch.setattr(Account, 'limiter', AdaptiveRateLimiter(rate=1000.0, retries=0))
+    with pytest.raises(botocore.exceptions.ClientError):  # the sweep fails, instead of skipping accounts as if they were missing
+        list(Account.describe_many(ids=['123456789012'], session=Mock()))
+
+
+@pytest.mark.unit_tests
+def test_map_concurrently():
+    results = set(Account.map_concurrently(function=lambda x: x * 2, ids=range(100), max_workers=4))
+    assert results == {x * 2 for x in range(100)}
+
+
+@pytest.mark.unit_tests
+def test_get_attributes_is_cached():
+    session = Mock()
+    session.client.return_value.describe_account.return_value = dict(Account=dict(Id='345678901234', Name='account-three'))
+    Account.get_attributes(account='345678901234', session=session)
+    assert Account.get_name(account='345678901234', session=session) == 'account-three'
+    assert session.client.return_value.describe_account.call_count == 1
+    Account.forget(account='345678901234')
+    Account.get_name(account='345678901234', session=session)
+    assert session.client.return_value.describe_account.call_count == 2
+
+
+@pytest.mark.unit_tests
+def test_tags_are_forgotten_on_change(valid_tags):
+    valid_tags.client.return_value.list_tags_for_resource.side_effect = None
+    valid_tags.client.return_value.list_tags_for_resource.return_value = dict(Tags=[dict(Key='account-state', Value='vanilla')])
+    Account.list_tags(account='345678901234', session=valid_tags)
+    tags = Account.list_tags(account='345678901234', session=valid_tags)
+    assert valid_tags.client.return_value.list_tags_for_resource.call_count == 1
+    tags['account-state'] = 'altered'  # cached value is not exposed to callers
+    Account.set_state(account='345678901234', state=State.RELEASED, session=valid_tags)
+    assert Account.list_tags(account='345678901234', session=valid_tags) == {'account-state': 'vanilla'}
+    assert valid_tags.client.return_value.list_tags_for_resource.call_count == 2
+
+
+@pytest.mark.unit_tests
+def test_account_record_is_loaded_on_demand(valid_tags):
+    valid_tags.client.return_value.describe_account.return_value = dict(Account=dict(Arn='arn', Email='a@b.com', Name='a', Status='ACTIVE'))
+    valid_tags.client.return_value.list_parents.return_value = dict(Parents=[dict(Id='r-1234')])
+    item = Account.describe(id='345678901234', session=valid_tags)
+    assert isinstance(item, AccountRecord)
+    assert item.is_active
+    valid_tags.client.return_value.list_tags_for_resource.assert_not_called()
+    valid_tags.client.return_value.list_parents.assert_not_called()
+    assert item.tags.get('account-state') == 'vanilla'
+    assert item.tags.get('account-state') == 'vanilla'
+    assert valid_tags.client.return_value.list_tags_for_resource.call_count == 2  # two pages
+    valid_tags.client.return_value.list_parents.assert_not_called()
+    assert item.to_dict() == dict(id='345678901234', arn='arn', email='a@b.com', name='a', is_active=True, status='ACTIVE',
+                                  tags={'account-holder': 'a@b.com', 'account-state': 'vanilla', 'another_tag': 'another_value'},
+                                  unit='r-1234', unit_name='Root')
+    assert valid_tags.client.return_value.list_parents.call_count == 1
+    assert item.__dict__ == item.to_dict()  # backward compatible with records that were a SimpleNamespace
+    assert vars(item) == item.to_dict()
+
+
+@pytest.mark.unit_tests
+def test_account_tag_session():
+    session = Mock()
+    current = {'account-holder': 'a@b.com', 'account-state': 'vanilla', 'obsolete': 'x'}
+    with AccountTagSession(account='345678901234', tags=current, session=session) as changes:
+        changes.untag(['obsolete', 'unknown'])
+        changes.tag({'account-holder': 'a@b.com', 'cost-center': 'abc'})
+        changes.set_state(State.ASSIGNED)
+        assert changes.get_tags() == {'account-holder': 'a@b.com', 'account-state': 'assigned', 'cost-center': 'abc'}
+    session.client.return_value.untag_resource.assert_called_once_with(ResourceId='345678901234', TagKeys=['obsolete'])
+    session.client.return_value.tag_resource.assert_called_once_with(
+        ResourceId='345678901234',
+        Tags=[{'Key': 'cost-center', 'Value': 'abc'}, {'Key': 'account-state', 'Value': 'assigned'}])
+
+
+@pytest.mark.unit_tests
+def test_account_tag_session_without_change():
+    session = Mock()
+    changes = AccountTagSession(account='345678901234', tags={'account-state': 'released'}, session=session)
+    changes.set_state(State.RELEASED)
+    changes.untag(['unknown'])
+    assert changes.commit() == 0
+    session.client.return_value.tag_resource.assert_not_called()
+    session.client.return_value.untag_resource.assert_not_called()
+    with pytest.raises(ValueError):
+        changes.set_state('released')
+
+
+@pytest.mark.integration_tests
+@mock_aws
+def test_resolve_labels(given_a_small_setup):
+    context = given_a_small_setup()
+    labels = Account.resolve_labels(ids=[context.alice_account, '210987654321', context.alice_account])
+    assert labels == {context.alice_account: f"alice ({context.alice_account})",
+                      '210987654321': '210987654321'}
+    details = Account.resolve_details(ids=[context.bob_account], with_units=True)
+    assert details == {context.bob_account: dict(id=context.bob_account, name='bob', unit_name=context.sandbox_ou_name)}
+    assert Account.resolve_labels(ids=[]) == {}
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Copyright Reply.com or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import logging
+logging.getLogger('botocore').setLevel(logging.CRITICAL)
+logging.getLogger('urllib3').setLevel(logging.CRITICAL)
+
+from moto import mock_aws
+import os
+import pytest
+from unittest.mock import patch
+
+from lambdas import AccountDirectory
+
+# pytestmark = pytest.mark.wip
+
+
+@pytest.mark.unit_tests
+@patch.dict(os.environ, dict(ACCOUNTS_DIRECTORY_DATASTORE='my_table'))
+@mock_aws
+def test_reconcile(given_an_empty_table):
+    given_an_empty_table()
+    directory = AccountDirectory()
+    assert AccountDirectory.is_enabled()
+    directory.put_account(dict(id='111111111111', name='a', tags={}))
+    directory.put_account(dict(id='222222222222', name='b', tags={}))
+    records = {'111111111111': dict(id='111111111111', name='a', tags={}),
+               '333333333333': dict(id='333333333333', name='c', tags={'account-state': 'vanilla'})}
+    assert directory.reconcile(records) == dict(written=1, removed=1, unchanged=1)
+    assert directory.get_accounts() == records
+    assert directory.reconcile(records) == dict(written=0, removed=0, unchanged=2)
+
+
+@pytest.mark.unit_tests
+@patch.dict(os.environ, dict(ACCOUNTS_DIRECTORY_DATASTORE='my_table'))
+@mock_aws
+def test_is_reconciled(given_an_empty_table):
+    given_an_empty_table()
+    directory = AccountDirectory()
+    directory.put_account(dict(id='111111111111', name='a', tags={}))
+    assert not directory.is_reconciled()  # filled by events only
+    directory.mark_reconciliation(count=1, now=1000.0)
+    assert directory.is_reconciled(now=1000.0 + 3600)
+    assert not directory.is_reconciled(now=1000.0 + 37 * 3600)  # last reconciliation has failed
+    assert list(directory.get_accounts().keys()) == ['111111111111']
+    assert directory.reconcile({}) == dict(written=0, removed=1, unchanged=0)
+    assert directory.is_reconciled(now=1000.0)
+
+
+@pytest.mark.unit_tests
+@patch.dict(os.environ, dict(), clear=True)
+def test_is_enabled():
+    assert not AccountDirectory.is_enabled()
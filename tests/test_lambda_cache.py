@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Copyright Reply.com or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import pytest
+from unittest.mock import patch
+
+from lambdas.cache import Cache
+
+# pytestmark = pytest.mark.wip
+
+
+@pytest.mark.unit_tests
+def test_get_and_put():
+    cache = Cache()
+    assert cache.get('a') is None
+    assert cache.get('a', 'default') == 'default'
+    assert cache.put('a', 1) == 1
+    assert cache.get('a') == 1
+    assert cache.get_statistics() == dict(hits=1, misses=2, size=1)
+
+
+@pytest.mark.unit_tests
+def test_eviction_of_least_recently_used():
+    cache = Cache(size=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+
+
+@pytest.mark.unit_tests
+def test_expiration():
+    cache = Cache(ttl=10)
+    with patch('lambdas.cache.time.monotonic', return_value=100.0):
+        cache.put('a', 1)
+    with patch('lambdas.cache.time.monotonic', return_value=109.0):
+        assert cache.get('a') == 1
+    with patch('lambdas.cache.time.monotonic', return_value=111.0):
+        assert cache.get('a') is None
+    assert cache.get_statistics()['size'] == 0
+
+
+@pytest.mark.unit_tests
+def test_forget_and_clear():
+    cache = Cache()
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.forget('a')
+    cache.forget('*unknown*')
+    assert cache.get('a') is None
+    cache.clear()
+    assert cache.get_statistics() == dict(hits=0, misses=0, size=0)
+
+
+@pytest.mark.unit_tests
+def test_expiration_of_one_entry():
+    cache = Cache(ttl=10)
+    with patch('lambdas.cache.time.monotonic', return_value=100.0):
+        cache.put('a', 1, ttl=3)
+        cache.put('b', 2)
+    with patch('lambdas.cache.time.monotonic', return_value=104.0):
+        assert cache.get('a') is None
+        assert cache.get('b') == 2
@@ -18,12 +18,17 @@ SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 import logging
 logging.getLogger('botocore').setLevel(logging.CRITICAL)
 logging.getLogger('urllib3').setLevel(logging.CRITICAL)
+import botocore
 
 from moto import mock_aws
+import os
 import pytest
 from types import SimpleNamespace
+from unittest.mock import Mock, patch
 
-from lambdas.check_accounts_handler import handle_event, validate_tags
+from lambdas import Checkpoint, Finding, KeyValueStore
+from lambdas import check_accounts_handler
+from lambdas.check_accounts_handler import get_fingerprint, handle_account, handle_event, validate_tags
 
 # pytestmark = pytest.mark.wip
 from account import Account  # visible from monkeypatch
@@ -47,6 +52,177 @@ def test_handle_event(monkeypatch, given_a_small_setup):
     assert processed == {context.crm_account, context.erp_account, context.alice_account, context.bob_account, '210987654321'}
 
 
+@pytest.mark.integration_tests
+@patch.dict(os.environ, dict(METERING_CHECKS_DATASTORE='my_table'))
+@mock_aws
+def test_handle_event_with_fingerprints(monkeypatch, given_a_small_setup, given_an_empty_table):
+    context = given_a_small_setup()
+    given_an_empty_table()
+
+    processed = []
+
+    def process(account, *arg, **kwargs):
+        processed.append(account)
+        return SimpleNamespace(id=account, tags={'account-holder': 'a@b.com', 'account-state': 'released'})
+
+    monkeypatch.setattr(Account, 'describe', process)
+
+    assert handle_event() == '[OK]'
+    assert set(processed) == {context.crm_account, context.erp_account, context.alice_account, context.bob_account, '210987654321'}
+
+    processed.clear()
+    assert handle_event() == '[OK]'
+    assert processed == ['210987654321']  # account is not in the organization and has no fingerprint
+
+    processed.clear()
+    assert handle_event(event={'force': True}) == '[OK]'
+    assert len(processed) == 5
+
+    get_settings_for_account = check_accounts_handler.Settings.get_settings_for_account
+
+    def get_settings(identifier, session=None, bulk=False):
+        settings = get_settings_for_account(identifier=identifier, session=session, bulk=bulk)
+        return dict(settings, account_tags={'cost-center': 'xyz'}) if identifier == context.alice_account else settings
+
+    monkeypatch.setattr(check_accounts_handler.Settings, 'get_settings_for_account', get_settings)
+    processed.clear()
+    assert handle_event() == '[OK]'
+    assert set(processed) == {context.alice_account, '210987654321'}  # only settings of the account have changed
+
+
+@pytest.mark.integration_tests
+@patch.dict(os.environ, dict(METERING_CHECKS_DATASTORE='my_table'))
+@mock_aws
+def test_handle_event_on_change_of_status(monkeypatch, given_a_small_setup, given_an_empty_table):
+    context = given_a_small_setup()
+    given_an_empty_table()
+
+    processed = []
+
+    def process(account, *arg, **kwargs):
+        processed.append(account)
+        return SimpleNamespace(id=account, tags={'account-holder': 'a@b.com', 'account-state': 'released'})
+
+    monkeypatch.setattr(Account, 'describe', process)
+
+    scan_all_accounts = Account.scan_all_accounts
+    statuses = {}
+
+    def scan(session=None):
+        accounts = scan_all_accounts(session=session)
+        for account, status in statuses.items():
+            accounts[account] = dict(accounts[account], status=status)
+        return accounts
+
+    monkeypatch.setattr(Account, 'scan_all_accounts', scan)
+
+    assert handle_event() == '[OK]'
+    processed.clear()
+    assert handle_event() == '[OK]'
+    assert processed == ['210987654321']
+
+    processed.clear()
+    statuses[context.alice_account] = 'PENDING_CLOSURE'  # only the status has changed
+    assert handle_event() == '[OK]'
+    assert set(processed) == {context.alice_account, '210987654321'}
+
+
+@pytest.mark.integration_tests
+@patch.dict(os.environ, dict(METERING_CHECKS_DATASTORE='my_table'))
+@mock_aws
+def test_handle_event_reports_unreachable_and_managed_accounts_only(monkeypatch, given_a_small_setup, given_an_empty_table):
+    context = given_a_small_setup()
+    given_an_empty_table()
+    store = KeyValueStore(table_name='my_table')
+    store.remember(hash='999999999999', value=dict(fingerprint='abc', findings=[], flags=0))  # account that is not managed anymore
+
+    def process(account, *arg, **kwargs):
+        if account == context.crm_account:
+            raise botocore.exceptions.ClientError(dict(Error=dict(Code='AccountNotFoundException')), 'DescribeAccount')
+        return SimpleNamespace(id=account, tags={'account-holder': 'a@b.com', 'account-state': 'released'})
+
+    monkeypatch.setattr(Account, 'describe', process)
+    reported = {}
+    monkeypatch.setattr(check_accounts_handler.Compliance, 'publish', lambda self: reported.update(self.items()))
+
+    assert handle_event() == '[OK]'
+    assert reported[context.crm_account] == Finding.UNREACHABLE
+    assert '999999999999' not in reported.keys()
+    assert store.retrieve(hash=context.crm_account)['flags'] == Finding.UNREACHABLE
+
+
+@pytest.mark.unit_tests
+@patch.dict(os.environ, dict(SWEEPS_QUEUE_URL='https://sqs.eu-west-3.amazonaws.com/123456789012/my-queue'))
+def test_handle_event_reports_when_no_account_is_dispatched(monkeypatch):
+    monkeypatch.setattr(check_accounts_handler.Settings, 'enumerate_all_managed_accounts', lambda: [])
+    dispatch = Mock()
+    monkeypatch.setattr(check_accounts_handler.Sweep, 'dispatch', dispatch)
+    report = Mock()
+    monkeypatch.setattr(check_accounts_handler, 'report_compliance', report)
+
+    assert handle_event() == '[OK]'
+    dispatch.assert_called_once()
+    report.assert_called_once()  # no shard will complete the sweep
+
+
+@pytest.mark.integration_tests
+@mock_aws
+def test_handle_event_reports_all_steps_of_a_run(monkeypatch, given_a_small_setup, given_an_empty_table):
+    context = given_a_small_setup()
+    given_an_empty_table()
+    store = KeyValueStore(table_name='my_table')
+    accounts = [context.bob_account, context.crm_account]
+    monkeypatch.setattr(check_accounts_handler.Settings, 'enumerate_all_managed_accounts', lambda: accounts)
+    store.remember(hash='my_run', range=Checkpoint.RANGE, value=dict(step=1, cursor=max(accounts), pending=[context.crm_account], started=1000.0, claimed=False))
+    store.remember(hash='my_run', range=f"{Checkpoint.RANGE}#0", value={context.bob_account: 0})
+
+    def process(account, *arg, **kwargs):
+        return SimpleNamespace(id=account, tags={'account-holder': 'a@b.com', 'account-state': 'released'})
+
+    monkeypatch.setattr(Account, 'describe', process)
+    monkeypatch.setattr(check_accounts_handler.Sweep, 'get_table', lambda: store)
+    reported = []
+    monkeypatch.setattr(check_accounts_handler.Compliance, 'publish', lambda self: reported.extend(account for account, flags in self.items()))
+
+    assert handle_event(event=dict(run='my_run', step=1)) == '[OK]'
+    assert set(reported) == {context.crm_account, context.bob_account}
+
+
+@pytest.mark.unit_tests
+def test_get_fingerprint():
+    record = dict(id='123456789012', tags={'account-state': 'released'}, status='ACTIVE', unit='ou-1234', name='a')
+    assert get_fingerprint(record) == get_fingerprint(dict(record, name='b'))
+    assert get_fingerprint(record) != get_fingerprint(dict(record, tags={'account-state': 'expired'}))
+    assert get_fingerprint(record) != get_fingerprint(dict(record, unit='ou-5678'))
+    assert get_fingerprint(record) != get_fingerprint(dict(record, status='SUSPENDED'))
+    legacy = dict(id='123456789012', tags={'account-state': 'released'}, is_active=True, unit='ou-1234')  # no status
+    assert get_fingerprint(legacy) != get_fingerprint(dict(legacy, is_active=False))
+    settings = dict(account_tags={'cost-center': 'abc'})
+    assert get_fingerprint(record, settings=settings) == get_fingerprint(record, settings=dict(settings))
+    assert get_fingerprint(record, settings=settings) != get_fingerprint(record, settings=dict(account_tags={'cost-center': 'xyz'}))
+
+
+@pytest.mark.unit_tests
+def test_handle_account_returns_findings():
+    item = SimpleNamespace(id='123456789012', tags={'account-holder': 'a@b.com', 'account-state': 'assigned'})
+    findings = handle_account(account=item.id, settings=dict(account_tags={'cost-center': 'abc'}), item=item)
+    assert len(findings) == 2
+    item = SimpleNamespace(id='123456789012', tags={'account-state': 'released'})
+    assert handle_account(account=item.id, item=item) == ["Account '123456789012' has no tag 'account-holder'"]
+
+
+@pytest.mark.unit_tests
+def test_handle_account_returns_flags():
+    item = SimpleNamespace(id='123456789012', tags={'account-holder': 'a@b.com', 'account-state': 'assigned'})
+    flags = []
+    handle_account(account=item.id, settings=dict(account_tags={'cost-center': 'abc', 'owner': 'x'}), item=item, flags=flags)
+    assert flags == [Finding.TRANSIENT_STATE, Finding.TAG_DRIFT]  # drift is counted once per account
+    item = SimpleNamespace(id='123456789012', tags={'account-holder': 'a@b.com', 'account-state': '*alien*'})
+    flags = []
+    handle_account(account=item.id, item=item, flags=flags)
+    assert flags == [Finding.INVALID_STATE]
+
+
 @pytest.mark.unit_tests
 def test_validate_tags():
     valid_tags = SimpleNamespace(id='123456789012',
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Copyright Reply.com or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import logging
+logging.getLogger('botocore').setLevel(logging.CRITICAL)
+logging.getLogger('urllib3').setLevel(logging.CRITICAL)
+
+import os
+import pytest
+from unittest.mock import Mock, patch
+
+from lambdas.clients import build_session, get_client, get_default_session
+
+# pytestmark = pytest.mark.wip
+
+
+@pytest.mark.unit_tests
+def test_get_client_is_cached_per_session():
+    session = Mock()
+    assert get_client('sts', session=session) is get_client('sts', session=session)
+    session.client.assert_called_once_with('sts')
+    get_client('sts', session=session, region='eu-west-1')
+    session.client.assert_called_with('sts', region_name='eu-west-1')
+    other = Mock()
+    get_client('sts', session=other)
+    other.client.assert_called_once_with('sts')
+
+
+@pytest.mark.unit_tests
+@patch.dict(os.environ, dict(AWS_DEFAULT_REGION='eu-west-3', CLIENT_MAX_POOL_CONNECTIONS='10', CLIENT_READ_TIMEOUT_IN_SECONDS='30'))
+def test_clients_are_configured():
+    client = get_client('s3', session=build_session())
+    assert client.meta.config.max_pool_connections == 10
+    assert client.meta.config.read_timeout == 30
+    assert client.meta.config.retries['mode'] == 'adaptive'
+    assert get_default_session() is get_default_session()
+    assert get_client('s3') is get_client('s3')
+
+
+@pytest.mark.unit_tests
+@patch.dict(os.environ, dict(AWS_DEFAULT_REGION='eu-west-3', CLIENT_MAX_POOL_CONNECTIONS='10', ORGANIZATIONS_MAX_ATTEMPTS='3'))
+def test_organizations_clients_surface_throttling():
+    client = get_client('organizations', session=build_session())
+    assert client.meta.config.max_pool_connections == 10
+    assert client.meta.config.retries['mode'] == 'standard'
+    assert client.meta.config.retries['total_max_attempts'] == 3
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Copyright Reply.com or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import boto3
+import logging
+logging.getLogger('botocore').setLevel(logging.CRITICAL)
+logging.getLogger('urllib3').setLevel(logging.CRITICAL)
+
+from moto import mock_aws
+import os
+import pytest
+from unittest.mock import patch
+
+from lambdas import Compliance, Finding
+
+# pytestmark = pytest.mark.wip
+
+
+@pytest.mark.unit_tests
+def test_add_and_count():
+    compliance = Compliance()
+    compliance.add(account='123456789012')
+    compliance.add(account='000000000001', flags=Finding.MISSING_HOLDER)
+    compliance.add(account='210987654321', flags=Finding.TRANSIENT_STATE | Finding.TAG_DRIFT)
+    assert len(compliance) == 3
+    assert dict(compliance.items())['000000000001'] == Finding.MISSING_HOLDER
+    counts = compliance.count()
+    assert counts['MISSING_HOLDER'] == 1
+    assert counts['TRANSIENT_STATE'] == 1
+    assert counts['TAG_DRIFT'] == 1
+    assert counts['INVALID_STATE'] == 0
+
+
+@pytest.mark.unit_tests
+def test_merge():
+    compliance = Compliance()
+    compliance.add(account='123456789012', flags=Finding.TAG_DRIFT)
+    compliance.merge(records=[dict(hash='123456789012', value=dict(flags=0)),
+                              dict(hash='210987654321', value=dict(flags=int(Finding.INVALID_STATE))),
+                              dict(hash='345678901234', value=dict(findings=[]))])
+    assert dict(compliance.items()) == {'123456789012': Finding.TAG_DRIFT,
+                                        '210987654321': Finding.INVALID_STATE,
+                                        '345678901234': Finding(0)}
+
+
+@pytest.mark.unit_tests
+def test_build_report():
+    compliance = Compliance()
+    compliance.add(account='123456789012')
+    compliance.add(account='210987654321', flags=Finding.TAG_DRIFT)
+    lines = compliance.build_report().splitlines()
+    assert lines[0] == 'Account,Compliant,MISSING_HOLDER,INVALID_STATE,TRANSIENT_STATE,TAG_DRIFT,UNREACHABLE'
+    assert lines[1] == '123456789012,yes,,,,,'
+    assert lines[2] == '210987654321,no,,,,x,'
+
+
+@pytest.mark.integration_tests
+@patch.dict(os.environ, dict(REPORTS_BUCKET_NAME='my_bucket', REPORTING_COMPLIANCE_PREFIX='Compliance'))
+@mock_aws
+def test_store_report():
+    s3 = boto3.client('s3')
+    s3.create_bucket(Bucket='my_bucket',
+                     CreateBucketConfiguration=dict(LocationConstraint='eu-west-3'))
+    compliance = Compliance()
+    compliance.add(account='123456789012', flags=Finding.UNREACHABLE)
+    compliance.store_report()
+    key = Compliance.get_report_path()
+    assert key.startswith('Compliance/')
+    assert s3.get_object(Bucket='my_bucket', Key=key)['Body'].read().decode().endswith('123456789012,no,,,,,x\r\n')
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Copyright Reply.com or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import pytest
+
+from lambdas.cost_cube import CostCube
+
+# pytestmark = pytest.mark.wip
+
+
+sample_charges = {'Product B': [{'account': '456789012345', 'charge': 'Tax', 'amount': '0.11', 'name': 'bob@example.com', 'unit': 'Committed'},
+                                {'account': '456789012345', 'charge': 'Usage', 'amount': '0.5590172084', 'name': 'bob@example.com', 'unit': 'Committed'}],
+                  'Product A': [{'account': '123456789012', 'charge': 'Tax', 'amount': '5.19', 'name': 'alice@example.com', 'unit': 'Committed'},
+                                {'account': '123456789012', 'charge': 'Usage', 'amount': '26.7945452638', 'name': 'alice@example.com', 'unit': 'Committed'},
+                                {'account': '012345678901', 'charge': 'Usage', 'amount': '1.2295395649', 'name': 'david@example.com', 'unit': 'Non-Committed'}]}
+
+
+@pytest.mark.unit_tests
+def test_of():
+    cube = CostCube.of(sample_charges, dimension='charge')
+    assert len(cube) == 5
+    assert CostCube.of(cube) is cube
+    assert cube.labels['value'] == ['Tax', 'Usage']  # labels are interned
+    assert cube.get_values('cost_center') == ['Product A', 'Product B']
+
+    cube = CostCube.of(sample_charges['Product A'], dimension='charge', cost_center='BU')
+    assert cube.get_values('cost_center') == ['BU']
+
+    items = ({'service': service, 'amount': amount} for service, amount in [('AWS Lambda', '1.5'), ('Amazon S3', '0.25')])
+    cube = CostCube.of(items, dimension='service', account='123456789012')  # breakdown of a single account
+    assert list(cube.rows(dimensions=('account', 'value'))) == [('123456789012', 'AWS Lambda', 1.5), ('123456789012', 'Amazon S3', 0.25)]
+
+
+@pytest.mark.unit_tests
+def test_rows():
+    cube = CostCube.of(sample_charges, dimension='charge')
+    rows = list(cube.rows(dimensions=('account', 'value'), where=dict(cost_center='Product A')))
+    assert rows == [('123456789012', 'Tax', 5.19), ('123456789012', 'Usage', 26.7945452638), ('012345678901', 'Usage', 1.2295395649)]
+    assert list(cube.rows(where=dict(cost_center='*unknown*'))) == []
+
+
+@pytest.mark.unit_tests
+def test_group_by_and_sum():
+    cube = CostCube.of(sample_charges, dimension='charge')
+    assert cube.group_by(dimensions=('unit',), where=dict(cost_center='Product A')) == {('Committed',): 5.19 + 26.7945452638,
+                                                                                        ('Non-Committed',): 1.2295395649}
+    assert cube.sum(where=dict(cost_center='Product B', value='Tax')) == 0.11
+    assert cube.sum() == pytest.approx(33.8831020371)
+
+
+@pytest.mark.unit_tests
+def test_pivot():
+    cube = CostCube.of(sample_charges, dimension='charge')
+    table = cube.pivot(dimensions=('unit', 'account'), where=dict(cost_center='Product A'))
+    assert table == {('Committed', '123456789012'): {'Tax': 5.19, 'Usage': 26.7945452638},
+                     ('Non-Committed', '012345678901'): {'Usage': 1.2295395649}}
@@ -20,9 +20,13 @@ import logging
 logging.getLogger("botocore").setLevel(logging.CRITICAL)
 logging.getLogger("urllib3").setLevel(logging.CRITICAL)
 
-from datetime import date
-from unittest.mock import Mock
+import boto3
+from datetime import date, datetime, timezone
+from moto import mock_aws
+import os
+from unittest.mock import Mock, patch
 import pytest
+from time import time
 
 from lambdas.costs import Costs
 
@@ -598,3 +602,181 @@ def test_build_summary_of_services_csv_report():
 def test_build_summary_of_services_excel_report():
     report = Costs.build_summary_of_services_excel_report(costs=sample_summary_of_services, day=date(2023, 3, 23))
     assert len(report) > 200
+
+
+@pytest.mark.unit_tests
+def test_is_closed_period():
+    period = dict(Start='2023-03-01', End='2023-04-01')
+    assert Costs.is_closed_period(period=period, today=date(2023, 4, 3)) is False
+    assert Costs.is_closed_period(period=period, today=date(2023, 4, 6)) is True
+
+
+@pytest.mark.unit_tests
+def test_get_cache_expiration():
+    period = dict(Start='2023-03-01', End='2023-04-01')
+    assert Costs.get_cache_expiration(period=period, today=date(2023, 4, 3)) < time() + 3601  # open period
+    assert Costs.get_cache_expiration(period=period, today=date(2023, 4, 6)) == datetime(2023, 5, 15, tzinfo=timezone.utc).timestamp()
+    assert Costs.get_cache_expiration(period=period, today=date(2023, 12, 20)) == datetime(2024, 1, 15, tzinfo=timezone.utc).timestamp()
+
+
+@pytest.mark.unit_tests
+def test_get_cache_key():
+    assert Costs.get_cache_key(prefix='Cache', parameters=dict(a=1, b=2)) == Costs.get_cache_key(prefix='Cache', parameters=dict(b=2, a=1))
+    assert Costs.get_cache_key(prefix='Cache', parameters=dict(a=1)) != Costs.get_cache_key(prefix='Cache', parameters=dict(a=2))
+    assert Costs.get_cache_key(prefix='Cache', parameters=dict(a=1)).startswith('Cache/')
+
+
+@pytest.mark.integration_tests
+@patch.dict(os.environ, dict(REPORTS_BUCKET_NAME='my_bucket', COSTS_CACHE_PREFIX='Cache'))
+@mock_aws
+def test_get_cost_and_usage_from_cache(sample_chunk_monthly_charges_per_account):
+    boto3.client('s3').create_bucket(Bucket='my_bucket',
+                                     CreateBucketConfiguration=dict(LocationConstraint='eu-west-3'))
+    mock = Mock()
+    mock.get_cost_and_usage.return_value = sample_chunk_monthly_charges_per_account
+    period = dict(Start='2023-03-01', End='2023-04-01')
+    first = Costs.get_cost_and_usage(mock, TimePeriod=period, Granularity='MONTHLY')
+    second = Costs.get_cost_and_usage(mock, TimePeriod=period, Granularity='MONTHLY')
+    assert mock.get_cost_and_usage.call_count == 1
+    assert second['ResultsByTime'] == first['ResultsByTime']
+
+
+@pytest.mark.integration_tests
+@patch.dict(os.environ, dict(REPORTS_BUCKET_NAME='my_bucket', COSTS_CACHE_PREFIX='Cache', COSTS_CACHE_TTL_IN_SECONDS='-1'))
+@mock_aws
+def test_get_cost_and_usage_for_open_period(sample_chunk_monthly_charges_per_account):
+    boto3.client('s3').create_bucket(Bucket='my_bucket',
+                                     CreateBucketConfiguration=dict(LocationConstraint='eu-west-3'))
+    mock = Mock()
+    mock.get_cost_and_usage.return_value = sample_chunk_monthly_charges_per_account
+    period = dict(Start='2023-03-01', End='2023-04-01')
+    Costs.get_cost_and_usage(mock, today=date(2023, 4, 2), TimePeriod=period, Granularity='MONTHLY')
+    Costs.get_cost_and_usage(mock, today=date(2023, 4, 2), TimePeriod=period, Granularity='MONTHLY')
+    assert mock.get_cost_and_usage.call_count == 2  # cached response has expired already
+
+
+@pytest.mark.integration_tests
+@patch.dict(os.environ, dict(REPORTS_BUCKET_NAME='my_bucket', COSTS_CACHE_PREFIX='Cache'))
+@mock_aws
+def test_get_cost_and_usage_with_refresh(sample_chunk_monthly_charges_per_account):
+    boto3.client('s3').create_bucket(Bucket='my_bucket',
+                                     CreateBucketConfiguration=dict(LocationConstraint='eu-west-3'))
+    mock = Mock()
+    mock.get_cost_and_usage.return_value = sample_chunk_monthly_charges_per_account
+    period = dict(Start='2023-03-01', End='2023-04-01')
+    Costs.get_cost_and_usage(mock, TimePeriod=period, Granularity='MONTHLY')
+    Costs.get_cost_and_usage(mock, refresh=True, TimePeriod=period, Granularity='MONTHLY')  # e.g., to detect late adjustments
+    assert mock.get_cost_and_usage.call_count == 2
+    Costs.get_cost_and_usage(mock, TimePeriod=period, Granularity='MONTHLY')
+    assert mock.get_cost_and_usage.call_count == 2
+
+
+@pytest.mark.unit_tests
+def test_plan_monthly_queries():
+    plan = Costs.plan_monthly_queries(labels=['service', 'usage', 'charge', 'service'], day=date(2023, 3, 23))
+    assert [labels for _, labels in plan] == [['service'], ['usage'], ['charge']]
+    parameters, _ = plan[0]
+    assert parameters['TimePeriod'] == dict(Start='2023-03-01', End='2023-04-01')
+    assert parameters['GroupBy'][1]['Key'] == 'SERVICE'
+    with pytest.raises(ValueError):
+        Costs.plan_monthly_queries(labels=['*unknown*'])
+
+
+@pytest.mark.unit_tests
+def test_get_views_per_cost_center(sample_chunk_monthly_charges_per_account, sample_chunk_monthly_services_per_account, sample_accounts):
+    chunks = dict(RECORD_TYPE=sample_chunk_monthly_charges_per_account, SERVICE=sample_chunk_monthly_services_per_account)
+
+    def get_cost_and_usage(**parameters):
+        return chunks[parameters['GroupBy'][1]['Key']]
+
+    mock = Mock()
+    mock.client.return_value.get_cost_and_usage.side_effect = get_cost_and_usage
+    views = Costs.get_views_per_cost_center(labels=['service', 'charge'], accounts=sample_accounts, session=mock)
+    assert mock.client.return_value.get_cost_and_usage.call_count == 2
+    assert views['charge'] == Costs.get_charges_per_cost_center(accounts=sample_accounts, session=mock)
+    assert views['service'] == Costs.get_services_per_cost_center(accounts=sample_accounts, session=mock)
+
+
+@pytest.mark.integration_tests
+@patch.dict(os.environ, dict(REPORTS_BUCKET_NAME='my_bucket', COSTS_DAILY_PREFIX='Daily'))
+@mock_aws
+def test_enumerate_monthly_services_per_account_from_store():
+    boto3.client('s3').create_bucket(Bucket='my_bucket',
+                                     CreateBucketConfiguration=dict(LocationConstraint='eu-west-3'))
+    rows = [['123456789012', 'Amazon S3', '1.5'], ['123456789012', 'AWS Lambda', '0.25']]
+    for day in range(1, 30):
+        Costs.store_daily_services(day=date(2023, 2, day) if day < 29 else date(2023, 3, 1), rows=rows)
+    assert Costs.load_daily_services(day=date(2023, 2, 3)) == rows
+
+    breakdowns = dict(Costs.enumerate_monthly_services_per_account_from_store(day=date(2023, 2, 28)))
+    amounts = {item['service']: float(item['amount']) for item in breakdowns['123456789012']}
+    assert amounts == {'Amazon S3': 28 * 1.5, 'AWS Lambda': 28 * 0.25}
+
+    assert Costs.enumerate_monthly_services_per_account_from_store(day=date(2023, 3, 31)) is None  # some days are missing
+
+
+@pytest.mark.unit_tests
+def test_get_daily_totals_per_account(sample_chunk_daily_costs_per_account):
+    mock = Mock()
+    mock.client.return_value.get_cost_and_usage.return_value = sample_chunk_daily_costs_per_account  # 0.1234 for account 123456789012
+    assert Costs.get_daily_totals_per_account(day=date(2023, 4, 30), session=mock) == {'2023-04-07': {'123456789012': 0.1234}}
+    rows = [['123456789012', 'Amazon S3', '0.1234']]
+    assert Costs.is_drifting(rows=rows, totals={'123456789012': 0.1234}) is False
+    assert Costs.is_drifting(rows=rows, totals={'123456789012': 0.2}) is True
+    assert Costs.is_drifting(rows=rows, totals={}) is True
+
+
+@pytest.mark.integration_tests
+@patch.dict(os.environ, dict(REPORTS_BUCKET_NAME='my_bucket', COSTS_DAILY_PREFIX='Daily'))
+@mock_aws
+def test_reconcile_monthly_services_stores_again_a_drifting_day():
+    boto3.client('s3').create_bucket(Bucket='my_bucket',
+                                     CreateBucketConfiguration=dict(LocationConstraint='eu-west-3'))
+    rows = [['123456789012', 'Amazon S3', '1.5']]
+    for day in range(1, 29):
+        Costs.store_daily_services(day=date(2023, 2, day), rows=rows)
+
+    def get_cost_and_usage(**parameters):
+        if len(parameters['GroupBy']) == 1:  # totals per account for each day, with a late credit on the 3rd
+            return dict(ResultsByTime=[dict(TimePeriod=dict(Start=f"2023-02-{day:02d}"),
+                                            Groups=[dict(Keys=['123456789012'],
+                                                         Metrics=dict(UnblendedCost=dict(Amount='1.0' if day == 3 else '1.5')))])
+                                       for day in range(1, 29)])
+        assert parameters['TimePeriod'] == dict(Start='2023-02-03', End='2023-02-04')
+        return dict(ResultsByTime=[dict(TimePeriod=dict(Start='2023-02-03'),
+                                        Groups=[dict(Keys=['123456789012', 'Amazon S3'],
+                                                     Metrics=dict(UnblendedCost=dict(Amount='1.0')))])])
+
+    mock = Mock()
+    mock.client.return_value.get_cost_and_usage.side_effect = get_cost_and_usage
+    breakdowns = dict(Costs.get_stored_monthly_services(day=date(2023, 2, 28), session=mock))
+    assert mock.client.return_value.get_cost_and_usage.call_count == 2  # totals of the month, then the drifting day only
+    assert float(breakdowns['123456789012'][0]['amount']) == pytest.approx(27 * 1.5 + 1.0)
+    assert Costs.load_daily_services(day=date(2023, 2, 3)) == [['123456789012', 'Amazon S3', '1.0']]  # repaired in the store
+
+
+@pytest.mark.integration_tests
+@patch.dict(os.environ, dict(REPORTS_BUCKET_NAME='my_bucket', COSTS_DAILY_PREFIX='Daily'))
+@mock_aws
+def test_reconcile_monthly_services_with_an_empty_store():
+    boto3.client('s3').create_bucket(Bucket='my_bucket',
+                                     CreateBucketConfiguration=dict(LocationConstraint='eu-west-3'))
+
+    def get_cost_and_usage(**parameters):
+        if len(parameters['GroupBy']) == 1:  # totals per account for each day
+            return dict(ResultsByTime=[dict(TimePeriod=dict(Start=f"2023-02-{day:02d}"),
+                                            Groups=[dict(Keys=['123456789012'],
+                                                         Metrics=dict(UnblendedCost=dict(Amount='1.5')))])
+                                       for day in range(1, 29)])
+        assert parameters['TimePeriod'] == dict(Start='2023-02-01', End='2023-03-01')  # all days at once
+        return dict(ResultsByTime=[dict(TimePeriod=dict(Start=f"2023-02-{day:02d}"),
+                                        Groups=[dict(Keys=['123456789012', 'Amazon S3'],
+                                                     Metrics=dict(UnblendedCost=dict(Amount='1.5')))])
+                                   for day in range(1, 29)])
+
+    mock = Mock()
+    mock.client.return_value.get_cost_and_usage.side_effect = get_cost_and_usage
+    rows_per_day = Costs.reconcile_monthly_services(day=date(2023, 2, 28), session=mock, today=date(2023, 3, 10))
+    assert mock.client.return_value.get_cost_and_usage.call_count == 2  # totals of the month, then services of the month
+    assert len(rows_per_day) == 28
+    assert Costs.load_daily_services(day=date(2023, 2, 14)) == [['123456789012', 'Amazon S3', '1.5']]
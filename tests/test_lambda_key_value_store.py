@@ -107,3 +107,16 @@ def test_scan_from_fixture(given_a_table_of_shadows):
     count = given_a_table_of_shadows()
     store = KeyValueStore(table_name='my_table')
     assert len(list(store.scan())) == count
+
+
+@pytest.mark.unit_tests
+@mock_aws
+def test_add_to_set(given_an_empty_table):
+    given_an_empty_table()
+
+    store = KeyValueStore(table_name='my_table')
+    store.remember(hash='a', value=dict(hello='world'))
+    assert store.add_to_set(hash='a', attribute='Shards', values=['1']) == set()
+    assert store.add_to_set(hash='a', attribute='Shards', values=['2']) == {'1'}
+    assert store.add_to_set(hash='a', attribute='Shards', values=['1']) == {'1', '2'}  # idempotent
+    assert store.retrieve(hash='a') == dict(hello='world')
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Copyright Reply.com or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import logging
+logging.getLogger('botocore').setLevel(logging.CRITICAL)
+logging.getLogger('urllib3').setLevel(logging.CRITICAL)
+
+import boto3
+from moto import mock_aws
+import os
+import pytest
+from unittest.mock import patch
+
+from lambdas import Account, AccountDirectory, Events
+from lambdas.on_account_directory_handler import handle_organization_event, handle_reconciliation
+
+# pytestmark = pytest.mark.wip
+
+
+@pytest.mark.integration_tests
+@patch.dict(os.environ, dict(ACCOUNTS_DIRECTORY_DATASTORE='my_table',
+                             VERBOSITY='INFO'))
+@mock_aws
+def test_handle_organization_event(given_a_small_setup, given_an_empty_table):
+    context = given_a_small_setup()
+    given_an_empty_table()
+    event = Events.load_event_from_template(template="fixtures/events/move-account-template.json",
+                                            context=dict(account=context.bob_account,
+                                                         destination_organizational_unit=context.sandbox_ou,
+                                                         origin_organizational_unit=context.unmanaged_ou))
+    assert handle_organization_event(event=event) == f"[OK] MoveAccount {context.bob_account}"
+    record = AccountDirectory().get_account(context.bob_account)
+    assert record['unit'] == context.sandbox_ou
+    assert record['path'] == f"Root/{context.sandbox_ou_name}"
+    assert record['tags']['account-state'] == 'expired'
+
+    boto3.client('organizations').tag_resource(ResourceId=context.bob_account, Tags=[dict(Key='account-state', Value='vanilla')])
+    event = Events.load_event_from_template(template="fixtures/events/tag-account-template.json",
+                                            context=dict(account=context.bob_account,
+                                                         new_state='vanilla'))
+    assert handle_organization_event(event=event) == f"[OK] TagResource {context.bob_account}"
+    record = AccountDirectory().get_account(context.bob_account)
+    assert record['tags']['account-state'] == 'vanilla'
+    assert record['path'] == f"Root/{context.sandbox_ou_name}"
+
+
+@pytest.mark.integration_tests
+@patch.dict(os.environ, dict(ACCOUNTS_DIRECTORY_DATASTORE='my_table',
+                             VERBOSITY='INFO'))
+@mock_aws
+def test_handle_organization_event_on_organizational_unit(given_a_small_setup, given_an_empty_table):
+    context = given_a_small_setup()
+    given_an_empty_table()
+    event = Events.load_event_from_template(template="fixtures/events/tag-account-template.json",
+                                            context=dict(account=context.sandbox_ou,
+                                                         new_state='vanilla'))
+    assert handle_organization_event(event=event).startswith("[DEBUG] Invalid account identifier")
+    assert AccountDirectory().get_accounts() == {}
+
+
+@pytest.mark.integration_tests
+@patch.dict(os.environ, dict(ACCOUNTS_DIRECTORY_DATASTORE='my_table',
+                             VERBOSITY='INFO'))
+@mock_aws
+def test_handle_reconciliation(given_a_small_setup, given_an_empty_table):
+    context = given_a_small_setup()
+    given_an_empty_table()
+    AccountDirectory().put_account(dict(id=context.alice_account, name='alice', tags={}, path='Root'))
+    accounts = Account.scan_all_accounts()
+    assert len(accounts) == 7  # directory has not been reconciled yet, organization is read instead
+    assert handle_reconciliation() == "[OK]"
+    accounts = Account.scan_all_accounts()
+    assert accounts[context.alice_account]['path'] == f"Root/{context.sandbox_ou_name}"
+    assert accounts[context.root_account]['path'] == 'Root'
@@ -61,6 +61,25 @@ def test_handle_account_event(given_an_empty_table):
     assert 'last_purge_log' in record.keys()
 
 
+@pytest.mark.integration_tests
+@patch.dict(os.environ, dict(ENVIRONMENT_IDENTIFIER="envt1",
+                             METERING_SHADOWS_DATASTORE="my_table"))
+@mock_aws
+def test_handle_account_events_on_changes_of_state(given_a_small_setup, given_an_empty_table):
+    context = given_a_small_setup()
+    given_an_empty_table()
+    instance = KeyValueStore(table_name="my_table")
+
+    for label, state in [('ReleasedAccount', 'released'), ('ExpiredAccount', 'expired')]:  # in the same warm container
+        context.session.client('organizations').tag_resource(ResourceId=context.crm_account, Tags=[dict(Key='account-state', Value=state)])
+        event = Events.load_event_from_template(template="fixtures/events/account-event-template.json",
+                                                context=dict(account=context.crm_account,
+                                                             label=label,
+                                                             environment="envt1"))
+        assert handle_account_event(event=event) == f"[OK] {label} {context.crm_account}"
+        assert instance.retrieve(hash=context.crm_account)['tags']['account-state'] == state
+
+
 @pytest.mark.unit_tests
 @patch.dict(os.environ, dict(ENVIRONMENT_IDENTIFIER="envt1",
                              METERING_SHADOWS_DATASTORE="my_table",
@@ -31,8 +31,10 @@ from lambdas import Events, State
 from lambdas.on_assigned_account_handler import handle_tag_event
 
 # pytestmark = pytest.mark.wip
-from account import Account  # accessible from monkeypatch
-from worker import Worker    # accessible from monkeypatch
+from account import Account      # accessible from monkeypatch
+import events                    # accessible from monkeypatch
+from session import SessionPool  # accessible from monkeypatch
+from worker import Worker        # accessible from monkeypatch
 
 
 def given_some_context(prefix='/Fake/'):
@@ -119,7 +121,7 @@ def test_handle_tag_event(monkeypatch):
                                                          new_state=State.ASSIGNED.value))
     with patch('lambdas.on_assigned_account_handler.prepare_topic', return_value='aws:arn'):
         result = handle_tag_event(event=event, context=None, session=context.session)
-    assert result == '[OK]'
+    assert result == dict(batchItemFailures=[])
     assert processed == ["123456789012"]
 
     # preparation has not been enabled on "567890123456"
@@ -134,10 +136,48 @@ def test_handle_tag_event(monkeypatch):
                                             context=dict(account="567890123456",
                                                          new_state=State.ASSIGNED.value))
     result = handle_tag_event(event=event, context=None, session=context.session)
-    assert result == '[OK]'
+    assert result == dict(batchItemFailures=[])
     assert processed == ["567890123456"]
 
 
+@pytest.mark.integration_tests
+@patch.dict(os.environ, dict(ACCOUNTS_PARAMETER="Accounts",
+                             PREPARATION_BUILDSPEC_PARAMETER="buildspec",
+                             AUTOMATION_ACCOUNT="123456789012",
+                             AUTOMATION_REGION="eu-west-12",
+                             AWS_REGION='eu-west-1',
+                             EVENT_BUS_ARN='arn:aws',
+                             ENVIRONMENT_IDENTIFIER='Test',
+                             ORGANIZATIONAL_UNITS_PARAMETER="OrganizationalUnits"))
+@mock_aws
+def test_handle_tag_event_on_a_batch_of_accounts(monkeypatch):
+    context = given_some_context(prefix="/{}/".format(os.environ['ENVIRONMENT_IDENTIFIER']))
+
+    prepared = {}
+
+    def mock_worker_prepare(details, session=None, *args, **kwargs):
+        prepared[details.id] = session
+
+    monkeypatch.setattr(Worker, 'prepare', mock_worker_prepare)
+    monkeypatch.setattr(Account, 'tag', Mock())
+    monkeypatch.setattr(Account, 'describe', lambda id, *args, **kwargs: SimpleNamespace(id=id, email='a@b.com'))
+    released = []
+    monkeypatch.setattr(Account, 'set_state', lambda account, *args, **kwargs: released.append(account))
+
+    records = []
+    for account in ["123456789012", "567890123456"]:
+        records.extend(Events.load_event_from_template(template="fixtures/events/queued-event-template.json",
+                                                       context=dict(account=account,
+                                                                    new_state=State.ASSIGNED.value))['Records'])
+        records[-1]['messageId'] = account
+    with patch('lambdas.on_assigned_account_handler.prepare_topic', return_value='aws:arn'):
+        result = handle_tag_event(event=dict(Records=records), context=None, session=context.session)
+    assert result == dict(batchItemFailures=[])
+    assert list(prepared.keys()) == ["123456789012"]
+    assert prepared["123456789012"] is not None  # assumed in the account by the pool of sessions
+    assert released == ["567890123456"]  # preparation has not been enabled
+
+
 @pytest.mark.integration_tests
 @patch.dict(os.environ, dict(ACCOUNTS_PARAMETER="Accounts",
                              ENVIRONMENT_IDENTIFIER='Test',
@@ -152,4 +192,41 @@ def test_handle_tag_event_on_unexpected_state():
                                             context=dict(account="123456789012",
                                                          new_state=State.VANILLA.value))
     result = handle_tag_event(event=event, context=None, session=context.session)
-    assert result == "[DEBUG] Unexpected state 'vanilla' for this function"
+    assert result == dict(batchItemFailures=[dict(itemIdentifier=event['Records'][0]['messageId'])])
+
+
+@pytest.mark.integration_tests
+@patch.dict(os.environ, dict(ACCOUNTS_PARAMETER="Accounts",
+                             PREPARATION_BUILDSPEC_PARAMETER="buildspec",
+                             AUTOMATION_ACCOUNT="123456789012",
+                             AUTOMATION_REGION="eu-west-12",
+                             AWS_REGION='eu-west-1',
+                             EVENT_BUS_ARN='arn:aws',
+                             ENVIRONMENT_IDENTIFIER='Test',
+                             ORGANIZATIONAL_UNITS_PARAMETER="OrganizationalUnits"))
+@mock_aws
+def test_handle_tag_event_on_unreachable_account(monkeypatch):
+    context = given_some_context(prefix="/{}/".format(os.environ['ENVIRONMENT_IDENTIFIER']))
+
+    prepared = []
+
+    def mock_worker_prepare(details, session=None, *args, **kwargs):
+        prepared.append((details.id, session))
+        if session is None:
+            raise ValueError("Unable to assume role")
+
+    monkeypatch.setattr(Worker, 'prepare', mock_worker_prepare)
+    monkeypatch.setattr(Account, 'tag', Mock())
+    monkeypatch.setattr(Account, 'describe', lambda id, *args, **kwargs: SimpleNamespace(id=id, email='a@b.com'))
+    emitted = []
+    monkeypatch.setattr(events.Events, 'emit_account_event', lambda label, account, *args, **kwargs: emitted.append(account))
+    monkeypatch.setattr(SessionPool, 'assume', lambda self, account: (account, None))  # role cannot be assumed
+
+    event = Events.load_event_from_template(template="fixtures/events/queued-event-template.json",
+                                            context=dict(account="123456789012",
+                                                         new_state=State.ASSIGNED.value))
+    with patch('lambdas.on_assigned_account_handler.prepare_topic', return_value='aws:arn'):
+        result = handle_tag_event(event=event, context=None, session=context.session)
+    assert emitted == ["123456789012"]  # account is handled even if its role cannot be assumed
+    assert prepared == [("123456789012", None)]  # the worker tries again to assume the role
+    assert result == dict(batchItemFailures=[dict(itemIdentifier=event['Records'][0]['messageId'])])
@@ -15,14 +15,19 @@ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
 SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
+import boto3
+import json
 import logging
+import os
+from unittest.mock import patch
 logging.getLogger('botocore').setLevel(logging.CRITICAL)
 logging.getLogger('urllib3').setLevel(logging.CRITICAL)
 
 from moto import mock_aws
 import pytest
 
-from lambdas.on_maintenance_window_handler import handle_schedule_event
+import lambdas.on_maintenance_window_handler
+from lambdas.on_maintenance_window_handler import delay_account, get_slot, handle_queue_event, handle_schedule_event, handle_shard, schedule_account
 
 # pytestmark = pytest.mark.wip
 from account import Account  # accessible from monkeypatch
@@ -42,3 +47,81 @@ def test_handle_schedule_event(given_a_small_setup, monkeypatch):
 
     assert handle_schedule_event() == '[OK]'
     assert processed == [context.alice_account]
+
+
+@pytest.mark.unit_tests
+def test_get_slot():
+    slots = [get_slot(account=f"{i:012d}", window=60) for i in range(600)]
+    assert all(0 <= slot < 60 for slot in slots)
+    assert len(set(slots)) > 50  # accounts are spread over the window
+    assert get_slot(account='123456789012', window=60) == get_slot(account='123456789012', window=60)
+
+
+@pytest.mark.integration_tests
+@mock_aws
+def test_schedule_account(given_a_small_setup, monkeypatch):
+    context = given_a_small_setup()
+
+    delayed = []
+
+    def delay_account(account, due, now=None):
+        delayed.append(dict(account=account, due=due, now=now))
+
+    monkeypatch.setattr(lambdas.on_maintenance_window_handler, 'delay_account', delay_account)
+    item = Account.describe(context.alice_account)
+    schedule_account(account=context.alice_account, item=item, window=60, now=1000.0)
+    assert delayed == [dict(account=context.alice_account,
+                            due=1000.0 + 60 * get_slot(account=context.alice_account, window=60),
+                            now=1000.0)]
+
+    delayed.clear()  # in a continuation of the run, slots are counted from the start of the run
+    schedule_account(account=context.alice_account, item=item, window=60, now=1500.0, started=1000.0)
+    assert delayed[0]['due'] == 1000.0 + 60 * get_slot(account=context.alice_account, window=60)
+
+
+@pytest.mark.integration_tests
+@patch.dict(os.environ, dict(MAINTENANCE_WINDOW_DURATION_IN_MINUTES='60', EXPIRATIONS_QUEUE_URL='queue'))
+@mock_aws
+def test_handle_shard_of_a_sweep(given_a_small_setup, monkeypatch):
+    context = given_a_small_setup()
+    origins = []
+
+    def schedule_account(account, item, window, now=None, started=None):
+        origins.append(started)
+
+    monkeypatch.setattr(lambdas.on_maintenance_window_handler, 'schedule_account', schedule_account)
+    handle_shard(ids=[context.alice_account, context.bob_account], started=1000.0)  # shards of a sweep share its start
+    assert origins == [1000.0, 1000.0]
+
+
+@pytest.mark.unit_tests
+def test_handle_queue_event(monkeypatch):
+    processed = []
+
+    def handle_account(account, item=None):
+        processed.append(account)
+
+    delayed = []
+
+    def delay_account(account, due, now=None):
+        delayed.append(account)
+
+    monkeypatch.setattr(lambdas.on_maintenance_window_handler, 'handle_account', handle_account)
+    monkeypatch.setattr(lambdas.on_maintenance_window_handler, 'delay_account', delay_account)
+    event = dict(Records=[dict(messageId='1', body=json.dumps(dict(account='123456789012', due=0))),
+                          dict(messageId='2', body=json.dumps(dict(account='210987654321', due=4102444800))),
+                          dict(messageId='3', body='*invalid*')])
+    result = handle_queue_event(event=event)
+    assert processed == ['123456789012']
+    assert delayed == ['210987654321']  # not yet due, delayed again
+    assert result == dict(batchItemFailures=[dict(itemIdentifier='3')])
+
+
+@pytest.mark.unit_tests
+@mock_aws
+def test_delay_account():
+    queue_url = boto3.client('sqs').create_queue(QueueName='queue')['QueueUrl']
+    with patch.dict(os.environ, dict(EXPIRATIONS_QUEUE_URL=queue_url)):
+        delay_account(account='123456789012', due=100.0, now=0.0)
+    messages = boto3.client('sqs').receive_message(QueueUrl=queue_url, MaxNumberOfMessages=10, WaitTimeSeconds=0).get('Messages', [])
+    assert messages == []  # message is not yet visible
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Copyright Reply.com or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import logging
+logging.getLogger('botocore').setLevel(logging.CRITICAL)
+logging.getLogger('urllib3').setLevel(logging.CRITICAL)
+
+import json
+import pytest
+
+from lambdas.on_sweep_handler import handle_queue_event
+
+# pytestmark = pytest.mark.wip
+from sweep import Sweep  # visible from monkeypatch
+
+
+@pytest.mark.unit_tests
+def test_handle_queue_event(monkeypatch):
+    processed = []
+
+    def process(message, *args, **kwargs):
+        if message['shard'] == 1:
+            raise RuntimeError("Unable to process this shard")
+        processed.append(message['shard'])
+
+    monkeypatch.setattr(Sweep, 'process', process)
+
+    event = dict(Records=[dict(messageId='a', body=json.dumps(dict(shard=0))),
+                          dict(messageId='b', body=json.dumps(dict(shard=1))),
+                          dict(messageId='c', body='*not JSON*')])
+    result = handle_queue_event(event=event)
+    assert processed == [0]
+    assert result == dict(batchItemFailures=[dict(itemIdentifier='b'), dict(itemIdentifier='c')])
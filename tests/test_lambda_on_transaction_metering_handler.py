@@ -27,7 +27,7 @@ from cProfile import Profile
 from pstats import Stats
 import pytest
 
-from lambdas import Events
+from lambdas import Events, KeyValueStore
 from lambdas.on_transaction_metering_handler import handle_account_event, handle_stream_event, handle_expired_record
 
 # pytestmark = pytest.mark.wip
@@ -97,6 +97,25 @@ def test_handle_account_event_for_on_boarding_transaction(given_an_empty_table):
     print(stream.getvalue())
 
 
+@pytest.mark.integration_tests
+@patch.dict(os.environ, dict(ENVIRONMENT_IDENTIFIER="envt1",
+                             METERING_TRANSACTIONS_DATASTORE="my_table"))
+@mock_aws
+def test_handle_account_events_on_changes_of_state(given_a_small_setup, given_an_empty_table):
+    context = given_a_small_setup()
+    given_an_empty_table()
+    transactions = KeyValueStore(table_name="my_table")
+
+    for label, state in [('CreatedAccount', 'assigned'), ('ExpiredAccount', 'expired')]:  # in the same warm container
+        context.session.client('organizations').tag_resource(ResourceId=context.crm_account, Tags=[dict(Key='account-state', Value=state)])
+        event = Events.load_event_from_template(template="fixtures/events/account-event-template.json",
+                                                context=dict(account=context.crm_account,
+                                                             label=label,
+                                                             environment="envt1"))
+        assert handle_account_event(event=event) == f"[OK] {label} {context.crm_account}"
+        assert transactions.retrieve(context.crm_account)['account-state'] == state
+
+
 @pytest.mark.integration_tests
 @patch.dict(os.environ, dict(ENVIRONMENT_IDENTIFIER="envt1",
                              METERING_TRANSACTIONS_DATASTORE="my_table",
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Copyright Reply.com or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import logging
+logging.getLogger('botocore').setLevel(logging.CRITICAL)
+logging.getLogger('urllib3').setLevel(logging.CRITICAL)
+
+import botocore
+from unittest.mock import Mock
+from moto import mock_aws
+import pytest
+
+from lambdas import Account, OrganizationSnapshot
+from lambdas.throttling import AdaptiveRateLimiter
+
+# pytestmark = pytest.mark.wip
+
+
+@pytest.mark.integration_tests
+@mock_aws
+def test_take(given_a_small_setup):
+    context = given_a_small_setup()
+    snapshot = OrganizationSnapshot.take()
+    assert set(snapshot.accounts.keys()) == {'123456789012', context.alice_account, context.bob_account, context.crm_account, context.erp_account, context.root_account, context.unmanaged_account}
+    assert set(snapshot.units.keys()) == {context.root_id, context.committed_ou, context.sandbox_ou, context.unmanaged_ou}
+    alice = snapshot.accounts[context.alice_account]
+    assert alice == Account.describe(id=context.alice_account).to_dict()
+    assert alice['unit'] == context.sandbox_ou
+    assert alice['unit_name'] == context.sandbox_ou_name
+    assert alice['tags'] == {'account-holder': 'nobody@nowhere.com', 'account-state': 'released'}
+    assert snapshot.accounts[context.root_account]['unit_name'] == 'Root'
+
+
+@pytest.mark.integration_tests
+@mock_aws
+def test_take_without_tags(given_a_small_setup):
+    context = given_a_small_setup()
+    snapshot = OrganizationSnapshot.take(with_tags=False)
+    assert snapshot.accounts[context.alice_account]['tags'] == {}
+    assert snapshot.accounts[context.bob_account]['unit'] == context.sandbox_ou
+
+
+@pytest.mark.unit_tests
+def test_take_does_not_list_parents():
+    session = Mock()
+    handle = session.client.return_value
+    handle.list_roots.return_value = dict(Roots=[dict(Id='r-1234')])
+    handle.list_accounts_for_parent.side_effect = [
+        dict(Accounts=[dict(Id='111111111111', Arn='arn:a', Email='a@b.com', Name='a', Status='ACTIVE')], NextToken='token'),
+        dict(Accounts=[dict(Id='222222222222', Arn='arn:b', Email='b@b.com', Name='b', Status='SUSPENDED')]),
+        dict(Accounts=[dict(Id='333333333333', Arn='arn:c', Email='c@b.com', Name='c', Status='ACTIVE')])]
+    handle.list_organizational_units_for_parent.side_effect = [
+        dict(OrganizationalUnits=[dict(Id='ou-5678', Name='Sandbox')]),
+        dict(OrganizationalUnits=[])]
+    handle.list_tags_for_resource.return_value = dict(Tags=[dict(Key='account-state', Value='released')])
+
+    snapshot = OrganizationSnapshot.take(session=session)
+    assert set(snapshot.accounts.keys()) == {'111111111111', '222222222222', '333333333333'}
+    assert snapshot.accounts['222222222222']['is_active'] is False
+    assert snapshot.accounts['222222222222']['unit_name'] == 'Root'
+    assert snapshot.accounts['333333333333']['unit'] == 'ou-5678'
+    assert snapshot.accounts['333333333333']['unit_name'] == 'Sandbox'
+    assert snapshot.accounts['333333333333']['tags'] == {'account-state': 'released'}
+    assert snapshot.get_path('333333333333') == 'Root/Sandbox'
+    assert snapshot.get_path('111111111111') == 'Root'
+    handle.list_parents.assert_not_called()
+    handle.describe_account.assert_not_called()
+
+
+@pytest.mark.unit_tests
+def test_take_when_tags_cannot_be_listed():
+    session = Mock()
+    handle = session.client.return_value
+    handle.list_roots.return_value = dict(Roots=[dict(Id='r-1234')])
+    handle.list_accounts_for_parent.return_value = dict(Accounts=[dict(Id='111111111111', Arn='arn:a', Email='a@b.com', Name='a', Status='ACTIVE'),
+                                                                  dict(Id='222222222222', Arn='arn:b', Email='b@b.com', Name='b', Status='ACTIVE')])
+    handle.list_organizational_units_for_parent.return_value = dict(OrganizationalUnits=[])
+    throttled = botocore.exceptions.ClientError(dict(Error=dict(Code='TooManyRequestsException')), 'ListTagsForResource')
+    denied = botocore.exceptions.ClientError(dict(Error=dict(Code='AccessDeniedException')), 'ListTagsForResource')
+    handle.list_tags_for_resource.side_effect = [throttled, dict(Tags=[dict(Key='account-state', Value='released')]), denied]
+
+    snapshot = OrganizationSnapshot(session=session)
+    snapshot.limiter = AdaptiveRateLimiter(rate=1000.0, maximum=1000.0)
+    snapshot.scan()
+    assert snapshot.accounts['111111111111']['tags'] == {'account-state': 'released'}  # throttled call is retried
+    assert snapshot.accounts['222222222222']['tags'] == {}  # the scan goes on
@@ -20,10 +20,14 @@ logging.getLogger('botocore').setLevel(logging.CRITICAL)
 logging.getLogger('urllib3').setLevel(logging.CRITICAL)
 
 from boto3.session import Session
+from datetime import datetime, timedelta, timezone
+from moto import mock_aws
 import pytest
 from unittest.mock import Mock
 
-from lambdas import get_assumed_session
+from lambdas import get_assumed_session, SessionPool
+from lambdas import session as session_module
+from lambdas.session import forget_sessions
 
 # pytestmark = pytest.mark.wip
 
@@ -61,3 +65,60 @@ def test_get_assumed_session_maximum(mock):
 def test_get_assumed_session_invalid_arn():
     with pytest.raises(ValueError):
         get_assumed_session(role_arn='arn')
+
+
+@pytest.mark.unit_tests
+def test_get_assumed_session_is_cached_until_expiration(mock):
+    forget_sessions()
+    credentials = mock.client.return_value.assume_role.return_value['Credentials']
+    credentials['Expiration'] = datetime.now(timezone.utc) + timedelta(hours=1)
+    role_arn = 'arn:aws:iam::222222222222:role/role-on-source-account'
+    session = get_assumed_session(role_arn=role_arn, session=mock)
+    assert get_assumed_session(role_arn=role_arn, session=mock) is session
+    assert get_assumed_session(role_arn=role_arn, region='eu-west-12', session=mock) is not session
+    assert mock.client.return_value.assume_role.call_count == 2
+
+    credentials['Expiration'] = datetime.now(timezone.utc) + timedelta(minutes=5)  # too close to expiration
+    forget_sessions()
+    session = get_assumed_session(role_arn=role_arn, session=mock)
+    assert get_assumed_session(role_arn=role_arn, session=mock) is not session
+    assert mock.client.return_value.assume_role.call_count == 4
+    forget_sessions()
+
+
+@pytest.mark.unit_tests
+def test_get_assumed_session_is_cached_in_bounded_memory(mock, monkeypatch):
+    forget_sessions()
+    monkeypatch.setattr(session_module.sessions, 'size', 2)
+    credentials = mock.client.return_value.assume_role.return_value['Credentials']
+    credentials['Expiration'] = datetime.now(timezone.utc) + timedelta(hours=1)
+    for account in ['111111111111', '222222222222', '333333333333']:
+        get_assumed_session(role_arn=f'arn:aws:iam::{account}:role/role', session=mock)
+    assert session_module.sessions.get_statistics()['size'] == 2
+    get_assumed_session(role_arn='arn:aws:iam::111111111111:role/role', session=mock)  # evicted, assumed again
+    assert mock.client.return_value.assume_role.call_count == 4
+    forget_sessions()
+
+
+@pytest.mark.integration_tests
+@mock_aws
+def test_session_pool(monkeypatch):
+    get_account_session = session_module.get_account_session
+
+    def assume(account, session=None):
+        if account == '333333333333':
+            raise ValueError("Invalid role ARN")
+        return get_account_session(account=account, session=session)
+
+    monkeypatch.setattr(session_module, 'get_account_session', assume)
+    pool = SessionPool(max_workers=2)
+    accounts = ['111111111111', '222222222222', '333333333333', '444444444444', '555555555555', '666666666666']
+    results = dict(pool.enumerate_sessions(accounts))
+    assert set(results.keys()) == set(accounts)
+    assert results.pop('333333333333') is None  # handed over without session
+    assert all(isinstance(item, Session) for item in results.values())
+    statistics = pool.get_statistics()
+    assert statistics['sessions'] == 5
+    assert statistics['failures'] == 1
+    assert pool.failures == {'333333333333': 'Invalid role ARN'}
+    assert statistics['maximum_latency'] >= statistics['average_latency'] > 0.0
@@ -19,12 +19,16 @@ import logging
 logging.getLogger('botocore').setLevel(logging.CRITICAL)
 logging.getLogger('urllib3').setLevel(logging.CRITICAL)
 
+import base64
 from unittest.mock import patch
 from moto import mock_aws
+import json
 import os
 import pytest
+import zlib
 
-from lambdas import Settings
+from lambdas import Settings, SettingsIndex
+from clients import get_client  # as used by settings
 
 # pytestmark = pytest.mark.wip
 
@@ -89,6 +93,27 @@ def test_get_organizational_unit_settings(given_a_small_setup):
     assert settings == context.settings_sandbox_ou
 
 
+
+@pytest.mark.integration_tests
+@mock_aws
+def test_get_settings_for_account_from_cached_parameters(given_a_small_setup):
+    context = given_a_small_setup()
+    ssm = context.session.client('ssm')
+    ssm.put_parameter(Name=Settings.get_settings_generation_parameter_name(), Value='1', Type='String')
+    calls = []
+    get_client('ssm').meta.events.register('provide-client-params.ssm.GetParameter', lambda params, **kwargs: calls.append(params['Name']))
+    for _ in range(3):
+        assert Settings.get_settings_for_account(identifier=context.crm_account) == context.settings_crm_account
+        assert Settings.get_settings_for_account(identifier=context.alice_account) == context.settings_sandbox_ou  # inherited
+    assert len(calls) == 4  # generation, parameter of crm, missing parameter of alice, parameter of the unit
+
+    ssm.put_parameter(Name=Settings.get_account_parameter_name(identifier=context.crm_account),
+                      Value=json.dumps(dict(identifier=context.crm_account, note='changed')), Type='String', Overwrite=True)
+    ssm.put_parameter(Name=Settings.get_settings_generation_parameter_name(), Value='2', Type='String', Overwrite=True)
+    with patch.object(Settings, 'cache_checked_at', float('-inf')):  # the ttl of the index has passed
+        assert Settings.get_settings_for_account(identifier=context.crm_account)['note'] == 'changed'
+
+
 @pytest.mark.integration_tests
 @mock_aws
 def test_get_settings_for_account(given_a_small_setup):
@@ -103,3 +128,133 @@ def test_get_settings_for_account_for_alien_account(given_a_small_setup):
     given_a_small_setup()
     with pytest.raises(ValueError):
         Settings.get_settings_for_account(identifier='123456789012')   # events from unmanaged accounts raise exceptions
+
+
+@pytest.mark.integration_tests
+@mock_aws
+def test_settings_index(given_a_small_setup):
+    context = given_a_small_setup()
+    index = SettingsIndex().load()
+    assert index.is_loaded()
+    assert index.get_account_settings(context.crm_account) == context.settings_crm_account
+    assert index.get_organizational_unit_settings(context.sandbox_ou) == context.settings_sandbox_ou
+    assert index.get_account_settings('123456789012') is None
+    index.forget()
+    assert not index.is_loaded()
+
+
+@pytest.mark.integration_tests
+@mock_aws
+def test_get_settings_for_account_from_index(given_a_small_setup):
+    context = given_a_small_setup()
+    Settings.get_index()
+    with patch.object(SettingsIndex, 'load') as mock:
+        settings = Settings.get_settings_for_account(identifier=context.crm_account)
+        assert settings == context.settings_crm_account
+        mock.assert_not_called()  # lookups are served from memory
+
+
+@pytest.mark.integration_tests
+@mock_aws
+def test_get_settings_for_account_without_index(given_a_small_setup):
+    context = given_a_small_setup()
+    with patch.object(SettingsIndex, 'load') as mock:
+        settings = Settings.get_settings_for_account(identifier=context.crm_account)
+        assert settings == context.settings_crm_account
+        mock.assert_not_called()  # handlers of single accounts do not index the whole organization
+    with patch.dict(os.environ, dict(WITH_PACKED_SETTINGS='true')):
+        with patch.object(SettingsIndex, 'load') as mock:
+            Settings.get_settings_for_account(identifier=context.crm_account)
+            mock.assert_called_once()  # no parameter for each account
+
+
+@pytest.mark.integration_tests
+@mock_aws
+def test_get_settings_for_account_in_nested_organizational_unit(given_a_small_setup):
+    context = given_a_small_setup()
+    handle = context.session.client('organizations')
+    nested_ou = handle.create_organizational_unit(ParentId=context.sandbox_ou, Name='nested')['OrganizationalUnit']['Id']
+    handle.move_account(AccountId=context.bob_account, SourceParentId=context.sandbox_ou, DestinationParentId=nested_ou)
+    settings = Settings.get_settings_for_account(identifier=context.bob_account)
+    assert settings == context.settings_sandbox_ou
+    accounts = {i for i in Settings.enumerate_accounts_in_managed_organizational_units()}
+    assert context.bob_account in accounts
+
+
+@pytest.mark.integration_tests
+@mock_aws
+def test_get_settings_for_account_in_nested_configured_organizational_units(given_a_small_setup):
+    context = given_a_small_setup()
+    handle = context.session.client('organizations')
+    nested_ou = handle.create_organizational_unit(ParentId=context.sandbox_ou, Name='nested')['OrganizationalUnit']['Id']
+    handle.move_account(AccountId=context.bob_account, SourceParentId=context.sandbox_ou, DestinationParentId=nested_ou)
+    nested_settings = {'account_tags': {'CostCenter': 'nested'}, 'identifier': nested_ou}
+    context.session.client('ssm').put_parameter(Name=f"/Spa/OrganizationalUnits/{nested_ou}", Value=json.dumps(nested_settings), Type='String')
+    assert set(context.settings_sandbox_ou.keys()) - set(nested_settings.keys())  # keys of the outer unit that must not leak
+
+    assert Settings.get_settings_for_account(identifier=context.bob_account, bulk=True) == nested_settings  # from the index
+    assert Settings.get_settings_for_account(identifier=context.alice_account) == context.settings_sandbox_ou
+    assert Settings.get_settings_for_account_from_parameters(identifier=context.bob_account) == nested_settings  # without the index
+
+
+@pytest.mark.integration_tests
+@mock_aws
+def test_settings_index_revalidate(given_a_small_setup):
+    context = given_a_small_setup()
+    ssm = context.session.client('ssm')
+    ssm.put_parameter(Name=Settings.get_settings_generation_parameter_name(), Value='1', Type='String')
+    index = SettingsIndex(ttl=0).load()
+    assert index.generation == '1'
+
+    name = Settings.get_account_parameter_name(identifier=context.crm_account)
+    ssm.put_parameter(Name=name, Value=json.dumps(dict(identifier=context.crm_account, note='changed')), Type='String', Overwrite=True)
+    index.refresh()
+    assert index.get_account_settings(context.crm_account) == context.settings_crm_account  # same generation, no change
+
+    ssm.put_parameter(Name=Settings.get_settings_generation_parameter_name(), Value='2', Type='String', Overwrite=True)
+    with patch.object(SettingsIndex, 'load') as mock:
+        index.refresh()
+        mock.assert_not_called()  # only changed parameters are fetched
+    assert index.generation == '2'
+    assert index.get_account_settings(context.crm_account) == dict(identifier=context.crm_account, note='changed')
+    assert index.get_organizational_unit_settings(context.sandbox_ou) == context.settings_sandbox_ou
+
+
+@pytest.mark.integration_tests
+@mock_aws
+def test_settings_index_with_packed_settings(given_a_small_setup):
+    context = given_a_small_setup()
+    content = json.dumps(dict(accounts={'111111111111': dict(identifier='111111111111', note='packed')},
+                              organizational_units={'ou-packed': dict(identifier='ou-packed')}))
+    packed = base64.b64encode(zlib.compress(content.encode('utf-8'))).decode('ascii')
+    ssm = context.session.client('ssm')
+    for index, offset in enumerate(range(0, len(packed), 20)):  # a lot of small shards
+        ssm.put_parameter(Name=f"{Settings.get_packed_settings_parameter_name()}/{index:03d}", Value=packed[offset:offset + 20], Type='String')
+    index = SettingsIndex().load()
+    assert index.get_account_settings('111111111111') == dict(identifier='111111111111', note='packed')
+    assert index.get_organizational_unit_settings('ou-packed') == dict(identifier='ou-packed')
+    assert index.get_account_settings(context.crm_account) == context.settings_crm_account  # along with other parameters
+
+
+@pytest.mark.integration_tests
+@mock_aws
+def test_settings_index_with_mismatching_packed_settings(given_a_small_setup):
+    context = given_a_small_setup()
+    ssm = context.session.client('ssm')
+    ssm.put_parameter(Name=Settings.get_settings_generation_parameter_name(), Value='2', Type='String')
+    ssm.put_parameter(Name=f"{Settings.get_packed_settings_parameter_name()}/000", Value='eJzLSM3JyQcABiwCFQ', Type='String')  # truncated
+    index = SettingsIndex().load()
+    assert index.generation is None  # checked again on next refresh
+    assert index.get_account_settings(context.crm_account) == context.settings_crm_account
+    assert Settings.get_settings_for_account(identifier=context.crm_account, bulk=True) == context.settings_crm_account
+
+
+@pytest.mark.unit_tests
+def test_get_settings_for_account_from_compiled_settings(tmp_path):
+    name = tmp_path / 'compiled_settings.json'
+    name.write_text(json.dumps(dict(accounts={'111111111111': dict(identifier='111111111111', note='compiled')}, organizational_units={})))
+    with patch.dict(os.environ, dict(COMPILED_SETTINGS_FILE=str(name))):
+        with patch.object(SettingsIndex, 'load') as mock:
+            settings = Settings.get_settings_for_account(identifier='111111111111')
+            mock.assert_not_called()  # no network call
+    assert settings == dict(identifier='111111111111', note='compiled')
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Copyright Reply.com or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import logging
+logging.getLogger('botocore').setLevel(logging.CRITICAL)
+logging.getLogger('urllib3').setLevel(logging.CRITICAL)
+
+import boto3
+import json
+from moto import mock_aws
+import os
+import pytest
+from unittest.mock import patch
+
+from lambdas import Account, KeyValueStore, Sweep
+
+# pytestmark = pytest.mark.wip
+import reset_accounts_handler  # visible from monkeypatch
+
+
+@pytest.mark.unit_tests
+@mock_aws
+def test_dispatch_and_process(given_an_empty_table, monkeypatch):
+    given_an_empty_table()
+    store = KeyValueStore(table_name='my_table')
+    queue_url = boto3.client('sqs').create_queue(QueueName='queue')['QueueUrl']
+
+    ids = [f"{i:012d}" for i in range(5)]
+    sweep = Sweep.dispatch(operation='reset', ids=ids, batch_size=2, queue_url=queue_url, store=store)
+    assert store.retrieve(hash=sweep)['shards'] == 3
+
+    messages = boto3.client('sqs').receive_message(QueueUrl=queue_url, MaxNumberOfMessages=10)['Messages']
+    messages = sorted([json.loads(item['Body']) for item in messages], key=lambda message: message['shard'])
+    assert [message['accounts'] for message in messages] == [ids[0:2], ids[2:4], ids[4:]]
+
+    processed = []
+    origins = set()
+
+    def handle_shard(ids, attributes=None, started=None):
+        processed.extend(ids)
+        origins.add(started)
+
+    monkeypatch.setattr(reset_accounts_handler, 'handle_shard', handle_shard)
+    monkeypatch.setattr(Account, 'writer', Account.writer)  # replaced for each shard
+    for message in messages:
+        Sweep.process(message=message, store=store)
+    assert processed == ids
+    assert origins == {store.retrieve(hash=sweep)['begin']}  # all shards spread accounts from the start of the sweep
+
+    assert Sweep.complete(message=messages[-1], store=store) is None  # duplicate messages are ignored
+
+
+@pytest.mark.unit_tests
+@mock_aws
+def test_complete(given_an_empty_table):
+    given_an_empty_table()
+    store = KeyValueStore(table_name='my_table')
+    store.remember(hash='my_sweep', value=dict(operation='reset', accounts=3, shards=2, begin=0))
+    assert Sweep.complete(message=dict(sweep='my_sweep', operation='reset', shard=1, shards=2), store=store) is None
+    summary = Sweep.complete(message=dict(sweep='my_sweep', operation='reset', shard=0, shards=2), store=store)
+    assert summary['accounts'] == 3
+    assert summary['shards'] == 2
+
+
+@pytest.mark.unit_tests
+@patch.dict(os.environ, dict(SWEEPS_MAX_CONCURRENCY='20', ORGANIZATIONS_WRITE_RATE='2.0'))
+def test_get_concurrency(monkeypatch):
+    monkeypatch.setattr(Account, 'writer', Account.writer)  # restored after the test
+    assert Sweep.get_concurrency(dict(shards=3)) == 3  # the rate of changes of tags is divided by shards in flight
+    assert Sweep.get_concurrency(dict(shards=300)) == 20
+    assert Account.share_writes(concurrency=Sweep.get_concurrency(dict(shards=4))).rate == 0.5
+
+
+@pytest.mark.unit_tests
+def test_dispatch_unknown_operation():
+    with pytest.raises(ValueError):
+        Sweep.dispatch(operation='*unknown*', ids=[], queue_url='queue')
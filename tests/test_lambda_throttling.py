@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Copyright Reply.com or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: Apache-2.0
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import logging
+logging.getLogger('botocore').setLevel(logging.CRITICAL)
+logging.getLogger('urllib3').setLevel(logging.CRITICAL)
+
+import botocore
+import pytest
+from unittest.mock import Mock
+
+import lambdas.throttling
+from lambdas.throttling import AdaptiveRateLimiter, is_throttling, TokenBucket
+
+# pytestmark = pytest.mark.wip
+
+
+def build_error(code):
+    return botocore.exceptions.ClientError(dict(Error=dict(Code=code, Message='message')), 'TagResource')
+
+
+@pytest.mark.unit_tests
+def test_is_throttling():
+    assert is_throttling(build_error('TooManyRequestsException'))
+    assert not is_throttling(build_error('AccountNotFoundException'))
+    assert not is_throttling(ValueError('hello'))
+
+
+@pytest.mark.unit_tests
+def test_call_with_success():
+    limiter = AdaptiveRateLimiter(rate=1000.0, maximum=2000.0, increase=1.0)
+    assert limiter.call(lambda x: x + 1, 1) == 2
+    assert limiter.rate == 1000.0 + 1.0
+
+
+@pytest.mark.unit_tests
+def test_call_with_throttling():
+    limiter = AdaptiveRateLimiter(rate=1000.0, minimum=10.0, maximum=2000.0, increase=0.0, decrease=0.5)
+    function = Mock(side_effect=[build_error('TooManyRequestsException'), build_error('TooManyRequestsException'), 'ok'])
+    assert limiter.call(function) == 'ok'
+    assert function.call_count == 3
+    assert limiter.rate == 250.0
+
+
+@pytest.mark.unit_tests
+def test_call_with_too_many_throttles():
+    limiter = AdaptiveRateLimiter(rate=1000.0, minimum=500.0, retries=2)
+    function = Mock(side_effect=build_error('TooManyRequestsException'))
+    with pytest.raises(botocore.exceptions.ClientError):
+        limiter.call(function)
+    assert function.call_count == 3
+
+
+@pytest.mark.unit_tests
+def test_call_with_other_error():
+    limiter = AdaptiveRateLimiter(rate=1000.0)
+    function = Mock(side_effect=build_error('AccountNotFoundException'))
+    with pytest.raises(botocore.exceptions.ClientError):
+        limiter.call(function)
+    assert function.call_count == 1
+
+
+@pytest.mark.unit_tests
+def test_token_bucket_with_burst():
+    bucket = TokenBucket(rate=1000.0, capacity=3)
+    for _ in range(10):
+        assert bucket.call(lambda x: x + 1, 1) == 2
+    assert bucket.tokens <= 3.0
+
+
+@pytest.mark.unit_tests
+def test_token_bucket_shared_by_concurrent_invocations():
+    bucket = TokenBucket.shared_by(concurrency=20, rate=2.0, capacity=5)
+    assert bucket.rate == 0.1
+    assert bucket.capacity == 1
+    assert TokenBucket.shared_by(concurrency=0, rate=2.0, capacity=5).rate == 2.0
+
+
+@pytest.mark.unit_tests
+def test_token_bucket_with_throttling():
+    bucket = TokenBucket(rate=1000.0, base=0.001, cap=0.01)
+    function = Mock(side_effect=[build_error('TooManyRequestsException'), build_error('TooManyRequestsException'), 'ok'])
+    assert bucket.call(function) == 'ok'
+    assert function.call_count == 3
+    assert bucket.throttled > 0.0
+
+
+@pytest.mark.unit_tests
+def test_token_bucket_with_too_many_throttles():
+    bucket = TokenBucket(rate=1000.0, retries=2, base=0.001, cap=0.01)
+    function = Mock(side_effect=build_error('TooManyRequestsException'))
+    with pytest.raises(botocore.exceptions.ClientError):
+        bucket.call(function)
+    assert function.call_count == 3
+
+
+@pytest.mark.unit_tests
+def test_token_bucket_publish(monkeypatch):
+    import throttling  # as used by lambda handlers
+    put_metric_data = Mock()
+    for module in {throttling, lambdas.throttling}:
+        monkeypatch.setattr(module, 'put_metric_data', put_metric_data)
+    bucket = TokenBucket()
+    assert bucket.publish() == 0.0
+    put_metric_data.assert_not_called()
+    bucket.throttled = 1.5
+    assert bucket.publish() == 1.5
+    assert put_metric_data.call_args.kwargs['value'] == 1.5
+    assert bucket.throttled == 0.0